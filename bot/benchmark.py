@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import os
+
+
+# Offline benchmarks, run from the repository root:
+#     python bot/benchmark.py gateway --events 10000
+#     python bot/benchmark.py audio --levels 1,10,25,50
+#     python bot/benchmark.py mal [saved pages...]
+# The gateway benchmark needs DATABASE_URL to point to a local Postgres
+# database. The audio benchmark needs ffmpeg and ffprobe in PATH. The MAL
+# benchmark parses saved pages, by default the MyAnimeList fixtures
+# recorded by the self-tests. Discord is never contacted, so TOKEN may be
+# left unset.
+
+
+async def gateway(args: argparse.Namespace) -> None:
+    from benchmarks import gateway
+    from core import bot
+
+    await bot._async_setup_hook()
+    await bot.prepare_database()
+    try:
+        report = await gateway.run(
+            bot,
+            events=args.events,
+            mix=gateway.parse_mix(args.mix),
+            concurrency=args.concurrency,
+            guilds=args.guilds,
+            paginators=args.paginators,
+            allocation_events=args.allocation_events,
+            warmup=args.warmup,
+            seed=args.seed,
+        )
+    finally:
+        await bot.conn.close()
+
+    print(report)
+
+
+async def audio(args: argparse.Namespace) -> None:
+    from benchmarks import audio
+    from core import bot
+
+    await bot._async_setup_hook()
+    report = await audio.run(
+        bot,
+        levels=audio.parse_levels(args.levels),
+        length=args.length,
+        files=args.files,
+        latency=args.latency,
+        max_miss_ratio=args.max_miss_ratio,
+    )
+    print(report)
+
+
+async def mal(args: argparse.Namespace) -> None:
+    from benchmarks import mal
+
+    pages = mal.load_pages(args.pages)
+    report = await mal.run(pages, repeat=args.repeat)
+    print(report)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    parser_gateway = subparsers.add_parser("gateway", help="feed synthetic gateway events through the event handlers and commands")
+    parser_gateway.add_argument("--events", type=int, default=5000, help="the number of measured events")
+    parser_gateway.add_argument("--mix", default="chatter=70,command=15,slash=10,reaction=5", help="the relative weights of the event kinds")
+    parser_gateway.add_argument("--concurrency", type=int, default=50, help="the maximum number of events being processed at once")
+    parser_gateway.add_argument("--guilds", type=int, default=20, help="the number of synthetic guilds")
+    parser_gateway.add_argument("--paginators", type=int, default=100, help="the number of emoji paginators waiting for reactions")
+    parser_gateway.add_argument("--allocation-events", type=int, default=200, help="the number of events per kind traced for allocations")
+    parser_gateway.add_argument("--warmup", type=int, default=20, help="the number of unmeasured events per kind before measuring")
+    parser_gateway.add_argument("--seed", type=int, help="the random seed")
+
+    parser_audio = subparsers.add_parser("audio", help="stream tracks to stubbed voice connections in more and more guilds at once")
+    parser_audio.add_argument("files", nargs="*", help="the audio files to serve, a sine wave is generated if omitted")
+    parser_audio.add_argument("--levels", default="1,5,10,25,50", help="the numbers of guilds playing at once")
+    parser_audio.add_argument("--length", type=int, default=65, help="the played length of each track in seconds, a new ffmpeg process is started every 30 seconds")
+    parser_audio.add_argument("--latency", type=float, default=0.0, help="the delay of the audio server before each response, in seconds")
+    parser_audio.add_argument("--max-miss-ratio", type=float, default=0.001, help="the highest ratio of late packets that still counts towards the capacity")
+
+    parser_mal = subparsers.add_parser("mal", help="parse saved MyAnimeList pages with each tree builder, with and without the strainer")
+    parser_mal.add_argument("pages", nargs="*", help="HTML files or recorded JSON fixtures, all MyAnimeList fixtures if omitted")
+    parser_mal.add_argument("--repeat", type=int, default=20, help="the number of measured runs per page and variant")
+
+    args = parser.parse_args()
+
+    # env.py requires a token, although no connection to Discord is made
+    os.environ.setdefault("TOKEN", "benchmark")
+
+    # Register the event handlers and commands as main.py does
+    importlib.import_module("events")
+    importlib.import_module("commands")
+
+    if args.benchmark == "gateway":
+        asyncio.run(gateway(args))
+    elif args.benchmark == "audio":
+        asyncio.run(audio(args))
+    elif args.benchmark == "mal":
+        asyncio.run(mal(args))
+
+
+if __name__ == "__main__":
+    main()
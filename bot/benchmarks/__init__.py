@@ -0,0 +1 @@
+#!/bot/benchmarks
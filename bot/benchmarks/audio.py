@@ -0,0 +1,452 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+from typing import Any, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+import discord
+from aiohttp import web
+
+from lib.audio import InvidiousSource, MusicClient, OpusCache
+from .gateway import StubHTTP, SyntheticGateway
+from .stats import Samples, format_duration, format_table
+if TYPE_CHECKING:
+    import haruka
+
+
+__all__ = (
+    "AudioServer",
+    "LevelResult",
+    "StubVoiceSocket",
+    "StubVoiceWebSocket",
+    "attach_stub_voice",
+    "parse_levels",
+    "run",
+)
+
+
+FRAME_DELAY = discord.player.AudioPlayer.DELAY
+
+
+class StubVoiceWebSocket:
+    """Stand-in for the voice websocket, the speaking state is only
+    counted
+    """
+
+    __slots__ = ("speaking",)
+    if TYPE_CHECKING:
+        speaking: int
+
+    def __init__(self) -> None:
+        self.speaking = 0
+
+    async def speak(self, state: Any = None) -> None:
+        self.speaking += 1
+
+    async def close(self, code: int = 1000) -> None:
+        return
+
+
+class StubVoiceSocket:
+    """Stand-in for the voice UDP socket that checks every packet
+    against the schedule of the audio player
+
+    The audio player sends the packet of its n-th loop at
+    ``start + n * 20ms``, where ``start`` is reset when playing is
+    resumed. A packet misses its deadline when it is sent more than
+    one frame later than that. The player sends packets in a burst to
+    catch up after a stall, so every packet of a stall is counted, not
+    only the first one.
+
+    Attributes
+    -----
+    client: ``discord.VoiceClient``
+        The voice client sending through this socket
+    packets: ``int``
+        The number of packets sent
+    misses: ``int``
+        The number of packets that missed their deadline
+    lateness: ``Samples``
+        How late each packet was, in seconds
+    """
+
+    __slots__ = ("client", "packets", "misses", "lateness")
+    if TYPE_CHECKING:
+        client: discord.VoiceClient
+        packets: int
+        misses: int
+        lateness: Samples
+
+    def __init__(self, client: discord.VoiceClient) -> None:
+        self.client = client
+        self.packets = 0
+        self.misses = 0
+        self.lateness = Samples("lateness")
+
+    def sendto(self, data: bytes, address: Tuple[str, int]) -> int:
+        self.packets += 1
+        player = self.client._player
+        if player is not None:
+            lateness = time.perf_counter() - player._start - player.loops * FRAME_DELAY
+            self.lateness.add(max(0.0, lateness))
+            if lateness > FRAME_DELAY:
+                self.misses += 1
+
+        return len(data)
+
+    def close(self) -> None:
+        return
+
+
+def attach_stub_voice(client: MusicClient) -> None:
+    """Make a voice client look connected, with the websocket and the
+    UDP socket replaced by stubs. Packets are still encrypted.
+    """
+    client.ws = StubVoiceWebSocket()  # type: ignore
+    client.socket = StubVoiceSocket(client)  # type: ignore
+    client.endpoint_ip = "127.0.0.1"
+    client.voice_port = 0
+    client.ssrc = random.getrandbits(32)
+    client.mode = "xsalsa20_poly1305_lite"
+    client.secret_key = [0] * 32
+    client._connected.set()
+
+
+class AudioServer:
+    """Serve local audio files over HTTP, in place of the stream URLs
+    of the Invidious and YouTube hosts
+
+    Range requests are supported, so that ffmpeg seeks the same way
+    as with the real hosts.
+
+    Attributes
+    -----
+    files: List[``str``]
+        The served files, ``/audio/<index>`` is the URL path of each
+    latency: ``float``
+        The delay before each response, in seconds
+    requests: ``int``
+        The number of requests served
+    """
+
+    __slots__ = ("files", "latency", "requests", "app", "_runner", "_base_url")
+    if TYPE_CHECKING:
+        files: List[str]
+        latency: float
+        requests: int
+        app: web.Application
+        _runner: Optional[web.AppRunner]
+        _base_url: Optional[str]
+
+    def __init__(self, files: List[str], *, latency: float = 0.0) -> None:
+        self.files = files
+        self.latency = latency
+        self.requests = 0
+        self.app = web.Application()
+        self.app.router.add_get(r"/audio/{index:\d+}", self._handler)
+        self._runner = None
+        self._base_url = None
+
+    async def _handler(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        index = int(request.match_info["index"])
+        if index >= len(self.files):
+            raise web.HTTPNotFound
+
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+        return web.FileResponse(self.files[index])
+
+    def url(self, index: int) -> str:
+        if self._base_url is None:
+            raise RuntimeError("The audio server is not running")
+
+        return f"{self._base_url}/audio/{index % len(self.files)}"
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self._base_url = f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def _ffmpeg(*args: str) -> bytes:
+    process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"{args[0]} exited with code {process.returncode}: {stderr.decode('utf-8', 'replace').strip()}")
+
+    return stdout
+
+
+async def generate_audio(path: str, length: int) -> None:
+    """This function is a coroutine
+
+    Generate a sine wave in the same container and codec as the
+    Invidious opus streams
+    """
+    await _ffmpeg(
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+        "-t", str(length),
+        "-ac", "2", "-c:a", "libopus", "-b:a", "128k",
+        "-f", "webm", "-y", path,
+    )
+
+
+async def probe_length(path: str) -> float:
+    """This function is a coroutine
+
+    Get the duration of an audio file, in seconds
+    """
+    stdout = await _ffmpeg("ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path)
+    return float(stdout)
+
+
+def _cpu_times() -> Tuple[float, float]:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime
+
+
+class LevelResult:
+    """The measurements of one concurrency level
+
+    Attributes
+    -----
+    guilds: ``int``
+        The number of guilds playing at once
+    elapsed: ``float``
+        The wall-clock time until all tracks finished, in seconds
+    spawns: ``int``
+        The number of ffmpeg processes started
+    own_cpu: ``float``
+        The CPU time of the bot process, in seconds
+    ffmpeg_cpu: ``float``
+        The CPU time of the ffmpeg processes, in seconds
+    gaps: ``Samples``
+        The silence between consecutive chunks
+    lateness: ``Samples``
+        How late each packet was sent
+    underruns: ``int``
+        The number of times the next chunk was not ready in time
+    packets: ``int``
+        The number of packets sent
+    misses: ``int``
+        The number of packets that missed their deadline
+    """
+
+    __slots__ = ("guilds", "elapsed", "spawns", "own_cpu", "ffmpeg_cpu", "gaps", "lateness", "underruns", "packets", "misses")
+    if TYPE_CHECKING:
+        guilds: int
+        elapsed: float
+        spawns: int
+        own_cpu: float
+        ffmpeg_cpu: float
+        gaps: Samples
+        lateness: Samples
+        underruns: int
+        packets: int
+        misses: int
+
+    def __init__(self, guilds: int) -> None:
+        self.guilds = guilds
+        self.elapsed = 0.0
+        self.spawns = 0
+        self.own_cpu = 0.0
+        self.ffmpeg_cpu = 0.0
+        self.gaps = Samples("gaps")
+        self.lateness = Samples("lateness")
+        self.underruns = 0
+        self.packets = 0
+        self.misses = 0
+
+    @property
+    def miss_ratio(self) -> float:
+        return self.misses / self.packets if self.packets else 1.0
+
+    def row(self) -> Tuple[Any, ...]:
+        stream_seconds = self.guilds * self.elapsed
+        return (
+            self.guilds,
+            f"{self.elapsed:.1f}s",
+            f"{60 * self.spawns / self.elapsed:.1f}",
+            f"{100 * self.own_cpu / stream_seconds:.2f}%",
+            f"{100 * self.ffmpeg_cpu / stream_seconds:.2f}%",
+            format_duration(self.gaps.percentile(50)),
+            format_duration(self.gaps.percentile(100)),
+            self.underruns,
+            format_duration(self.lateness.percentile(99)),
+            f"{self.misses} ({100 * self.miss_ratio:.2f}%)",
+        )
+
+
+async def _play_level(
+    bot: haruka.Haruka,
+    gateway: SyntheticGateway,
+    server: AudioServer,
+    *,
+    guilds: int,
+    length: int,
+    level: int,
+) -> LevelResult:
+    clients = []
+    tracks = []
+    for index in range(guilds):
+        channel = gateway.voice_channels[index]
+        client = MusicClient(bot, channel)
+        attach_stub_voice(client)
+        client.target = channel.guild.text_channels[0]
+        clients.append(client)
+
+        tracks.append(InvidiousSource(
+            {
+                "videoId": f"benchmark-{level}-{index}",
+                "title": f"Benchmark track {index}",
+                "author": "Benchmark",
+                "lengthSeconds": length,
+                "description": None,
+                "adaptiveFormats": [{"encoding": "opus", "url": server.url(index)}],
+            },
+            "BENCHMARK",
+        ))
+
+    result = LevelResult(guilds)
+    own_before, children_before = _cpu_times()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(client._play(track) for client, track in zip(clients, tracks)))
+    finally:
+        result.elapsed = time.perf_counter() - started
+        for client in clients:
+            client.stop()
+            client._connected.clear()
+
+    own_after, children_after = _cpu_times()
+    result.own_cpu = own_after - own_before
+    result.ffmpeg_cpu = children_after - children_before
+
+    for client in clients:
+        telemetry = client.telemetry
+        socket: StubVoiceSocket = client.socket  # type: ignore
+        if telemetry is not None:
+            result.spawns += len(telemetry.spawn_times)
+            result.underruns += telemetry.underruns
+            for gap in telemetry.gaps:
+                result.gaps.add(gap)
+
+        result.packets += socket.packets
+        result.misses += socket.misses
+        for lateness in socket.lateness.values:
+            result.lateness.add(lateness)
+
+    return result
+
+
+async def run(
+    bot: haruka.Haruka,
+    *,
+    levels: Sequence[int],
+    length: int,
+    files: Sequence[str] = (),
+    latency: float = 0.0,
+    max_miss_ratio: float = 0.001,
+) -> str:
+    """This function is a coroutine
+
+    Run the audio pipeline benchmark: play a track in more and more
+    guilds at once through ``MusicClient._play`` and
+    ``InvidiousSource.fetch``, with the audio served from a local HTTP
+    server and the voice connections stubbed out.
+
+    Each level plays in real time, so a run takes about
+    ``len(levels) * length`` seconds. ffmpeg and ffprobe must be in
+    PATH.
+
+    Parameters
+    -----
+    levels: Sequence[``int``]
+        The numbers of concurrent guilds to measure, in order
+    length: ``int``
+        The played length of each track, in seconds
+    files: Sequence[``str``]
+        The audio files to serve, a sine wave is generated if this
+        is empty
+    latency: ``float``
+        The delay of the audio server before each response, in seconds
+    max_miss_ratio: ``float``
+        The highest ratio of packets missing their deadline that a
+        level may have to count towards the capacity
+
+    Returns
+    -----
+    ``str``
+        The benchmark report
+    """
+    directory = tempfile.mkdtemp(prefix="haruka-audio-benchmark-")
+    try:
+        if files:
+            for path in files:
+                duration = await probe_length(path)
+                if duration < length:
+                    raise ValueError(f"{path} is {duration:.1f}s long, shorter than the track length {length}s")
+        else:
+            path = os.path.join(directory, "sine.webm")
+            await generate_audio(path, length)
+            files = [path]
+
+        # Play from the stream only, the opus cache would skip ffmpeg
+        bot.audio.opus_cache = OpusCache(directory=os.path.join(directory, "opus"), min_plays=2 ** 31)
+
+        http = StubHTTP(bot, first_id=SyntheticGateway.BASE_ID * 2)
+        http.install()
+        gateway = SyntheticGateway(bot, rng=random.Random(0))
+        gateway.setup(guilds=max(levels))
+
+        server = AudioServer(list(files), latency=latency)
+        await server.start()
+        try:
+            results: List[LevelResult] = []
+            for level, guilds in enumerate(levels):
+                results.append(await _play_level(bot, gateway, server, guilds=guilds, length=length, level=level))
+        finally:
+            await server.stop()
+
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    capacity = max((result.guilds for result in results if result.miss_ratio <= max_miss_ratio), default=0)
+    lines = [
+        f"Audio benchmark: {length}s tracks from {len(files)} file(s), server latency {1000 * latency:.0f}ms, {server.requests} audio requests",
+        "",
+        format_table(
+            ("guilds", "elapsed", "ffmpeg/min", "bot cpu/stream", "ffmpeg cpu/stream", "gap p50", "gap max", "underruns", "lateness p99", "deadline misses"),
+            [result.row() for result in results],
+        ),
+        "",
+        "CPU per stream is the CPU time divided by the played stream time, in percent of one core.",
+        f"Capacity: {capacity} concurrent guilds with at most {100 * max_miss_ratio:.2f}% of packets missing their deadline",
+    ]
+    return "\n".join(lines)
+
+
+def parse_levels(levels: str) -> List[int]:
+    """Parse a list of concurrency levels such as ``1,5,10``"""
+    values = [int(level) for level in levels.split(",") if level.strip()]
+    if not values or any(value < 1 for value in values):
+        raise ValueError("Concurrency levels must be positive integers")
+
+    return values
@@ -0,0 +1,435 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import datetime
+import itertools
+import random
+import re
+import time
+from typing import Any, Callable, Counter, Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+import discord
+from discord.http import Route
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context
+
+from lib import emoji_ui
+from .stats import Samples, format_bytes, format_duration, format_table, measure_allocations
+if TYPE_CHECKING:
+    import haruka
+
+
+__all__ = (
+    "KINDS",
+    "StubHTTP",
+    "SyntheticGateway",
+    "parse_mix",
+    "run",
+)
+
+
+KINDS = ("chatter", "command", "slash", "reaction")
+MESSAGE_ROUTE = re.compile(r"/channels/(\d+)/messages(?:/(\d+))?$")
+TIMESTAMP = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc).isoformat()
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """Parse an event mix such as ``chatter=70,command=15``"""
+    weights = {}
+    for item in mix.split(","):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise ValueError(f"Unknown event kind {kind}, must be one of {', '.join(KINDS)}")
+
+        weights[kind] = int(weight)
+
+    return weights
+
+
+def user_payload(id: int, *, bot: bool = False, avatar: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "id": str(id),
+        "username": f"user{id}",
+        "discriminator": "0001",
+        "avatar": avatar,
+        "bot": bot,
+    }
+
+
+def member_payload() -> Dict[str, Any]:
+    return {
+        "roles": [],
+        "joined_at": TIMESTAMP,
+        "deaf": False,
+        "mute": False,
+    }
+
+
+class StubHTTP:
+    """Replace the Discord REST API of a bot with local answers
+
+    Sent and edited messages are echoed back as message payloads,
+    every other route returns nothing. Interaction responses go
+    through a stub webhook adapter.
+
+    Attributes
+    -----
+    calls: Counter[``str``]
+        The number of calls per route
+    """
+
+    __slots__ = ("bot", "calls", "_ids")
+    if TYPE_CHECKING:
+        bot: haruka.Haruka
+        calls: Counter[str]
+        _ids: itertools.count[int]
+
+    def __init__(self, bot: haruka.Haruka, *, first_id: int) -> None:
+        self.bot = bot
+        self.calls = collections.Counter()
+        self._ids = itertools.count(first_id)
+
+    def install(self) -> None:
+        self.bot.http.request = self.request  # type: ignore
+
+        stub = self
+
+        class _StubWebhookAdapter(AsyncWebhookAdapter):
+            async def request(self, route: Route, *args: Any, **kwargs: Any) -> Any:
+                stub.calls[f"{route.method} {route.path}"] += 1
+
+        # Tasks created afterwards inherit this context
+        async_context.set(_StubWebhookAdapter())
+
+    def message(self, channel_id: int, data: Dict[str, Any], *, message_id: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "id": str(message_id or next(self._ids)),
+            "channel_id": str(channel_id),
+            "author": user_payload(self.bot.user.id, bot=True),
+            "content": data.get("content") or "",
+            "timestamp": TIMESTAMP,
+            "edited_timestamp": TIMESTAMP if message_id else None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": data.get("embeds") or [],
+            "pinned": False,
+            "type": 0,
+            "flags": 0,
+        }
+
+    async def request(self, route: Route, *, files: Any = None, form: Any = None, **kwargs: Any) -> Any:
+        self.calls[f"{route.method} {route.path}"] += 1
+        if route.method in ("POST", "PATCH"):
+            match = MESSAGE_ROUTE.search(route.url)
+            if match is not None:
+                message_id = match.group(2)
+                return self.message(int(match.group(1)), kwargs.get("json") or {}, message_id=int(message_id) if message_id else None)
+
+
+class SyntheticGateway:
+    """Feed synthetic gateway events into the ``ConnectionState`` of a bot
+
+    Attributes
+    -----
+    bot: ``haruka.Haruka``
+        The bot to feed
+    guilds: List[``discord.Guild``]
+        The synthetic guilds
+    voice_channels: List[``discord.VoiceChannel``]
+        The voice channel of each synthetic guild
+    """
+
+    __slots__ = ("bot", "guilds", "voice_channels", "rng", "_ids", "_channels", "_paginators", "_parsers")
+    BASE_ID: int = 900000000000000000
+    if TYPE_CHECKING:
+        bot: haruka.Haruka
+        guilds: List[discord.Guild]
+        voice_channels: List[discord.VoiceChannel]
+        rng: random.Random
+        _ids: itertools.count[int]
+        _channels: List[Tuple[int, int]]
+        _paginators: List[emoji_ui.EmojiUI]
+        _parsers: Dict[str, Callable[[Dict[str, Any]], None]]
+
+    def __init__(self, bot: haruka.Haruka, *, rng: random.Random) -> None:
+        self.bot = bot
+        self.guilds = []
+        self.voice_channels = []
+        self.rng = rng
+        self._ids = itertools.count(self.BASE_ID + 1)
+        self._channels = []
+        self._paginators = []
+
+        state = bot._connection
+        self._parsers = {
+            "chatter": state.parse_message_create,
+            "command": state.parse_message_create,
+            "slash": state.parse_interaction_create,
+            "reaction": state.parse_message_reaction_add,
+        }
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def setup(self, *, guilds: int) -> None:
+        """Log in as a synthetic user and create the guilds"""
+        state = self.bot._connection
+        state.user = discord.ClientUser(state=state, data=user_payload(self.BASE_ID, bot=True, avatar="0" * 32))  # type: ignore
+
+        for _ in range(guilds):
+            guild_id = self.next_id()
+            channel_id = self.next_id()
+            voice_channel_id = self.next_id()
+            data = {
+                "id": str(guild_id),
+                "name": f"guild{guild_id}",
+                "owner_id": str(self.next_id()),
+                "member_count": 2,
+                "roles": [
+                    {
+                        "id": str(guild_id),
+                        "name": "@everyone",
+                        "permissions": str(discord.Permissions.general().value | discord.Permissions.text().value),
+                        "position": 0,
+                        "color": 0,
+                        "hoist": False,
+                        "managed": False,
+                        "mentionable": False,
+                    },
+                ],
+                "channels": [
+                    {
+                        "id": str(channel_id),
+                        "type": 0,
+                        "name": "general",
+                        "position": 0,
+                        "permission_overwrites": [],
+                        "nsfw": False,
+                    },
+                    {
+                        "id": str(voice_channel_id),
+                        "type": 2,
+                        "name": "music",
+                        "position": 1,
+                        "permission_overwrites": [],
+                        "bitrate": 64000,
+                        "user_limit": 0,
+                    },
+                ],
+                "members": [{"user": user_payload(self.BASE_ID, bot=True), **member_payload()}],
+            }
+            guild = state._add_guild_from_data(data)  # type: ignore
+            self.guilds.append(guild)
+            self.voice_channels.append(guild.get_channel(voice_channel_id))  # type: ignore
+            self._channels.append((guild_id, channel_id))
+
+    async def start_paginators(self, count: int) -> None:
+        """This function is a coroutine
+
+        Start emoji-based paginators that wait for reactions, as
+        commands such as ``help`` and ``queue`` do
+        """
+        for _ in range(count):
+            guild_id, channel_id = self.rng.choice(self._channels)
+            channel = self.bot.get_channel(channel_id)
+            pages = [discord.Embed(description=f"Page {index}") for index in range(len(emoji_ui.CHOICES))]
+            paginator = emoji_ui.Pagination(self.bot, pages)
+            asyncio.create_task(paginator.send(channel))  # type: ignore
+            self._paginators.append(paginator)
+
+        # Let the paginators send their messages and start waiting
+        while any(paginator.message is None for paginator in self._paginators):
+            await asyncio.sleep(0)
+
+        await asyncio.sleep(0.1)
+
+    def message_create(self, content: str) -> Dict[str, Any]:
+        guild_id, channel_id = self.rng.choice(self._channels)
+        return {
+            "id": str(self.next_id()),
+            "channel_id": str(channel_id),
+            "guild_id": str(guild_id),
+            # Every message has a new author so that command cooldowns are never hit
+            "author": user_payload(self.next_id()),
+            "member": member_payload(),
+            "content": content,
+            "timestamp": TIMESTAMP,
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0,
+            "flags": 0,
+        }
+
+    def interaction_create(self) -> Dict[str, Any]:
+        guild_id, channel_id = self.rng.choice(self._channels)
+        return {
+            "id": str(self.next_id()),
+            "application_id": str(self.BASE_ID),
+            "type": 2,
+            "token": "synthetic",
+            "version": 1,
+            "guild_id": str(guild_id),
+            "channel_id": str(channel_id),
+            "member": {"user": user_payload(self.next_id()), "permissions": "0", **member_payload()},
+            "locale": "en-US",
+            "guild_locale": "en-US",
+            "data": {
+                "id": str(self.BASE_ID),
+                "name": "roll",
+                "type": 1,
+                "options": [
+                    {"name": "first_integer", "type": 4, "value": 1},
+                    {"name": "second_integer", "type": 4, "value": 100},
+                ],
+            },
+        }
+
+    def reaction_add(self) -> Dict[str, Any]:
+        paginator = self.rng.choice(self._paginators)
+        message = paginator.message
+        return {
+            "user_id": str(self.next_id()),
+            "channel_id": str(message.channel.id),  # type: ignore
+            "message_id": str(message.id),  # type: ignore
+            "guild_id": str(message.guild.id),  # type: ignore
+            "emoji": {"id": None, "name": self.rng.choice(paginator.allowed_emojis)},
+            "member": {"user": user_payload(self.next_id()), **member_payload()},
+        }
+
+    def payload(self, kind: str) -> Dict[str, Any]:
+        if kind == "chatter":
+            return self.message_create(f"just chatting {self.rng.random()}")
+        if kind == "command":
+            return self.message_create("$ping")
+        if kind == "slash":
+            return self.interaction_create()
+        if kind == "reaction":
+            return self.reaction_add()
+
+        raise ValueError(f"Unknown event kind {kind}")
+
+    async def feed(self, kind: str, payload: Dict[str, Any]) -> float:
+        """This function is a coroutine
+
+        Parse an event and wait for every task it spawned
+
+        Returns
+        -----
+        ``float``
+            The time until all spawned tasks completed, in seconds
+        """
+        started = time.perf_counter()
+        before = asyncio.all_tasks()
+        self._parsers[kind](payload)
+        spawned = asyncio.all_tasks() - before
+        if spawned:
+            await asyncio.wait(spawned)
+
+        return time.perf_counter() - started
+
+
+async def _drive(gateway: SyntheticGateway, events: Sequence[Tuple[str, Dict[str, Any]]], samples: Dict[str, Samples], concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = []
+
+    async def process(kind: str, payload: Dict[str, Any]) -> None:
+        try:
+            samples[kind].add(await gateway.feed(kind, payload))
+        finally:
+            semaphore.release()
+
+    started = time.perf_counter()
+    for kind, payload in events:
+        await semaphore.acquire()
+        tasks.append(asyncio.create_task(process(kind, payload)))
+
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - started
+
+
+async def run(
+    bot: haruka.Haruka,
+    *,
+    events: int,
+    mix: Dict[str, int],
+    concurrency: int,
+    guilds: int,
+    paginators: int,
+    allocation_events: int,
+    warmup: int,
+    seed: Optional[int] = None,
+) -> str:
+    """This function is a coroutine
+
+    Run the gateway benchmark. The bot must already have a database
+    connection pool.
+
+    Returns
+    -----
+    ``str``
+        The benchmark report
+    """
+    rng = random.Random(seed)
+    http = StubHTTP(bot, first_id=SyntheticGateway.BASE_ID * 2)
+    http.install()
+
+    # Synthetic users are never the owner, so the blacklist and counting paths are exercised
+    bot.owner_id = SyntheticGateway.BASE_ID - 1
+
+    gateway = SyntheticGateway(bot, rng=rng)
+    gateway.setup(guilds=guilds)
+    if mix.get("reaction"):
+        await gateway.start_paginators(paginators)
+
+    kinds = [kind for kind, weight in mix.items() if weight > 0]
+    weights = [mix[kind] for kind in kinds]
+
+    # Import lazily loaded commands and fill the caches before measuring
+    for kind in kinds:
+        for _ in range(warmup):
+            await gateway.feed(kind, gateway.payload(kind))
+
+    http.calls.clear()
+    plan = [(kind, gateway.payload(kind)) for kind in rng.choices(kinds, weights, k=events)]
+    samples = {kind: Samples(kind) for kind in kinds}
+    elapsed = await _drive(gateway, plan, samples, concurrency)
+    calls = http.calls.copy()
+
+    allocations = {}
+    for kind in kinds:
+        allocations[kind] = await measure_allocations(lambda: gateway.feed(kind, gateway.payload(kind)), allocation_events)
+
+    rows = []
+    for kind in kinds:
+        retained, peak = allocations[kind]
+        kind_samples = samples[kind]
+        rows.append((
+            kind,
+            len(kind_samples),
+            f"{len(kind_samples) / elapsed:.1f}/s",
+            format_duration(kind_samples.percentile(50)),
+            format_duration(kind_samples.percentile(99)),
+            format_duration(kind_samples.percentile(100)),
+            format_bytes(retained),
+            format_bytes(peak),
+        ))
+
+    lines = [
+        f"Gateway benchmark: {events} events in {elapsed:.3f}s ({events / elapsed:.1f} events/s), concurrency {concurrency}, {guilds} guilds, {len(gateway._paginators)} paginators",
+        "",
+        format_table(("event", "count", "throughput", "p50", "p99", "max", "retained/event", f"peak ({allocation_events} events)"), rows),
+        "",
+        "Discord API calls during the measured run:",
+    ]
+    lines.extend(f"{count:>8} {route}" for route, count in calls.most_common())
+    return "\n".join(lines)
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import glob
+import json
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple, Type, TYPE_CHECKING
+
+from lib import mal
+from lib.mal import parser
+from lib.tests import FIXTURES_DIRECTORY
+from .stats import Samples, format_duration, format_table
+
+
+__all__ = (
+    "Page",
+    "load_pages",
+    "run",
+)
+
+
+URL_PATTERN = re.compile(r"https://myanimelist\.net/(anime|manga)(?:/(\d+)|\.php)")
+OG_URL_PATTERN = re.compile(r'<meta property="og:url" content="(https://myanimelist\.net/[^"]*)"')
+
+
+class Page:
+    """A saved MyAnimeList page
+
+    Attributes
+    -----
+    name: ``str``
+        The file name
+    kind: ``str``
+        Either "anime", "manga" or "search"
+    id: Optional[``int``]
+        The object ID, ``None`` for search pages
+    html: ``str``
+        The page content
+    """
+
+    __slots__ = ("name", "kind", "id", "html")
+    if TYPE_CHECKING:
+        name: str
+        kind: str
+        id: Optional[int]
+        html: str
+
+    def __init__(self, name: str, kind: str, id: Optional[int], html: str) -> None:
+        self.name = name
+        self.kind = kind
+        self.id = id
+        self.html = html
+
+    @classmethod
+    def from_url(cls: Type[Page], name: str, url: str, html: str) -> Optional[Page]:
+        match = URL_PATTERN.match(url)
+        if match is None:
+            return
+
+        kind, id = match.groups()
+        if id is None:
+            return cls(name, "search", None, html)
+
+        return cls(name, kind, int(id), html)
+
+    def parse(self, features: str, strainer: bool) -> Any:
+        """Parse this page the same way as the library does, with the
+        given tree builder and with or without the strainer
+        """
+        if self.kind == "search":
+            soup = parser.parse(self.html, parser.SEARCH_STRAINER if strainer else None, features=features)
+            tags = soup.find_all(name="td", attrs={"class": "borderClass bgColor0"}, limit=12)
+            return [mal.MALSearchResult(tag.find("a").get("href"), tag.find("a").get_text()) for index, tag in enumerate(tags) if index % 2 == 1]
+
+        cls = mal.Anime if self.kind == "anime" else mal.Manga
+        soup = parser.parse(self.html, parser.OBJECT_STRAINER if strainer else None, features=features)
+        return cls(self.id, soup)
+
+
+def _fields(result: Any) -> Any:
+    if isinstance(result, list):
+        return [_fields(item) for item in result]
+
+    fields = {}
+    for cls in type(result).__mro__:
+        for slot in getattr(cls, "__slots__", ()):
+            fields[slot] = getattr(result, slot, None)
+
+    return fields
+
+
+def load_pages(paths: Sequence[str]) -> List[Page]:
+    """Load saved pages
+
+    Parameters
+    -----
+    paths: Sequence[``str``]
+        HTML files or JSON fixtures recorded by the self-tests. If
+        empty, all MyAnimeList fixtures are loaded.
+
+    Returns
+    -----
+    List[``Page``]
+        The pages that were recognized
+    """
+    if not paths:
+        paths = sorted(glob.glob(os.path.join(FIXTURES_DIRECTORY, "myanimelist.net-*.json")))
+
+    pages = []
+    for path in paths:
+        name = os.path.basename(path)
+        if path.endswith(".json"):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            url = data["url"]
+            html = base64.b64decode(data["body"]).decode("utf-8")
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                html = f.read()
+
+            match = OG_URL_PATTERN.search(html)
+            url = match.group(1) if match is not None else "https://myanimelist.net/anime.php"
+
+        page = Page.from_url(name, url, html)
+        if page is None:
+            print(f"Skipping {path}: not a MyAnimeList anime, manga or search page")
+        else:
+            pages.append(page)
+
+    return pages
+
+
+def _variants() -> List[Tuple[str, str, bool]]:
+    variants = [("html.parser (full)", "html.parser", False), ("html.parser + strainer", "html.parser", True)]
+    if parser.FEATURES == "lxml":
+        variants.extend([("lxml (full)", "lxml", False), ("lxml + strainer", "lxml", True)])
+
+    return variants
+
+
+async def _max_stall(operation: Callable[[], Awaitable[Any]]) -> float:
+    # The longest time the event loop could not run a ticking task
+    stall = 0.0
+    running = True
+
+    async def tick() -> None:
+        nonlocal stall
+        last = time.perf_counter()
+        while running:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            stall = max(stall, now - last)
+            last = now
+
+    ticker = asyncio.create_task(tick())
+    await asyncio.sleep(0)
+    try:
+        await operation()
+    finally:
+        running = False
+        await ticker
+
+    return stall
+
+
+async def run(pages: Sequence[Page], *, repeat: int) -> str:
+    """This function is a coroutine
+
+    Parse every page with each tree builder, with and without the
+    strainer, and compare with the previous behaviour (the full page
+    parsed with html.parser).
+
+    Parameters
+    -----
+    pages: Sequence[``Page``]
+        The pages to parse
+    repeat: ``int``
+        The number of measured runs per page and variant
+
+    Returns
+    -----
+    ``str``
+        The report
+    """
+    if not pages:
+        return f"No pages to parse, pass HTML files or record the self-tests fixtures to {FIXTURES_DIRECTORY}"
+
+    variants = _variants()
+    rows = []
+    for page in pages:
+        expected = _fields(page.parse("html.parser", False))
+        baseline = None
+        for label, features, strainer in variants:
+            samples = Samples(label)
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = page.parse(features, strainer)
+                samples.add(time.perf_counter() - started)
+
+            if baseline is None:
+                baseline = samples.mean
+
+            rows.append((
+                page.name,
+                page.kind,
+                f"{len(page.html) / 1024:.0f}KiB",
+                label,
+                format_duration(samples.mean),
+                format_duration(samples.percentile(50)),
+                f"x{baseline / samples.mean:.1f}",
+                "ok" if _fields(result) == expected else "MISMATCH",
+            ))
+
+    # Event loop stall while parsing all pages with the library settings
+    async def parse_inline() -> None:
+        for page in pages:
+            page.parse(parser.FEATURES, True)
+
+    async def parse_executor() -> None:
+        for page in pages:
+            await parser.parse_in_executor(page.parse, parser.FEATURES, True)
+
+    inline = await _max_stall(parse_inline)
+    executor = await _max_stall(parse_executor)
+
+    report = [
+        f"Parsed {len(pages)} page(s) {repeat} times each, tree builder used by the bot: {parser.FEATURES}",
+        format_table(("page", "kind", "size", "variant", "mean", "p50", "speedup", "fields"), rows),
+        "",
+        format_table(
+            ("library settings", "longest event loop stall"),
+            [("parsing on the event loop", format_duration(inline)), ("parse_in_executor", format_duration(executor))],
+        ),
+    ]
+    return "\n".join(report)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import gc
+import math
+import tracemalloc
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+
+__all__ = (
+    "Samples",
+    "format_bytes",
+    "format_duration",
+    "format_table",
+    "measure_allocations",
+)
+
+
+class Samples:
+    """Latency samples of one kind of operation
+
+    Attributes
+    -----
+    name: ``str``
+        The operation name
+    values: List[``float``]
+        The recorded latencies, in seconds
+    """
+
+    __slots__ = ("name", "values", "_sorted")
+    if TYPE_CHECKING:
+        name: str
+        values: List[float]
+        _sorted: Optional[List[float]]
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.values = []
+        self._sorted = None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def add(self, value: float) -> None:
+        self.values.append(value)
+        self._sorted = None
+
+    def percentile(self, q: float) -> float:
+        """Get a percentile with the nearest-rank method
+
+        Parameters
+        -----
+        q: ``float``
+            The percentile, between 0 and 100
+        """
+        if not self.values:
+            return math.nan
+
+        if self._sorted is None:
+            self._sorted = sorted(self.values)
+
+        index = max(0, math.ceil(q / 100 * len(self._sorted)) - 1)
+        return self._sorted[index]
+
+    @property
+    def mean(self) -> float:
+        return sum(self.values) / len(self.values) if self.values else math.nan
+
+
+def format_table(headers: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+    """Format rows as a left-aligned plain text table"""
+    cells = [[str(cell) for cell in row] for row in [headers, *rows]]
+    widths = [max(len(row[column]) for row in cells) for column in range(len(headers))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in cells]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+async def measure_allocations(operation: Callable[[], Awaitable[Any]], count: int) -> Tuple[float, float]:
+    """This function is a coroutine
+
+    Run an operation repeatedly while tracing memory allocations.
+
+    Parameters
+    -----
+    operation: Callable[[], Awaitable[Any]]
+        The operation to run
+    count: ``int``
+        The number of runs
+
+    Returns
+    -----
+    Tuple[``float``, ``float``]
+        The memory still allocated after the runs, in bytes per run,
+        and the peak memory allocated above the baseline during the
+        runs, in bytes
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _ in range(count):
+            await operation()
+
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return (current - baseline) / count, peak - baseline
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f}{unit}"
+
+        size /= 1024
+
+    return f"{size:.1f}GiB"
+
+
+def format_duration(seconds: float) -> str:
+    if math.isnan(seconds):
+        return "-"
+
+    return f"{1000 * seconds:.2f}ms"
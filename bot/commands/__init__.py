@@ -1,9 +1,16 @@
 #!/bot/commands
-import pkgutil
+import os
 
+import env
+from core import bot
+from lib.registry import CommandRegistry
 
-__all__ = []
-for loader, module_name, is_pkg in pkgutil.walk_packages(__path__):
-    __all__.append(module_name)
-    _module = loader.find_module(module_name).load_module(module_name)  # type: ignore
-    globals()[module_name] = _module
+
+__all__ = ("registry",)
+
+
+# Every module is imported during the build check, which regenerates the manifest
+registry = CommandRegistry(bot, __name__, __path__, manifest_path=os.path.join(os.path.dirname(__file__), "manifest.json"))
+registry.load(lazy=not env.BUILD_CHECK)
+registry.save()
+bot.log(registry.report())
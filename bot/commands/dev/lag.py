@@ -0,0 +1,25 @@
+import io
+
+import discord
+from discord.ext import commands
+
+from _types import Context
+from core import bot
+from lib import utils
+
+
+@bot.command(
+    name="lag",
+    description="View the most recent event loop stalls and the stacks that caused them",
+    usage="lag <count>",
+)
+@commands.is_owner()
+async def _lag_cmd(ctx: Context, count: int = 10):
+    monitor = bot.loop_monitor
+    records = monitor.recent(count)
+    if not records:
+        return await ctx.send(f"No event loop stalls longer than {utils.format(monitor.threshold)} were recorded.")
+
+    summary = "\n".join(f"`{record.started_at:%H:%M:%S}` blocked for **{utils.format(record.duration)}** ({record.samples} samples)" for record in records)
+    report = "\n\n".join(f"Stall at {record.started_at} for {record.duration:.3f}s ({record.samples} samples)\n" + ("".join(record.stack) or "No stack was captured\n") for record in records)
+    await ctx.send(summary, file=discord.File(io.BytesIO(report.encode("utf-8")), filename="lag.txt"))
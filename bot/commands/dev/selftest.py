@@ -0,0 +1,31 @@
+import io
+from typing import Literal, Optional
+
+import discord
+from discord.ext import commands
+
+import env
+from _types import Context
+from core import bot
+from lib import tests
+
+
+@bot.command(
+    name="selftest",
+    description="Run the self-test suites concurrently and compare the results with the previous run.\nThe indicated `mode` must be `live`, `record` (also save the responses as fixtures) or `replay` (run against the recorded fixtures), it defaults to the mode of the scheduled self-tests. All suites are run if none is specified.\nAvailable suites: " + ", ".join(f"`{name}`" for name in tests.SUITES),
+    usage="selftest <suites>\nselftest <mode> <suites>",
+)
+@commands.is_owner()
+async def _selftest_cmd(ctx: Context, mode: Optional[Literal["live", "record", "replay"]] = None, *suites: str):
+    # A first argument that is not a mode is a suite name
+    async with ctx.typing():
+        try:
+            run = await tests.run_tests(bot, suites=suites or None, mode=mode or env.SELF_TEST_MODE)
+        except ValueError as exc:
+            return await ctx.send(str(exc))
+
+        previous = await run.previous(bot.conn)
+        await run.save(bot.conn)
+
+        log = io.BytesIO(run.log.encode("utf-8"))
+        await ctx.send(f"```\n{run.summary(previous)}\n```", file=discord.File(log, filename="selftest.txt"))
@@ -1,26 +1,32 @@
-import tracemalloc
+import io
 from typing import Literal
 
+import discord
 from discord.ext import commands
 
 from _types import Context
 from core import bot
+from lib import profiler
 
 
 @bot.command(
     name="trace",
-    description="Display size of all memory blocks allocated by Python.\nThe indicated `keytype` must be `filename`, `lineno`, or `traceback`, which are the arguments stated in the [documentation](https://docs.python.org/3.9/library/tracemalloc.html#tracemalloc.Snapshot.statistics)",
-    usage="trace <keytype>",
+    description="Profile the bot for a number of seconds and send the report along with a flame graph compatible file (folded stacks).\nThe indicated `mode` must be `memory` or `cpu`. In `memory` mode, `keytype` must be `filename`, `lineno`, or `traceback`, which are the arguments stated in the [documentation](https://docs.python.org/3.9/library/tracemalloc.html#tracemalloc.Snapshot.statistics)",
+    usage="trace <mode> <seconds> <keytype>",
 )
 @commands.is_owner()
-async def _trace_cmd(ctx: Context, keytype: Literal["filename", "lineno", "traceback"] = "filename"):
+async def _trace_cmd(ctx: Context, mode: Literal["memory", "cpu"] = "memory", duration: float = 10.0, keytype: Literal["filename", "lineno", "traceback"] = "lineno"):
     async with ctx.typing():
-        snap = tracemalloc.take_snapshot()
+        try:
+            if mode == "memory":
+                report = await bot.profiler.trace_memory(duration, keytype=keytype)
+            else:
+                report = await bot.profiler.sample_cpu(duration)
 
-        total_size = sum(trace.size for trace in snap.traces)
-        report = "Currently allocating `{:.2f}` MB of memory".format(total_size / 1024 ** 2)
+        except profiler.ProfilerBusy:
+            return await ctx.send("Another profiling session is running.")
+        except ValueError as exc:
+            return await ctx.send(str(exc))
 
-        stats = snap.statistics(keytype, cumulative=True if not keytype == "traceback" else False)
-        report += "\nShowing the top 8:```\n" + "\n".join("{:.2f} MB".format(stat.size / 1024 ** 2) + f":: {stat.traceback}" for stat in stats[:8]) + "\n```"
-
-        await ctx.send(report)
+        folded = io.BytesIO(report.folded().encode("utf-8"))
+        await ctx.send(f"```\n{report.text(8)}\n```", file=discord.File(folded, filename=f"{mode}.folded"))
@@ -200,7 +200,8 @@ async def _remind_cmd(ctx: Context, hours: int, minutes: int, *, content: str):
         f"INSERT INTO remind VALUES ('{ctx.author.id}', $1, $2, $3, $4);",
         time, content, ctx.message.jump_url, now,
     )
-    bot.reminder.restart()
+    # The reminder loop only runs in the primary process of the cluster
+    await bot.cluster.notify(bot.REMINDER_CHANNEL)
 
     embed = discord.Embed()
     embed.add_field(
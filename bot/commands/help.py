@@ -17,8 +17,10 @@ IGNORE = (
     "cancel",
     "eval",
     "exec",
+    "lag",
     "log",
     "raise",
+    "selftest",
     "sql",
     "sh",
     "ssh",
@@ -101,13 +103,12 @@ class CustomHelpCommand(commands.MinimalHelpCommand):
         # Fetch server's prefix
         pref = await prefix(bot, self.context.message)
 
-        if command.aliases and command.qualified_name not in command.aliases:
-            command.aliases.insert(0, command.qualified_name)
-        elif not command.aliases:
-            command.aliases = [command.qualified_name]
+        # Do not modify the command itself, the bot looks up its aliases when removing it
+        aliases = list(command.aliases)
+        if command.qualified_name not in aliases:
+            aliases.insert(0, command.qualified_name)
 
-        command.usage = command.usage if command.usage else command.qualified_name
-        usage = command.usage.replace("\n", f"\n{pref}")
+        usage = (command.usage or command.qualified_name).replace("\n", f"\n{pref}")
 
         description = command.description.format(prefix=pref)
 
@@ -126,7 +127,7 @@ class CustomHelpCommand(commands.MinimalHelpCommand):
 
         embed = discord.Embed(
             title=command.qualified_name,
-            description=f"```\n{pref}{usage}\n```\n**Description**\n{description}\n**Aliases**\n" + ", ".join(f"`{alias}`" for alias in command.aliases) + "\n" + cooldown_notify,
+            description=f"```\n{pref}{usage}\n```\n**Description**\n{description}\n**Aliases**\n" + ", ".join(f"`{alias}`" for alias in aliases) + "\n" + cooldown_notify,
         )
         embed.set_author(name=f"{self.context.author.name}, this is an instruction for {command.qualified_name}!", icon_url=self.context.author.avatar.url if self.context.author.avatar else None)
         await self.context.send(embed=embed)
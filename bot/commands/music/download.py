@@ -32,7 +32,7 @@ async def _download_cmd(ctx: Context):
             if track is None:
                 tasks.append(utils.coro_func(None))
             else:
-                tasks.append(bot.audio.fetch(track))
+                tasks.append(bot.audio.fetch(track, priority=audio.TranscodePriority.BATCH))
 
         embeds = []
         results = await asyncio.gather(*tasks)
@@ -51,7 +51,7 @@ async def _download_cmd(ctx: Context):
                 embeds.append(embed)
             else:
                 track = tracks[index]
-                embeds.append(bot.audio.create_audio_embed(track))
+                embeds.append(bot.audio.create_audio_embed(track, audio.ArtifactFormat.OGG))
 
         display = emoji_ui.Pagination(bot, embeds)
 
@@ -13,7 +13,7 @@ from web.routes import audio
 @commands.cooldown(1, 2, commands.BucketType.user)
 async def _unregister_cmd(ctx: Context):
     try:
-        audio.voice_manager.pop(ctx.guild.id)
+        await audio.voice_manager.pop(ctx.guild.id)
     except KeyError:
         await ctx.send("The voice client in this server hasn't been registered yet")
     else:
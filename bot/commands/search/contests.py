@@ -12,11 +12,14 @@ from lib import codeforces, emoji_ui
 )
 @commands.cooldown(1, 8, commands.BucketType.user)
 async def _contests_cmd(ctx: Context):
+    catalog = codeforces.contest_catalog
     try:
-        contests = await codeforces.Contest.list(session=bot.session, limit=30)
+        await catalog.ensure(session=bot.session)
     except codeforces.CodeforcesException as exc:
         return await ctx.send(exc.comment)
 
+    contests = catalog.latest(30)
+
     embeds = [contest.create_embed() for contest in contests]
     breakpoint = None
     for index, contest in enumerate(contests):
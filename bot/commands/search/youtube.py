@@ -10,7 +10,7 @@ from lib import audio, emoji_ui, emojis, utils
 @bot.command(
     name="youtube",
     aliases=["yt"],
-    description="Search for a YouTube video and get the mp3 file.",
+    description="Search for a YouTube video and get the audio file.",
     usage="youtube <query>",
 )
 @commands.cooldown(1, 15, commands.BucketType.user)
@@ -38,10 +38,8 @@ async def _youtube_cmd(ctx: Context, *, query: str):
     if track_index is None:
         return
 
-    track = await bot.audio.build(audio.InvidiousSource, results[track_index].id)
-    if track is None:
-        return await ctx.send(f"{emojis.MIKUCRY} Cannot gather information about this video!")
-
+    # The search result has all the information needed, the audio URL is resolved by fetch
+    track = audio.InvidiousSource.from_search_result(results[track_index])
     async with ctx.typing():
         with utils.TimingContextManager() as measure:
             url = await bot.audio.fetch(track)
@@ -49,6 +47,6 @@ async def _youtube_cmd(ctx: Context, *, query: str):
     if url is None:
         return await ctx.send(f"{emojis.MIKUCRY} Cannot fetch audio for this video!")
 
-    embed = bot.audio.create_audio_embed(track)
+    embed = bot.audio.create_audio_embed(track, audio.ArtifactFormat.OGG)
     embed.set_footer(text=f"Fetched audio in {utils.format(measure.result)}")
     await ctx.send(embed=embed)
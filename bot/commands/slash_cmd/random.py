@@ -2,7 +2,6 @@ import random
 from typing import Literal
 
 from discord import app_commands
-from youtube_dl import utils
 
 from _types import Interaction
 from core import bot
@@ -15,6 +14,6 @@ from core import bot
 @app_commands.describe(category="The category to get random data")
 async def _random_slash(interaction: Interaction, category: Literal["user-agent", "number"]):
     if category == "user-agent":
-        await interaction.response.send_message("```\n" + utils.random_user_agent() + "\n```")
+        await interaction.response.send_message("```\n" + await bot.audio.extractor.user_agent() + "\n```")
     else:
         await interaction.response.send_message(random.random())
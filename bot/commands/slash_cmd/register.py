@@ -15,7 +15,7 @@ from web.routes import audio
 async def _register_slash(interaction: Interaction):
     client = interaction.guild.voice_client
     if client and client.is_connected():
-        key = audio.voice_manager.push(interaction.guild.id)
+        key = await audio.voice_manager.push(interaction.guild.id)
         url = HOST + f"/audio-control?key={key}"
         await interaction.response.send_message(f"You can now control the music player via {url}")
 
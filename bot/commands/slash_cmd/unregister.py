@@ -13,7 +13,7 @@ from web.routes import audio
 @app_commands.guild_only()
 async def _unregister_slash(interaction: Interaction):
     try:
-        audio.voice_manager.pop(interaction.guild.id)
+        await audio.voice_manager.pop(interaction.guild.id)
     except KeyError:
         await interaction.response.send_message("The voice client in this server hasn't been registered yet")
     else:
@@ -5,16 +5,16 @@ from discord import app_commands
 
 from _types import Interaction
 from core import bot
-from lib import audio, emojis, ui, utils
+from lib import audio, ui, utils
 
 
 @bot.slash(
     name="youtube",
-    description="Search for a YouTube video and get the mp3 file",
+    description="Search for a YouTube video and get the audio file",
     official_client=False,
 )
-@app_commands.describe(query="The searching query")
-async def _youtube_slash(interaction: Interaction, query: str):
+@app_commands.describe(query="The searching query", mp3="Whether to convert the audio to MP3, this takes longer")
+async def _youtube_slash(interaction: Interaction, query: str, mp3: bool = False):
     await interaction.response.defer()
     if len(query) < 3:
         return await interaction.followup.send(content="Please provide at least 3 characters in the searching query.")
@@ -38,14 +38,13 @@ async def _youtube_slash(interaction: Interaction, query: str):
         track_id = await menu.result()
     except asyncio.TimeoutError:
         return
-    else:
-        track = await bot.audio.build(audio.InvidiousSource, track_id)
 
-    if track is None:
-        return await interaction.followup.send(f"{emojis.MIKUCRY} Cannot fetch track ID `{track_id}`")
+    # The search result has all the information needed, the audio URL is resolved by fetch
+    track = audio.InvidiousSource.from_search_result(next(result for result in results if result.id == track_id))
 
+    format = audio.ArtifactFormat.MP3 if mp3 else audio.ArtifactFormat.OGG
     with utils.TimingContextManager() as measure:
-        url = await bot.audio.fetch(track)
+        url = await bot.audio.fetch(track, format=format)
 
     if url is None:
         embed = track.create_embed()
@@ -53,7 +52,7 @@ async def _youtube_slash(interaction: Interaction, query: str):
         await interaction.followup.send(embed=embed)
 
     else:
-        embed = bot.audio.create_audio_embed(track)
+        embed = bot.audio.create_audio_embed(track, format)
         embed.set_footer(text=f"Fetched data in {utils.format(measure.result)}")
         button = discord.ui.Button(style=discord.ButtonStyle.link, url=url, label="Audio URL")
         view = discord.ui.View()
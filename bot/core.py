@@ -3,16 +3,18 @@ import gc
 import logging
 import os
 import sys
+import time
 import traceback
-import tracemalloc
-from typing import Any, List
+from typing import Any, List, Union
 
 import discord
+from discord import app_commands
 from discord.ext import commands
 
+import env
 import haruka
-from _types import Context
-from lib import trees
+from _types import Context, Interaction
+from lib import metrics, trees
 
 
 # uvloop does not support Windows
@@ -24,7 +26,6 @@ else:
     asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 
-tracemalloc.start()  # noqa
 print(f"Running on {sys.platform}\nPython {sys.version}")
 
 
@@ -49,8 +50,10 @@ if not os.path.isdir("./bot/web/assets/images"):
     os.mkdir("./bot/web/assets/images")
 
 
-with open("./bot/web/assets/log.txt", "w") as f:
-    f.write(f"HARUKA BOT\nRunning on Python {sys.version}\n" + "-" * 50 + "\n")
+# The processes of a cluster share the log file, which launcher.py truncates
+if env.CLUSTER_COUNT == 1:
+    with open("./bot/web/assets/log.txt", "w") as f:
+        f.write(f"HARUKA BOT\nRunning on Python {sys.version}\n" + "-" * 50 + "\n")
 
 
 # Setup logging
@@ -142,6 +145,8 @@ async def _blacklist_check(ctx: Context) -> bool:
 
 @bot.before_invoke
 async def _before_invoke(ctx: Context) -> None:
+    ctx.invoked_at = time.perf_counter()  # type: ignore
+
     # Count text commands
     if ctx.command.root_parent:
         return
@@ -156,6 +161,18 @@ async def _before_invoke(ctx: Context) -> None:
     bot._command_count[name].append(ctx)
 
 
+@bot.after_invoke
+async def _after_invoke(ctx: Context) -> None:
+    invoked_at = getattr(ctx, "invoked_at", None)
+    if invoked_at is not None:
+        metrics.COMMAND_LATENCY.observe(time.perf_counter() - invoked_at, command=ctx.command.qualified_name, kind="text")
+
+
+@bot.event
+async def on_app_command_completion(interaction: Interaction, command: Union[app_commands.Command, app_commands.ContextMenu]) -> None:
+    bot.tree.observe_latency(interaction)
+
+
 @bot.event
 async def on_ready() -> None:
     bot.log(f"Logged in as {bot.user}")
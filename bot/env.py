@@ -15,6 +15,19 @@ HOST = os.environ.get("HOST", "http://localhost").strip("/")
 PORT = int(os.environ.get("PORT", 8080))
 TOPGG_TOKEN = os.environ.get("TOPGG_TOKEN")
 SECONDARY_TOKEN = os.environ.get("SECONDARY_TOKEN")
+DEBUG_TOKEN = os.environ.get("DEBUG_TOKEN")  # Required by debugging routes of the web server
+SELF_TEST_INTERVAL = float(os.environ.get("SELF_TEST_INTERVAL", 0))  # Hours between scheduled self-tests, disabled if 0
+SELF_TEST_MODE = os.environ.get("SELF_TEST_MODE", "live")  # "live", "record" or "replay"
+UPSTREAM_URL = os.environ.get("UPSTREAM_URL")  # Send all requests of the bot session to the fake upstream server (upstream.py)
+HTTP_LIMIT_PER_HOST = int(os.environ.get("HTTP_LIMIT_PER_HOST", 20))  # Connections per host of the API session, see lib/sessions.py
+HTTP_DOWNLOAD_LIMIT = int(os.environ.get("HTTP_DOWNLOAD_LIMIT", 8))  # Connections of the download session, see lib/sessions.py
+
+
+# Cluster mode, see launcher.py
+CLUSTER_COUNT = int(os.environ.get("CLUSTER_COUNT", 1))  # Number of bot processes
+CLUSTER_ID = int(os.environ.get("CLUSTER_ID", 0))  # Index of this process, set by launcher.py
+SHARD_COUNT = int(os.environ.get("SHARD_COUNT", 0))  # Total number of shards, 0 to use the count recommended by Discord
+CLUSTER_PORT = int(os.environ.get("CLUSTER_PORT", PORT + 1))  # Internal web server port of cluster 0, cluster i listens on CLUSTER_PORT + i
 
 
 # For double-hosting purpose
@@ -1,9 +1,11 @@
 #!/bot/events
+import importlib
 import pkgutil
 
 
 __all__ = []
-for loader, module_name, is_pkg in pkgutil.walk_packages(__path__):
+for module_info in pkgutil.walk_packages(__path__, prefix=__name__ + "."):
+    _module = importlib.import_module(module_info.name)
+    module_name = module_info.name[len(__name__) + 1:]
     __all__.append(module_name)
-    _module = loader.find_module(module_name).load_module(module_name)  # type: ignore
     globals()[module_name] = _module
@@ -6,24 +6,24 @@ import datetime
 import io
 import signal
 import traceback
-from typing import Any, Callable, Deque, Dict, List, Optional, Union, TYPE_CHECKING
+from typing import Any, Callable, ClassVar, Deque, Dict, List, Optional, Union, TYPE_CHECKING
 
 import aiohttp
 import asyncpg
 import discord
 import topgg
-import youtube_dl
 from aiohttp import web
 from discord import app_commands
 from discord.ext import commands, tasks
 from discord.state import ConnectionState
 from discord.utils import MISSING, escape_markdown as escape
+from yarl import URL
 
 import env
 import side
 import web as server
 from _types import Context, Interaction, Loop
-from lib import asset, tests, utils
+from lib import asset, cluster, fixtures, metrics, monitor, profiler, sessions, startup, tests, utils
 from mixins import ClientMixin
 from lib.audio import AudioClient
 from lib.image import ImageClient
@@ -39,8 +39,10 @@ if TYPE_CHECKING:
         _messages: Deque[discord.Message]
 
 
-class Haruka(commands.Bot, ClientMixin):
+class Haruka(commands.AutoShardedBot, ClientMixin):
 
+    # Notified by any process of the cluster when a reminder is added
+    REMINDER_CHANNEL: ClassVar[str] = "haruka_remind"
     if TYPE_CHECKING:
         _command_count: Dict[str, List[Context]]
         _slash_command_count: Dict[str, List[Interaction]]
@@ -51,15 +53,19 @@ class Haruka(commands.Bot, ClientMixin):
         app: server.WebApp
         asset_client: asset.AssetClient
         audio: AudioClient
+        cluster: cluster.ClusterNode
         conn: asyncpg.Pool
         image: ImageClient
         logfile: io.TextIOWrapper
         loop: Loop
+        loop_monitor: monitor.LoopLagMonitor
         owner_bypass: bool
         owner_data: Optional[Dict[str, Any]]
         owner_ready: asyncio.Event
+        profiler: profiler.Profiler
         runner: web.AppRunner
         session: aiohttp.ClientSession
+        sessions: sessions.SessionManager
         side_client: Optional[side.SideClient]
         tree: SlashCommandTree
         uptime: datetime.datetime
@@ -67,7 +73,14 @@ class Haruka(commands.Bot, ClientMixin):
     def __init__(self, *args, **kwargs) -> None:
         signal.signal(signal.SIGTERM, self.kill)
 
+        config = cluster.ClusterConfig.from_env()
+        if config.shard_count:
+            kwargs.setdefault("shard_count", config.shard_count)
+        if config.enabled:
+            kwargs.setdefault("shard_ids", config.shard_ids)
+
         super().__init__(*args, **kwargs)
+        self.cluster = cluster.ClusterNode(self, config)
         self.logfile = open("./bot/web/assets/log.txt", "a", encoding="utf-8")
 
         self.owner_data = None
@@ -76,9 +89,12 @@ class Haruka(commands.Bot, ClientMixin):
         self._command_count = {}
         self._slash_command_count = {}
 
+        self.loop_monitor = monitor.LoopLagMonitor()
+        self.profiler = profiler.Profiler()
         self.__initialize_clients()
 
-        if env.SECONDARY_TOKEN:
+        # Only one process of a cluster may log in with the secondary token
+        if env.SECONDARY_TOKEN and config.primary:
             print("SECONDARY_TOKEN detected, initializing SideClient.")
             self.side_client = side.SideClient(self, env.SECONDARY_TOKEN)
         else:
@@ -90,42 +106,81 @@ class Haruka(commands.Bot, ClientMixin):
         self.audio = AudioClient(self)
 
     async def setup_hook(self) -> None:
-        # Prepare database connection
-        await self.prepare_database()
-
-        # Create side session
-        headers = {
-            "Accept-Language": "en-US,en;q=0.9",
-            "User-Agent": youtube_dl.utils.random_user_agent(),
-        }
-        self.session = aiohttp.ClientSession(
-            headers=headers,
-            timeout=aiohttp.ClientTimeout(connect=5.0),
-        )
-        self.log("Created side session")
-
-        # Initialize Top.gg client
-        if env.TOPGG_TOKEN:
-            self.topgg = topgg.DBLClient(
-                self,
-                env.TOPGG_TOKEN,
-                autopost=True,
-                autopost_interval=900,
-                session=self.session,
-            )
-
-        # Prepare image client
-        await self.image.prepare()
-        self.log("Loaded image client")
-
-        # Start server asynchronously
-        self.app = server.WebApp(self)
-        self.runner = web.AppRunner(self.app)
-        await self.runner.setup()
-        port = int(env.PORT)
-        site = web.TCPSite(self.runner, None, port)
-        await site.start()
-        print(f"Started serving on port {port}")
+        # Fork the youtube-dl workers while the process is still small and
+        # before starting any thread, the children would inherit its locks
+        self.audio.extractor.warm_up()
+
+        # Measure event loop lag
+        self.loop_monitor.start()
+
+        graph = startup.StartupGraph("setup")
+
+        @graph.stage("database", timeout=60.0, critical=True)
+        async def _database() -> None:
+            await self.prepare_database()
+
+        @graph.stage("session", critical=True)
+        async def _session() -> None:
+            headers = {
+                "Accept-Language": "en-US,en;q=0.9",
+                "User-Agent": await self.audio.extractor.user_agent(),
+            }
+            request_class = None
+            if env.UPSTREAM_URL:
+                # Benchmarking against the fake upstream server, see upstream.py
+                request_class = fixtures.redirect_request_class(env.UPSTREAM_URL, exclude=(URL(env.HOST).host,))
+                self.log(f"Redirecting all requests to {env.UPSTREAM_URL}")
+
+            self.sessions = sessions.SessionManager(headers=headers, request_class=request_class)
+            self.session = self.sessions.api
+            self.log("Created side sessions")
+
+            # Initialize Top.gg client
+            if env.TOPGG_TOKEN:
+                self.topgg = topgg.DBLClient(
+                    self,
+                    env.TOPGG_TOKEN,
+                    autopost=True,
+                    autopost_interval=900,
+                    session=self.session,
+                )
+
+        @graph.stage("image", requires=("session",))
+        async def _image() -> None:
+            await self.image.prepare()
+            self.log("Loaded image client")
+
+        @graph.stage("cluster", requires=("database",), critical=True)
+        async def _cluster() -> None:
+            await self.cluster.start()
+            config = self.cluster.config
+            if config.enabled:
+                self.log(f"Running as cluster {config.cluster_id}/{config.cluster_count} with shards {config.shard_ids} of {config.shard_count}")
+
+        @graph.stage("server", requires=("cluster", "session"), critical=True)
+        async def _server() -> None:
+            self.app = server.WebApp(self)
+            self.runner = web.AppRunner(self.app)
+            await self.runner.setup()
+
+            config = self.cluster.config
+            if config.primary:
+                port = int(env.PORT)
+                site = web.TCPSite(self.runner, None, port)
+                await site.start()
+                print(f"Started serving on port {port}")
+
+            # Audio control requests are forwarded by the primary process to the owner of the guild
+            if config.enabled:
+                port = config.internal_port + config.cluster_id
+                site = web.TCPSite(self.runner, "127.0.0.1", port)
+                await site.start()
+                print(f"Started internal server on port {port}")
+
+        try:
+            await graph.run()
+        finally:
+            self.log(graph.report())
 
         self.uptime = discord.utils.utcnow()
 
@@ -149,6 +204,9 @@ class Haruka(commands.Bot, ClientMixin):
             CREATE TABLE IF NOT EXISTS youtube (id text, queue text[]);
             CREATE TABLE IF NOT EXISTS blacklist (id text);
             CREATE TABLE IF NOT EXISTS remind (id text, time timestamptz, content text, url text, original timestamptz);
+            CREATE TABLE IF NOT EXISTS tests (run_at timestamptz, mode text, suite text, status text, success int, total int, duration double precision);
+            CREATE TABLE IF NOT EXISTS clusters (id int PRIMARY KEY, shards int[], pid int, guilds int, voice_clients int, usage jsonb, updated_at timestamptz);
+            CREATE TABLE IF NOT EXISTS audio_keys (key text PRIMARY KEY, guild_id bigint UNIQUE);
         """)
 
         self.log("Successfully initialized database.")
@@ -164,56 +222,72 @@ class Haruka(commands.Bot, ClientMixin):
         await self.__do_startup()
 
     async def __do_startup(self) -> None:
-        # Start tests
-        test_running_task = self.loop.create_task(tests.run_all_tests(self), name="Startup tests")
-
-        # Fetch anime images
-        image_fetching_task = self.loop.create_task(self.asset_client.fetch_anime_images(), name="Startup image fetching")
+        self.latest_commits = "*No data*"
+        graph = startup.StartupGraph("ready")
+
+        @graph.stage("owner")
+        async def _owner() -> None:
+            app_info = await self.application_info()
+            if app_info.team:
+                self.owner_id = app_info.team.owner_id
+            else:
+                self.owner_id = app_info.owner.id
+            self.owner_data = await self.http.get_user(self.owner_id)
+            self.owner_ready.set()
+
+        @graph.stage("tasks")
+        async def _tasks() -> None:
+            # These loops must run in only one process of a cluster
+            if not self.cluster.config.primary:
+                return
+
+            await self.cluster.listen(self.REMINDER_CHANNEL, self._on_reminder_added)
+            loops = [self._keep_alive, self.reminder]
+            if env.SELF_TEST_INTERVAL > 0:
+                self.self_test.change_interval(hours=env.SELF_TEST_INTERVAL)
+                loops.append(self.self_test)
+
+            for task in loops:
+                try:
+                    task.start()
+                except BaseException:
+                    self.log(f"An exception occured when starting {task.coro.__name__}:")
+                    self.log(traceback.format_exc())
+                else:
+                    self.log(f"Started {task.coro.__name__}")
 
-        # Get bot owner
-        app_info = await self.application_info()
-        if app_info.team:
-            self.owner_id = app_info.team.owner_id
-        else:
-            self.owner_id = app_info.owner.id
-        self.owner_data = await self.http.get_user(self.owner_id)
-        self.owner_ready.set()
+        @graph.stage("commits", timeout=20.0)
+        async def _commits() -> None:
+            async with self.session.get("https://api.github.com/repos/Serious-senpai/haruka-rewrite/commits") as response:
+                if response.ok:
+                    js = await response.json(encoding="utf-8")
+                    desc = []
 
-        # Start all future tasks
-        for task in (self._keep_alive, self.reminder):
-            try:
-                task.start()
-            except BaseException:
-                self.log(f"An exception occured when starting {task.coro.__name__}:")
-                self.log(traceback.format_exc())
-            else:
-                self.log(f"Started {task.coro.__name__}")
+                    for commit in js[:4]:
+                        sha = commit["sha"][:6]
+                        message = commit["commit"]["message"].split("\n")[0].replace("``", "`")
+                        url = commit["html_url"]
+                        desc.append(f"__[`{sha}`]({url})__ {message}")
 
-        # Fetch repository's latest commits
-        async with self.session.get("https://api.github.com/repos/Serious-senpai/haruka-rewrite/commits") as response:
-            if response.ok:
-                js = await response.json(encoding="utf-8")
-                desc = []
+                    self.latest_commits = "\n".join(desc)
+                    self.log("Fetched latest repository commits")
 
-                for commit in js[:4]:
-                    sha = commit["sha"][:6]
-                    message = commit["commit"]["message"].split("\n")[0].replace("``", "`")
-                    url = commit["html_url"]
-                    desc.append(f"__[`{sha}`]({url})__ {message}")
+                else:
+                    self.log(f"WARNING: Unable to fetch repository's commits (status {response.status})")
 
-                self.latest_commits = "\n".join(desc)
-                self.log("Fetched latest repository commits")
+        @graph.stage("hosts", timeout=20.0)
+        async def _hosts() -> None:
+            await self.audio.initialize_hosts()
 
-            else:
-                self.log(f"WARNING: Unable to fetch repository's commits (status {response.status})")
-                self.latest_commits = "*No data*"
+        @graph.stage("images", timeout=600.0)
+        async def _images() -> None:
+            await self.asset_client.load()
 
-        # Sort Invidious hosts
-        await self.audio.initialize_hosts()
+        await graph.run()
+        self.log(graph.report())
 
-        # Complete tasks
-        await test_running_task
-        await image_fetching_task
+        if not self.cluster.config.primary:
+            return
 
         try:
             await self.report("Haruka is ready!", send_state=False)
@@ -235,7 +309,7 @@ class Haruka(commands.Bot, ClientMixin):
             if official_client:
                 if self.side_client:
                     self.side_client.tree.add_command(command, guilds=guilds)
-                else:
+                elif not env.SECONDARY_TOKEN:
                     self.log("A secondary token should be provided to register command to a verified client")
 
             if unofficial_client:
@@ -251,18 +325,26 @@ class Haruka(commands.Bot, ClientMixin):
         self.loop.create_task(self.close())
 
     async def close(self) -> None:
+        self.loop_monitor.stop()
+        self.audio.extractor.shutdown()
+        self.audio.transcoder.stop()
+        self.audio.opus_cache.stop()
         await self.runner.cleanup()
         self.log("Closed server.")
+        await self.cluster.close()
+        self.log("Closed cluster listener connection.")
         await self.conn.close()
         self.log("Closed database connection pool for bot.")
-        await self.session.close()
-        self.log("Closed side session.")
+        await self.sessions.close()
+        self.log("Closed side sessions.")
 
-        try:
-            await self.side_client.report("Terminating bot. This is the final report.")
-        finally:
-            await self.side_client.close()
-            self.log("Closed side client.")
+        # Only the primary process of a cluster has a side client
+        if self.side_client:
+            try:
+                await self.side_client.report("Terminating bot. This is the final report.")
+            finally:
+                await self.side_client.close()
+                self.log("Closed side client.")
 
         try:
             await self.report("Terminating bot. This is the final report.")
@@ -291,6 +373,20 @@ class Haruka(commands.Bot, ClientMixin):
             if not response.status == 200:
                 self.log(f"WARNING: _keep_alive task returned response code {response.status}")
 
+    @tasks.loop(hours=24)
+    async def self_test(self) -> None:
+        asyncio.current_task().set_name("SelfTest")  # type: ignore
+        await tests.run_all_tests(self, mode=env.SELF_TEST_MODE)
+
+    @self_test.before_loop
+    async def _before_self_test(self) -> None:
+        # The first run is delayed by a whole interval to keep the tests away from the startup
+        await asyncio.sleep(3600 * self.self_test.hours)
+
+    def _on_reminder_added(self, payload: str) -> None:
+        # The new reminder may be due before the one the loop is waiting for
+        self.reminder.restart()
+
     @tasks.loop()
     async def reminder(self) -> None:
         row = await self.conn.fetchrow("SELECT * FROM remind ORDER BY time;")
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import signal
+import sys
+import time
+from typing import Dict, Optional, TYPE_CHECKING
+
+import aiohttp
+
+import env
+from lib.cluster import ClusterConfig
+
+
+# Run the bot as a cluster of processes, from the repository root:
+#     CLUSTER_COUNT=4 python bot/launcher.py
+# Each process runs bot/main.py with its own contiguous range of shards
+# (see lib/cluster.py). Cluster 0 serves the public web server on PORT
+# and forwards the audio control requests of a guild to the process that
+# owns it, via the internal server of that process on CLUSTER_PORT + i.
+# Crashed processes are restarted with an exponential backoff.
+
+
+GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+
+
+async def recommended_shard_count(token: str) -> int:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(GATEWAY_URL, headers={"Authorization": f"Bot {token}"}) as response:
+            response.raise_for_status()
+            data = await response.json()
+            return data["shards"]
+
+
+class Launcher:
+    """Start the processes of a cluster and keep them running
+
+    Attributes
+    -----
+    cluster_count: ``int``
+        The number of processes
+    shard_count: ``int``
+        The total number of shards
+    """
+
+    __slots__ = ("cluster_count", "shard_count", "_processes", "_stopping")
+    MIN_BACKOFF: float = 5.0
+    MAX_BACKOFF: float = 300.0
+    STABLE_AFTER: float = 600.0
+    if TYPE_CHECKING:
+        cluster_count: int
+        shard_count: int
+        _processes: Dict[int, asyncio.subprocess.Process]
+        _stopping: asyncio.Event
+
+    def __init__(self, cluster_count: int, shard_count: int) -> None:
+        # Validate the configuration before starting anything
+        ClusterConfig(cluster_count=cluster_count, shard_count=shard_count)
+
+        self.cluster_count = cluster_count
+        self.shard_count = shard_count
+        self._processes = {}
+        self._stopping = asyncio.Event()
+
+    def log(self, content: str) -> None:
+        print(f"[Launcher] {content}", flush=True)
+
+    async def _spawn(self, cluster_id: int) -> asyncio.subprocess.Process:
+        environ = os.environ.copy()
+        environ["CLUSTER_COUNT"] = str(self.cluster_count)
+        environ["CLUSTER_ID"] = str(cluster_id)
+        environ["SHARD_COUNT"] = str(self.shard_count)
+
+        process = await asyncio.create_subprocess_exec(sys.executable, "bot/main.py", env=environ)
+        self._processes[cluster_id] = process
+        self.log(f"Started cluster {cluster_id} (PID {process.pid})")
+        return process
+
+    async def _supervise(self, cluster_id: int) -> None:
+        backoff = self.MIN_BACKOFF
+        while not self._stopping.is_set():
+            started = time.perf_counter()
+            process = await self._spawn(cluster_id)
+            returncode = await process.wait()
+            if self._stopping.is_set():
+                return
+
+            if time.perf_counter() - started > self.STABLE_AFTER:
+                backoff = self.MIN_BACKOFF
+
+            self.log(f"Cluster {cluster_id} exited with code {returncode}, restarting in {backoff:.0f}s")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                backoff = min(2 * backoff, self.MAX_BACKOFF)
+
+    def stop(self) -> None:
+        """Forward SIGTERM to all processes and stop restarting them"""
+        if self._stopping.is_set():
+            return
+
+        self.log("Stopping all clusters...")
+        self._stopping.set()
+        for process in self._processes.values():
+            if process.returncode is None:
+                process.send_signal(signal.SIGTERM)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+
+        await asyncio.gather(*[self._supervise(cluster_id) for cluster_id in range(self.cluster_count)])
+        await asyncio.gather(*[process.wait() for process in self._processes.values()])
+
+
+async def main(shard_count: Optional[int] = None) -> None:
+    if not shard_count:
+        shard_count = max(await recommended_shard_count(env.TOKEN), env.CLUSTER_COUNT)
+        print(f"[Launcher] Using {shard_count} shards")
+
+    os.makedirs("./bot/web/assets", exist_ok=True)
+    with open("./bot/web/assets/log.txt", "w") as f:
+        f.write(f"HARUKA BOT\nRunning on Python {sys.version}\nCluster of {env.CLUSTER_COUNT} processes, {shard_count} shards\n" + "-" * 50 + "\n")
+
+    launcher = Launcher(env.CLUSTER_COUNT, shard_count)
+    await launcher.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(env.SHARD_COUNT))
@@ -5,12 +5,11 @@ import io
 import os
 import random
 import traceback
-from typing import ClassVar, List, Optional, TYPE_CHECKING
+from typing import Any, ClassVar, List, Optional, TYPE_CHECKING
 
 import aiohttp
 import discord
 from yarl import URL
-from bs4 import BeautifulSoup
 
 from env import HOST
 from lib import utils
@@ -31,6 +30,7 @@ class AssetClient:
     """
 
     __slots__ = ("_ready", "bot", "anime_images_fetch", "files")
+    CHANNEL: ClassVar[str] = "haruka_assets"
     DIRECTORY: ClassVar[str] = "./bot/web/assets/images"
     if TYPE_CHECKING:
         _ready: asyncio.Event
@@ -45,6 +45,25 @@ class AssetClient:
     def session(self) -> aiohttp.ClientSession:
         return self.bot.session
 
+    async def load(self) -> None:
+        """This function is a coroutine
+
+        Prepare the image collection. In a cluster, only the primary
+        process downloads it, the other processes index the shared
+        directory when the primary one announces that it is ready.
+        """
+        cluster = self.bot.cluster
+        if cluster.config.primary:
+            await self.fetch_anime_images()
+            await cluster.notify(self.CHANNEL)
+        else:
+            await cluster.listen(self.CHANNEL, self._on_notification)
+            if os.listdir(self.DIRECTORY):
+                await self.__finalize()
+
+    def _on_notification(self, payload: str) -> Any:
+        return self.__finalize()
+
     async def fetch_anime_images(self) -> None:
         """This function is a coroutine
 
@@ -56,6 +75,9 @@ class AssetClient:
         if os.listdir(self.DIRECTORY):
             return await self.__finalize()
 
+        # Only needed on the first startup
+        from bs4 import BeautifulSoup
+
         with utils.TimingContextManager() as measure:
             async with self.session.get("https://www.mediafire.com/file/vjmhvpzx4brdx0v/collection.tar/file") as response:
                 if response.status == 200:
@@ -84,7 +106,7 @@ class AssetClient:
         self.bot.log(f"Fetched TAR file URL in {utils.format(measure.result)}: {file_url}")
 
         with utils.TimingContextManager() as measure:
-            async with self.session.get(file_url) as response:
+            async with self.bot.sessions.download.get(file_url) as response:
                 if response.status == 200:
                     with open(tar_location, "wb", buffering=0) as f:
                         try:
@@ -1,5 +1,12 @@
 #!/bot/lib/audio
+from .cache import *
 from .client import *
+from .events import *
 from .exceptions import *
+from .extractor import *
 from .players import *
+from .rtp import *
+from .search import *
 from .sources import *
+from .streams import *
+from .transcoder import *
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import os
+from typing import BinaryIO, ClassVar, Counter, Dict, Optional, OrderedDict, TYPE_CHECKING
+
+import discord
+from discord.oggparse import OggStream
+
+from lib import metrics
+if TYPE_CHECKING:
+    from .sources import InvidiousSource
+
+
+__all__ = (
+    "CachedOpusAudio",
+    "OpusCache",
+)
+
+
+OPUS_CACHE_BYTES = metrics.Gauge("haruka_opus_cache_bytes", "Total size of the local opus playback cache")
+
+
+class CachedOpusAudio(discord.AudioSource):
+    """An audio source that reads opus packets from a cached Ogg file,
+    without ffmpeg or any network access
+    """
+
+    __slots__ = ("path", "_file", "_packets")
+    if TYPE_CHECKING:
+        path: str
+        _file: BinaryIO
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self._packets = OggStream(self._file).iter_packets()
+
+    def read(self) -> bytes:
+        return next(self._packets, b"")
+
+    def is_opus(self) -> bool:
+        return True
+
+    def cleanup(self) -> None:
+        self._file.close()
+
+
+class OpusCache:
+    """Store the playback stream of frequently played tracks on disk
+
+    The files contain the exact opus packets that ``InvidiousSource.fetch``
+    would produce (volume filter included), so a cached track is played
+    with ``CachedOpusAudio``. A track is cached in the background after
+    it has been played ``min_plays`` times, or immediately when it is
+    played in REPEAT_ONE mode. The least recently played files are
+    evicted to keep the cache under ``max_bytes``.
+    """
+
+    __slots__ = ("directory", "max_bytes", "min_plays", "_entries", "_plays", "_building", "_semaphore")
+    MAX_TRACKED_PLAYS: ClassVar[int] = 4096
+    if TYPE_CHECKING:
+        directory: str
+        max_bytes: int
+        min_plays: int
+        _entries: Optional[OrderedDict[str, int]]
+        _plays: Counter[str]
+        _building: Dict[str, asyncio.Task[None]]
+        _semaphore: Optional[asyncio.Semaphore]
+
+    def __init__(self, *, directory: str = "./cache/opus", max_bytes: int = 512 * 1024 ** 2, min_plays: int = 2) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_plays = min_plays
+        self._entries = None
+        self._plays = collections.Counter()
+        self._building = {}
+        self._semaphore = None
+
+    @property
+    def entries(self) -> OrderedDict[str, int]:
+        """The cached track IDs and file sizes, least recently used first"""
+        if self._entries is None:
+            files = []
+            with contextlib.suppress(FileNotFoundError):
+                for entry in os.scandir(self.directory):
+                    if entry.name.endswith(".opus"):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+
+            self._entries = collections.OrderedDict((track_id, size) for _, track_id, size in sorted(files))
+            OPUS_CACHE_BYTES.set(self.size)
+
+        return self._entries
+
+    @property
+    def size(self) -> int:
+        return sum(self.entries.values())
+
+    def path(self, track_id: str) -> str:
+        return os.path.join(self.directory, f"{track_id}.opus")
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self.entries
+
+    def open(self, track_id: str) -> Optional[CachedOpusAudio]:
+        """Get a playable audio source for a cached track
+
+        Parameters
+        -----
+        track_id: ``str``
+            The track ID
+
+        Returns
+        -----
+        Optional[``CachedOpusAudio``]
+            The audio source, or ``None`` if the track is not cached
+        """
+        hit = track_id in self.entries
+        metrics.cache_lookup("opus", hit)
+        if not hit:
+            return
+
+        try:
+            source = CachedOpusAudio(self.path(track_id))
+        except FileNotFoundError:
+            self._remove(track_id)
+            return
+
+        self.entries.move_to_end(track_id)
+        return source
+
+    def record(self, track: InvidiousSource, *, repeat: bool = False) -> None:
+        """Record that a track was streamed and start caching it in the
+        background if it is hot enough
+
+        Parameters
+        -----
+        track: ``InvidiousSource``
+            The track, its ``source`` attribute must be a working URL
+        repeat: ``bool``
+            Whether the track is being played in REPEAT_ONE mode
+        """
+        self._plays[track.id] += 1
+        if len(self._plays) > self.MAX_TRACKED_PLAYS:
+            self._plays = collections.Counter(dict(self._plays.most_common(self.MAX_TRACKED_PLAYS // 4)))
+
+        if track.id in self.entries or track.id in self._building or track.source is None:
+            return
+
+        if repeat or self._plays[track.id] >= self.min_plays:
+            task = self._building[track.id] = asyncio.create_task(self._build(track.id, track.source))
+            task.add_done_callback(lambda _: self._building.pop(track.id, None))
+
+    async def _build(self, track_id: str, url: str) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(1)
+
+        async with self._semaphore:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.path(track_id)
+            # The processes of a cluster share the cache directory
+            part = f"{path}.{os.getpid()}.part"
+            args = (
+                "ffmpeg",
+                "-nostdin",
+                "-reconnect", "1",
+                "-reconnect_streamed", "1",
+                "-reconnect_delay_max", "5",
+                "-i", url,
+                # Same output as discord.FFmpegOpusAudio in InvidiousSource.fetch
+                "-vn",
+                "-filter:a", "volume=0.2",
+                "-map_metadata", "-1",
+                "-f", "opus",
+                "-c:a", "libopus",
+                "-ar", "48000",
+                "-ac", "2",
+                "-b:a", "128k",
+                "-loglevel", "error",
+                "-y", part,
+            )
+            metrics.FFMPEG_PROCESSES.inc(purpose="cache")
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+
+            try:
+                await process.wait()
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+
+                if process.returncode != 0:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(part)
+
+            if process.returncode != 0:
+                return
+
+            os.replace(part, path)
+            self.entries[track_id] = os.path.getsize(path)
+            self._evict()
+
+    def _remove(self, track_id: str) -> None:
+        self.entries.pop(track_id, None)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path(track_id))
+
+    def _evict(self) -> None:
+        size = self.size
+        while size > self.max_bytes and len(self.entries) > 1:
+            track_id, file_size = next(iter(self.entries.items()))
+            self._remove(track_id)
+            size -= file_size
+
+        OPUS_CACHE_BYTES.set(size)
+
+    def stop(self) -> None:
+        """Cancel all running cache builds"""
+        for task in self._building.values():
+            task.cancel()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import os
 import random
 from typing import Dict, Callable, List, Optional, Type, TypeVar, TYPE_CHECKING
@@ -12,9 +13,15 @@ from discord import app_commands
 from discord.ext import commands
 
 from env import HOST
+from lib import metrics
+from .cache import OpusCache
 from .constants import initialize_hosts
 from .exceptions import AudioNotFound
-from .sources import PartialInvidiousSource, InvidiousSource
+from .extractor import ExtractionService
+from .search import SearchCache
+from .sources import PartialInvidiousSource, InvidiousSource, save_many_to_memory
+from .streams import StreamURLCache
+from .transcoder import ArtifactFormat, TranscodePriority, TranscodeScheduler
 if TYPE_CHECKING:
     import haruka
     from _types import Context, Interaction
@@ -23,7 +30,6 @@ if TYPE_CHECKING:
 __all__ = ("AudioClient",)
 
 
-fetching_in_progress: Dict[str, asyncio.Event] = {}
 if TYPE_CHECKING:
     T = TypeVar("T")
     SourceT = TypeVar("SourceT", PartialInvidiousSource, InvidiousSource)
@@ -31,12 +37,24 @@ if TYPE_CHECKING:
 
 class AudioClient:
 
-    __slots__ = ("bot")
+    __slots__ = ("bot", "extractor", "opus_cache", "search_cache", "stream_urls", "transcoder", "_refreshing")
     if TYPE_CHECKING:
         bot: haruka.Haruka
+        extractor: ExtractionService
+        opus_cache: OpusCache
+        search_cache: SearchCache
+        stream_urls: StreamURLCache
+        transcoder: TranscodeScheduler
+        _refreshing: Dict[str, asyncio.Task[None]]
 
     def __init__(self, bot: haruka.Haruka) -> None:
         self.bot = bot
+        self.extractor = ExtractionService()
+        self.opus_cache = OpusCache()
+        self.search_cache = SearchCache()
+        self.stream_urls = StreamURLCache()
+        self.transcoder = TranscodeScheduler(log=bot.log)
+        self._refreshing = {}
 
     @property
     def pool(self) -> asyncpg.Pool:
@@ -50,6 +68,26 @@ class AudioClient:
         hosts = await initialize_hosts(self.bot.session)
         self.bot.log("Sorted Invidious instances to:\n" + "\n".join(hosts))
 
+    def refresh_source(self, track_id: str) -> None:
+        """Fetch a new stream URL for a track in the background and
+        store it in ``stream_urls`` if it works. This does nothing if a refresh
+        for the same track is already running.
+
+        Parameters
+        -----
+        track_id: ``str``
+            The track ID
+        """
+        if track_id not in self._refreshing:
+            task = self._refreshing[track_id] = asyncio.create_task(self.__refresh_source(track_id))
+            task.add_done_callback(lambda _: self._refreshing.pop(track_id, None))
+
+    async def __refresh_source(self, track_id: str) -> None:
+        result = await self.extractor.extract(track_id)
+        audio_format = result.best_audio() if result else None
+        if audio_format is not None and await InvidiousSource.probe(audio_format.url, client=self):
+            self.stream_urls.put(track_id, audio_format.url, validated=True)
+
     @staticmethod
     def in_voice(*, slash_command: bool = False) -> Callable[[T], T]:
         """A command check that returns ``True`` if the invoker is
@@ -77,8 +115,7 @@ class AudioClient:
 
             return commands.check(predicate)
 
-    @staticmethod
-    def create_audio_url(track_id: str) -> str:
+    def create_audio_url(self, track_id: str, format: Optional[ArtifactFormat] = None) -> str:
         """Create an URL to the local audio file of the video with ID
         ``track_id`` which is exposed to the server side.
 
@@ -86,6 +123,9 @@ class AudioClient:
         -----
         track_id: ``str``
             The track ID
+        format: Optional[``ArtifactFormat``]
+            The file format. If this is ``None``, any available format
+            is accepted, preferring OGG.
 
         Returns
         -----
@@ -97,12 +137,14 @@ class AudioClient:
         ``AudioNotFound``
             The local audio file could not be found
         """
-        if os.path.isfile(f"./server/audio/{track_id}.mp3"):
-            return HOST + f"/audio/{track_id}.mp3"
+        formats = [format] if format is not None else list(ArtifactFormat)
+        for _format in formats:
+            if self.transcoder.index.get(track_id, _format) is not None:
+                return HOST + f"/audio/{track_id}.{_format.value}"
 
         raise AudioNotFound(track_id)
 
-    def create_audio_embed(self, source: PartialInvidiousSource) -> discord.Embed:
+    def create_audio_embed(self, source: PartialInvidiousSource, format: Optional[ArtifactFormat] = None) -> discord.Embed:
         """Create an embed displaying the video information and URL
         to the video audio.
 
@@ -110,6 +152,8 @@ class AudioClient:
         -----
         source: ``PartialInvidiousSource``
             The video source object
+        format: Optional[``ArtifactFormat``]
+            The file format, see ``create_audio_url``
 
         Returns
         -----
@@ -128,58 +172,52 @@ class AudioClient:
         )
         embed.add_field(
             name="Audio URL",
-            value=f"[Download]({self.create_audio_url(source.id)})",
+            value=f"[Download]({self.create_audio_url(source.id, format)})",
             inline=False,
         )
         return embed
 
-    async def fetch(self, track: InvidiousSource) -> Optional[str]:
+    async def fetch(
+        self,
+        track: InvidiousSource,
+        *,
+        format: ArtifactFormat = ArtifactFormat.OGG,
+        priority: TranscodePriority = TranscodePriority.INTERACTIVE,
+    ) -> Optional[str]:
         """This function is a coroutine
 
         Download a video audio to the local machine and return its URL.
 
+        By default, the opus stream is copied into an OGG container
+        without re-encoding. Only request ``ArtifactFormat.MP3`` when
+        the user explicitly asks for it.
+
         Parameters
         -----
         track: ``InvidiousSource``
             The target track.
+        format: ``ArtifactFormat``
+            The file format
+        priority: ``TranscodePriority``
+            The priority of the download job
 
         Returns
         -----
         Optional[``str``]
             The URL to the audio file, exposed via the server side
         """
-        try:
-            await fetching_in_progress[track.id].wait()
-            try:
-                return self.create_audio_url(track.id)
-            except AudioNotFound:
-                return
-        except KeyError:
-            fetching_in_progress[track.id] = asyncio.Event()
-
-        url = await track.ensure_source(client=self)
-        if not url:
-            return
-
-        args = (
-            "ffmpeg",
-            "-reconnect", "1",
-            "-reconnect_streamed", "1",
-            "-i", url,
-            "-f", "mp3",
-            "-vn",
-            f"./server/audio/{track.id}.mp3",
+        path = await self.transcoder.transcode(
+            track.id,
+            functools.partial(track.ensure_source, client=self),
+            format=format,
+            priority=priority,
+            duration=track.length,
         )
-        process = await asyncio.create_subprocess_exec(
-            *args,
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.DEVNULL,
-        )
-        await process.communicate()
-        fetching_in_progress[track.id].set()
+        if path is None:
+            return
 
         try:
-            return self.create_audio_url(track.id)
+            return self.create_audio_url(track.id, format)
         except AudioNotFound:
             return
 
@@ -268,7 +306,17 @@ class AudioClient:
         List[``PartialInvidiousSource``]
             The list of searching results
         """
-        return await PartialInvidiousSource.search(query, max_results=max_results, client=self)
+        results = self.search_cache.get(query, max_results)
+        if results is not None:
+            return results
+
+        results = await PartialInvidiousSource.search(query, max_results=max_results, client=self)
+        if results:
+            self.search_cache.put(query, max_results, results)
+            # Queue listings of these tracks can then be built without any request
+            await asyncio.to_thread(save_many_to_memory, [result.data for result in results], overwrite=False)
+
+        return results
 
     async def build(self, cls: Type[SourceT], track_id: str) -> Optional[SourceT]:
         """This function is a coroutine
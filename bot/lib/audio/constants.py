@@ -1,7 +1,7 @@
 import asyncio
 import contextlib
 import time
-from typing import List
+from typing import List, Optional
 
 import aiohttp
 
@@ -43,19 +43,20 @@ async def initialize_hosts(session: aiohttp.ClientSession) -> List[str]:
     List[``str``]
         The list object containing the sorted hosts
     """
-    hosts = {}
-
-    for url in INVIDIOUS_URLS:
+    async def ping(url: str) -> Optional[float]:
         with contextlib.suppress(aiohttp.ClientError, asyncio.TimeoutError):
             _start_timestamp = time.perf_counter()
             async with session.get(f"{url}/api/v1/videos/hnHWleQp1GE", timeout=TIMEOUT) as response:
                 if response.status == 200:
-                    ping = time.perf_counter() - _start_timestamp
-                    hosts[url] = ping
+                    return time.perf_counter() - _start_timestamp
+
+    # Ping all hosts at the same time
+    pings = await asyncio.gather(*[ping(url) for url in INVIDIOUS_URLS])
+    hosts = {url: ping for url, ping in zip(INVIDIOUS_URLS, pings) if ping is not None}
 
-    INVIDIOUS_URLS.clear()
-    for url in hosts.keys():
-        INVIDIOUS_URLS.append(url)
+    # Keep the current list if no host responded, e.g. without network access
+    if hosts:
+        INVIDIOUS_URLS.clear()
+        INVIDIOUS_URLS.extend(sorted(hosts.keys(), key=hosts.__getitem__))
 
-    INVIDIOUS_URLS.sort(key=hosts.__getitem__)
     return INVIDIOUS_URLS
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import enum
+from typing import Dict, Iterator, Set, TYPE_CHECKING
+
+
+__all__ = (
+    "AudioEvent",
+    "AudioEventHub",
+    "hub",
+)
+
+
+class AudioEvent(enum.Enum):
+    """Events published by a ``MusicClient``
+
+    The values are the messages sent to the audio control
+    websockets.
+    """
+    TRACK_START = "START"
+    TRACK_END = "END"
+    PAUSE = "PAUSE"
+    RESUME = "RESUME"
+    DISCONNECT = "DISCONNECTED"
+
+
+class AudioEventHub:
+    """A per-guild publish/subscribe hub for ``AudioEvent``s
+
+    Each subscriber owns a bounded queue. Publishing never blocks:
+    when a subscriber falls behind, its oldest pending event is
+    dropped to make room for the new one.
+    """
+
+    __slots__ = ("_subscribers",)
+    if TYPE_CHECKING:
+        _subscribers: Dict[int, Set[asyncio.Queue[AudioEvent]]]
+
+    def __init__(self) -> None:
+        self._subscribers = {}
+
+    def publish(self, guild_id: int, event: AudioEvent) -> None:
+        """Publish an event to all subscribers of a guild
+
+        Parameters
+        -----
+        guild_id: ``int``
+            The guild ID
+        event: ``AudioEvent``
+            The event to publish
+        """
+        for queue in self._subscribers.get(guild_id, ()):
+            if queue.full():
+                queue.get_nowait()
+
+            queue.put_nowait(event)
+
+    @contextlib.contextmanager
+    def subscribe(self, guild_id: int, *, maxsize: int = 16) -> Iterator[asyncio.Queue[AudioEvent]]:
+        """Subscribe to the events of a guild for the duration of
+        the ``with`` block
+
+        Parameters
+        -----
+        guild_id: ``int``
+            The guild ID
+        maxsize: ``int``
+            The maximum number of pending events for this subscriber
+
+        Returns
+        -----
+        ``asyncio.Queue[AudioEvent]``
+            The queue that receives the published events
+        """
+        queue: asyncio.Queue[AudioEvent] = asyncio.Queue(maxsize=maxsize)
+        subscribers = self._subscribers.setdefault(guild_id, set())
+        subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers.discard(queue)
+            if not subscribers:
+                self._subscribers.pop(guild_id, None)
+
+    def subscribers_count(self, guild_id: int) -> int:
+        return len(self._subscribers.get(guild_id, ()))
+
+
+hub = AudioEventHub()
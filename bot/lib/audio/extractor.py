@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import concurrent.futures.process
+import multiprocessing
+import sys
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+if TYPE_CHECKING:
+    import youtube_dl
+
+
+__all__ = (
+    "AudioFormat",
+    "ExtractionResult",
+    "ExtractionService",
+)
+
+
+CACHE_DIR = "./cache/youtube-dl"
+_ydl: Optional[youtube_dl.YoutubeDL] = None
+
+
+def _initialize(cache_dir: str) -> None:
+    # youtube_dl imports all of its extractors, only the workers need them
+    import youtube_dl
+
+    global _ydl
+    options = {
+        "format": "bestaudio/best",
+        "cachedir": cache_dir,
+        "noplaylist": True,
+        "quiet": True,
+        "no_warnings": True,
+        "skip_download": True,
+        "source_address": "0.0.0.0",  # Equivalent to --force-ipv4
+    }
+    _ydl = youtube_dl.YoutubeDL(options)
+
+
+def _ping() -> None:
+    pass
+
+
+def _user_agent() -> str:
+    import youtube_dl.utils
+    return youtube_dl.utils.random_user_agent()
+
+
+def _extract(video_id: str) -> Dict[str, Any]:
+    # Run in a worker, the returned value must be picklable
+    try:
+        info = _ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
+    except Exception as exc:
+        return {"id": video_id, "error": str(exc)}
+
+    formats = []
+    for data in info.get("formats") or []:
+        formats.append({
+            "format_id": data.get("format_id"),
+            "url": data.get("url"),
+            "ext": data.get("ext"),
+            "acodec": data.get("acodec"),
+            "vcodec": data.get("vcodec"),
+            "abr": data.get("abr"),
+            "asr": data.get("asr"),
+            "filesize": data.get("filesize"),
+            "protocol": data.get("protocol"),
+        })
+
+    return {
+        "id": info.get("id", video_id),
+        "title": info.get("title"),
+        "duration": info.get("duration"),
+        "formats": formats,
+    }
+
+
+class AudioFormat:
+    """Represents a media format of a YouTube video, as reported
+    by ``youtube_dl``
+    """
+
+    __slots__ = ("format_id", "url", "ext", "acodec", "vcodec", "abr", "asr", "filesize", "protocol")
+    if TYPE_CHECKING:
+        format_id: str
+        url: str
+        ext: Optional[str]
+        acodec: Optional[str]
+        vcodec: Optional[str]
+        abr: Optional[float]
+        asr: Optional[int]
+        filesize: Optional[int]
+        protocol: Optional[str]
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        for attr in self.__slots__:
+            setattr(self, attr, data.get(attr))
+
+    @property
+    def audio_only(self) -> bool:
+        return self.vcodec == "none" and self.acodec not in (None, "none")
+
+    def __repr__(self) -> str:
+        return f"<AudioFormat format_id={self.format_id} ext={self.ext} acodec={self.acodec} abr={self.abr}>"
+
+
+class ExtractionResult:
+    """The result of a ``youtube_dl`` extraction
+
+    Attributes
+    -----
+    id: ``str``
+        The video ID
+    title: Optional[``str``]
+        The video title
+    duration: Optional[``int``]
+        The video length in seconds
+    formats: List[``AudioFormat``]
+        All available formats of the video
+    """
+
+    __slots__ = ("id", "title", "duration", "formats")
+    if TYPE_CHECKING:
+        id: str
+        title: Optional[str]
+        duration: Optional[int]
+        formats: List[AudioFormat]
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self.id = data["id"]
+        self.title = data.get("title")
+        self.duration = data.get("duration")
+        self.formats = [AudioFormat(d) for d in data["formats"] if d.get("url")]
+
+    def best_audio(self, codec: Optional[str] = "opus") -> Optional[AudioFormat]:
+        """Get the audio-only format with the highest bitrate
+
+        Parameters
+        -----
+        codec: Optional[``str``]
+            The preferred audio codec. If no audio-only format uses
+            this codec, any codec is accepted.
+
+        Returns
+        -----
+        Optional[``AudioFormat``]
+            The best audio format, or ``None`` if the video has no
+            audio-only formats
+        """
+        formats = [f for f in self.formats if f.audio_only]
+        preferred = [f for f in formats if f.acodec == codec]
+        formats = preferred or formats
+        if formats:
+            return max(formats, key=lambda f: f.abr or 0)
+
+    def __repr__(self) -> str:
+        return f"<ExtractionResult id={self.id} title={self.title} formats={len(self.formats)}>"
+
+
+class ExtractionService:
+    """Resolve YouTube videos with ``youtube_dl`` in a pool of worker
+    processes.
+
+    Each worker keeps a ``youtube_dl.YoutubeDL`` instance with all
+    extractors imported and a persistent signature cache, so a lookup
+    costs no interpreter startup. Concurrent lookups of the same video
+    share a single extraction.
+    """
+
+    __slots__ = ("max_workers", "cache_dir", "_executor", "_pending")
+    if TYPE_CHECKING:
+        max_workers: int
+        cache_dir: str
+        _executor: Optional[concurrent.futures.Executor]
+        _pending: Dict[str, asyncio.Future[Dict[str, Any]]]
+
+    def __init__(self, *, max_workers: int = 2, cache_dir: str = CACHE_DIR) -> None:
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self._executor = None
+        self._pending = {}
+
+    @property
+    def executor(self) -> concurrent.futures.Executor:
+        if self._executor is None:
+            if sys.platform == "win32":
+                # Spawned workers would re-run the main script
+                _initialize(self.cache_dir)
+                self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix="youtube-dl")
+            else:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    self.max_workers,
+                    mp_context=multiprocessing.get_context("fork"),
+                    initializer=_initialize,
+                    initargs=(self.cache_dir,),
+                )
+
+        return self._executor
+
+    def warm_up(self) -> None:
+        """Start the worker processes ahead of the first lookup"""
+        self.executor.submit(_ping)
+
+    async def user_agent(self) -> str:
+        """This function is a coroutine
+
+        Get a random browser user agent from ``youtube_dl``, without
+        importing it in this process unless the worker pool is broken
+
+        Returns
+        -----
+        ``str``
+            The user agent
+        """
+        executor = self.executor
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, _user_agent)
+        except concurrent.futures.process.BrokenProcessPool:
+            self._discard(executor)
+            return _user_agent()
+
+    def _discard(self, executor: concurrent.futures.Executor) -> None:
+        # A worker crashed or was killed, the pool rejects all further
+        # jobs: replace it for the next lookups
+        if self._executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def extract(self, video_id: str) -> Optional[ExtractionResult]:
+        """This function is a coroutine
+
+        Extract the available formats of a YouTube video.
+
+        Parameters
+        -----
+        video_id: ``str``
+            The video ID
+
+        Returns
+        -----
+        Optional[``ExtractionResult``]
+            The extraction result, or ``None`` if ``youtube_dl``
+            failed. Use ``extract_raw`` to obtain the error message.
+        """
+        data = await self.extract_raw(video_id)
+        if "error" not in data:
+            return ExtractionResult(data)
+
+    async def extract_raw(self, video_id: str) -> Dict[str, Any]:
+        """This function is a coroutine
+
+        Same as ``extract``, but return the raw picklable data from
+        the worker, which contains an ``error`` key on failure.
+        """
+        executor = self.executor
+        try:
+            try:
+                future = self._pending[video_id]
+            except KeyError:
+                loop = asyncio.get_running_loop()
+                future = self._pending[video_id] = loop.run_in_executor(executor, _extract, video_id)
+                future.add_done_callback(lambda _: self._pending.pop(video_id, None))
+
+            return await asyncio.shield(future)
+
+        except concurrent.futures.process.BrokenProcessPool as exc:
+            self._discard(executor)
+            return {"id": video_id, "error": f"youtube-dl worker pool is broken: {exc}"}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import queue
+import time
+from typing import List, Optional, TYPE_CHECKING
+
+import discord
+
+from lib import metrics
+
+
+__all__ = (
+    "ChainedAudio",
+    "PlaybackTelemetry",
+)
+
+
+PLAYBACK_GAP = metrics.Histogram(
+    "haruka_playback_gap_seconds",
+    "Silence between 2 consecutive audio chunks of a track",
+    buckets=(0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+PLAYBACK_UNDERRUNS = metrics.Counter("haruka_playback_underruns_total", "Number of times the next audio chunk was not ready in time")
+PLAYBACK_SPAWN = metrics.Histogram(
+    "haruka_playback_spawn_seconds",
+    "Time spent creating the audio source of a chunk",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+PLAYBACK_LENGTH_RATIO = metrics.Histogram(
+    "haruka_playback_length_ratio",
+    "Played audio length divided by the expected track length",
+    ("source",),
+    buckets=(0.5, 0.8, 0.9, 0.95, 0.99, 1.01, 1.05, 1.1, 1.5),
+)
+# An opus packet of silence
+SILENCE = b"\xf8\xff\xfe"
+
+
+class PlaybackTelemetry:
+    """Playback quality measurements of a single track
+
+    Attributes
+    -----
+    track_id: ``str``
+        The track ID
+    expected: ``int``
+        The track length in seconds
+    source: ``str``
+        Either "stream" or "cache"
+    gaps: List[``float``]
+        The silence between consecutive chunks, in seconds
+    spawn_times: List[``float``]
+        The time spent creating each chunk's audio source, in seconds
+    underruns: ``int``
+        The number of times the next chunk was not ready in time
+    packets: ``int``
+        The number of 20ms opus packets sent
+    """
+
+    __slots__ = ("track_id", "expected", "source", "gaps", "spawn_times", "underruns", "packets", "started_at", "ended_at")
+    if TYPE_CHECKING:
+        track_id: str
+        expected: int
+        source: str
+        gaps: List[float]
+        spawn_times: List[float]
+        underruns: int
+        packets: int
+        started_at: Optional[float]
+        ended_at: Optional[float]
+
+    def __init__(self, track_id: str, expected: int, *, source: str) -> None:
+        self.track_id = track_id
+        self.expected = expected
+        self.source = source
+        self.gaps = []
+        self.spawn_times = []
+        self.underruns = 0
+        self.packets = 0
+        self.started_at = None
+        self.ended_at = None
+
+    @property
+    def played(self) -> float:
+        """The length of audio sent, in seconds"""
+        return self.packets * discord.opus.Encoder.FRAME_LENGTH / 1000
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        """The wall-clock playback time, in seconds"""
+        if self.started_at is not None and self.ended_at is not None:
+            return self.ended_at - self.started_at
+
+    def record_gap(self, gap: float) -> None:
+        self.gaps.append(gap)
+        PLAYBACK_GAP.observe(gap)
+
+    def record_underrun(self) -> None:
+        self.underruns += 1
+        PLAYBACK_UNDERRUNS.inc()
+
+    def record_spawn(self, duration: float) -> None:
+        self.spawn_times.append(duration)
+        PLAYBACK_SPAWN.observe(duration)
+
+    def finish(self) -> None:
+        self.ended_at = time.perf_counter()
+        if self.expected:
+            PLAYBACK_LENGTH_RATIO.observe(self.played / self.expected, source=self.source)
+
+    def summary(self) -> str:
+        max_gap = max(self.gaps, default=0.0)
+        max_spawn = max(self.spawn_times, default=0.0)
+        elapsed = self.elapsed
+        return (
+            f"Track ID {self.track_id} played {self.played:.2f}s/{self.expected}s"
+            + (f" in {elapsed:.2f}s" if elapsed is not None else "")
+            + f" from {self.source}\n"
+            + f"{len(self.gaps)} gaps (max {1000 * max_gap:.1f}ms), {self.underruns} underruns, max spawn time {1000 * max_spawn:.1f}ms"
+        )
+
+    def __repr__(self) -> str:
+        return f"<PlaybackTelemetry track_id={self.track_id} played={self.played:.2f} expected={self.expected} underruns={self.underruns}>"
+
+
+class ChainedAudio(discord.AudioSource):
+    """An opus audio source that plays consecutive chunks as one stream
+
+    The chunks are fed from the event loop with ``feed``, while the
+    voice player thread reads them. Switching to the next chunk happens
+    inside ``read``, so the voice player never restarts between chunks.
+    Feeding ``None`` marks the end of the stream.
+
+    The producer should keep one chunk ahead: ``wait_for_demand``
+    returns as soon as the player takes the pending chunk, leaving
+    the whole duration of that chunk to prepare the next one.
+
+    ``read`` never blocks: when the next chunk is late, silence is
+    played until it is fed, for at most ``timeout`` seconds before
+    the stream ends.
+    """
+
+    __slots__ = ("telemetry", "timeout", "_loop", "_pending", "_current", "_demand", "_finished", "_boundary_at", "_underrun_at")
+    if TYPE_CHECKING:
+        telemetry: PlaybackTelemetry
+        timeout: float
+        _loop: asyncio.AbstractEventLoop
+        _pending: queue.Queue[Optional[discord.AudioSource]]
+        _current: Optional[discord.AudioSource]
+        _demand: asyncio.Event
+        _finished: bool
+        _boundary_at: Optional[float]
+        _underrun_at: Optional[float]
+
+    def __init__(self, telemetry: PlaybackTelemetry, *, timeout: float = 10.0) -> None:
+        self.telemetry = telemetry
+        self.timeout = timeout
+        self._loop = asyncio.get_running_loop()
+        self._pending = queue.Queue()
+        self._current = None
+        self._demand = asyncio.Event()
+        self._finished = False
+        self._boundary_at = None
+        self._underrun_at = None
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, source: Optional[discord.AudioSource]) -> None:
+        """Queue the next chunk, or ``None`` to end the stream"""
+        self._demand.clear()
+        self._pending.put_nowait(source)
+
+    async def wait_for_demand(self) -> None:
+        """This function is a coroutine
+
+        Wait until the player takes the pending chunk or the stream
+        is finished
+        """
+        await self._demand.wait()
+
+    def _signal_demand(self) -> None:
+        with contextlib.suppress(RuntimeError):
+            self._loop.call_soon_threadsafe(self._demand.set)
+
+    def _underrun(self) -> bytes:
+        # Blocking the voice player thread would make it burst the late
+        # packets afterwards and delay stop/skip, keep it sending silence
+        now = time.perf_counter()
+        if self._underrun_at is None:
+            self._underrun_at = now
+            if self._boundary_at is not None:
+                self.telemetry.record_underrun()
+
+        elif now - self._underrun_at >= self.timeout:
+            self._finished = True
+            return b""
+
+        return SILENCE
+
+    def read(self) -> bytes:
+        while not self._finished:
+            if self._current is None:
+                try:
+                    self._current = self._pending.get_nowait()
+                except queue.Empty:
+                    return self._underrun()
+
+                self._underrun_at = None
+                self._signal_demand()
+                if self._current is None:
+                    self._finished = True
+                    break
+
+            data = self._current.read()
+            if data:
+                if self._boundary_at is not None:
+                    self.telemetry.record_gap(time.perf_counter() - self._boundary_at)
+                    self._boundary_at = None
+                elif self.telemetry.started_at is None:
+                    self.telemetry.started_at = time.perf_counter()
+
+                self.telemetry.packets += 1
+                return data
+
+            self._current.cleanup()
+            self._current = None
+            self._boundary_at = time.perf_counter()
+
+        return b""
+
+    def is_opus(self) -> bool:
+        return True
+
+    def cleanup(self) -> None:
+        self._finished = True
+        if self._current is not None:
+            self._current.cleanup()
+            self._current = None
+
+        while True:
+            try:
+                source = self._pending.get_nowait()
+            except queue.Empty:
+                break
+
+            if source is not None:
+                source.cleanup()
+
+        self._signal_demand()
@@ -1,18 +1,23 @@
 from __future__ import annotations
 
 import asyncio
+import collections
 import contextlib
 import functools
-import select
 import time
 import traceback
-from typing import Any, AsyncIterator, Coroutine, Optional, TYPE_CHECKING
+from typing import AsyncIterator, Deque, Optional, TYPE_CHECKING
 
 import discord
 
-from lib import emojis
+from lib import emojis, utils
+from .events import AudioEvent, hub
+from .playback import ChainedAudio, PlaybackTelemetry
+from .rtp import ReceiveStats, RTPPacket
 from .sources import InvidiousSource
 if TYPE_CHECKING:
+    import socket
+
     import haruka
     from _types import Loop
     from .client import AudioClient
@@ -41,6 +46,7 @@ class MusicClient(discord.VoiceClient):
         target: discord.abc.Messageable
         current_track: InvidiousSource
         player: asyncio.Task[None]
+        telemetry: Optional[PlaybackTelemetry]
         _debug_audio_length: bool
 
     def __init__(self, *args, **kwargs) -> None:
@@ -50,6 +56,7 @@ class MusicClient(discord.VoiceClient):
         self._operable = asyncio.Event()
         self._event = asyncio.Event()
         self._debug_audio_length = False
+        self.telemetry = None
         super().__init__(*args, **kwargs)
 
     @property
@@ -114,19 +121,28 @@ class MusicClient(discord.VoiceClient):
         with contextlib.suppress(discord.HTTPException):
             return await self.target.send(*args, **kwargs)
 
-    async def when_complete(self, coro: Coroutine[Any, Any, Any]) -> None:
-        """This function is a coroutine
-
-        Assign a coroutine to be run when the current track completes
-        playing.
+    def publish(self, event: AudioEvent) -> None:
+        """Publish an event about this player to the audio event hub
 
         Parameters
         -----
-        coro: ``Coroutine[Any, Any, Any]``
-            The coroutine to be run
+        event: ``AudioEvent``
+            The event to publish
         """
-        await self._operable.wait()
-        self.player.add_done_callback(lambda _: asyncio.create_task(coro))
+        if self.guild:
+            hub.publish(self.guild.id, event)
+
+    def pause(self) -> None:
+        super().pause()
+        self.publish(AudioEvent.PAUSE)
+
+    def resume(self) -> None:
+        super().resume()
+        self.publish(AudioEvent.RESUME)
+
+    def cleanup(self) -> None:
+        self.publish(AudioEvent.DISCONNECT)
+        super().cleanup()
 
     async def skip(self) -> None:
         """This function is a coroutine
@@ -170,7 +186,8 @@ class MusicClient(discord.VoiceClient):
                 add_back = False
 
             track = await InvidiousSource.build(track_id, client=self.audio_client)
-            if track is None or not await track.ensure_source(client=self.audio_client):
+            # Cached tracks are played without their stream URL
+            if track is None or (track_id not in self.audio_client.opus_cache and not await track.ensure_source(client=self.audio_client)):
                 await self.notify(f"{emojis.MIKUCRY} Cannot fetch audio for track ID `{track_id}` (https://www.youtube.com/watch?v={track_id}), removing from the queue.")
                 continue
 
@@ -201,8 +218,31 @@ class MusicClient(discord.VoiceClient):
             The track to be played
         """
         self.current_track = track
-        buffer: asyncio.Queue[discord.FFmpegOpusAudio] = asyncio.Queue(maxsize=1)
-        buffer.put_nowait(await asyncio.to_thread(track.fetch))
+        try:
+            await self.__play(track)
+        finally:
+            self.publish(AudioEvent.TRACK_END)
+
+    async def __play(self, track: InvidiousSource) -> None:
+        cached = self.audio_client.opus_cache.open(track.id)
+        # The stream URL is not fetched for cached tracks, but the entry may have been evicted since then
+        if cached is None and not await track.ensure_source(client=self.audio_client):
+            await self.notify(f"{emojis.MIKUCRY} Cannot fetch audio for track ID `{track.id}` (https://www.youtube.com/watch?v={track.id}), skipping it.")
+            return
+
+        telemetry = self.telemetry = PlaybackTelemetry(track.id, track.length, source="stream" if cached is None else "cache")
+        stream = ChainedAudio(telemetry)
+
+        if cached is None:
+            self.audio_client.opus_cache.record(track, repeat=self._repeat)
+            with utils.TimingContextManager() as measure:
+                stream.feed(await asyncio.to_thread(track.fetch))
+
+            telemetry.record_spawn(measure.result)
+        else:
+            # The whole track is played from a single local file
+            stream.feed(cached)
+            stream.feed(None)
 
         with contextlib.suppress(discord.HTTPException):
             async with self.target.typing():
@@ -215,34 +255,50 @@ class MusicClient(discord.VoiceClient):
 
                 await self.notify(embed=embed)
 
-        async def load(
-            buffer: asyncio.Queue[discord.FFmpegOpusAudio],
-            track: InvidiousSource,
-        ) -> None:
-            audio = await asyncio.to_thread(track.fetch)
-            if audio is not None:
-                await buffer.put(audio)
+        async def produce() -> None:
+            # Stay one chunk ahead, so that the ffmpeg process of the next
+            # chunk is already running when the current one ends
+            while True:
+                await stream.wait_for_demand()
+                if stream.finished:
+                    return
+
+                with utils.TimingContextManager() as measure:
+                    audio = await asyncio.to_thread(track.fetch)
+
+                if audio is not None:
+                    telemetry.record_spawn(measure.result)
+                    if stream.finished:
+                        audio.cleanup()
+                        return
+
+                stream.feed(audio)
+                if audio is None:
+                    return
 
         if self._debug_audio_length:
             await self.notify("Debugging audio length")
-            _start_timestamp = time.perf_counter()
 
-        while not buffer.empty() and self.is_connected():
-            task = asyncio.create_task(load(buffer, track))
+        self.publish(AudioEvent.TRACK_START)
+        producer = asyncio.create_task(produce()) if cached is None else None
+        try:
+            if self.is_connected():
+                self._event.clear()
+                self._operable.set()
 
-            self._event.clear()
-            self._operable.set()
+                super().play(stream, after=self._set_event)
 
-            super().play(buffer.get_nowait(), after=self._set_event)
+                await self._event.wait()
+                self._operable.clear()
 
-            await self._event.wait()
-            self._operable.clear()
+        finally:
+            if producer is not None:
+                producer.cancel()
 
-            await task
+            telemetry.finish()
 
         if self._debug_audio_length:
-            _duration = time.perf_counter() - _start_timestamp
-            await self.notify(f"Track ID {track.id} played for {_duration:.2f}s/{track.length}s.\nSource: `{track.source_api}`")
+            await self.notify(f"{telemetry.summary()}\nSource: `{track.source_api}`")
 
     def _set_event(self, exc: Optional[BaseException] = None) -> None:
         self._event.set()
@@ -258,38 +314,96 @@ class MusicClient(discord.VoiceClient):
 
 
 class AudioReader(discord.VoiceClient):
+    """A voice client that receives audio from the connected channel.
+
+    The UDP socket is watched by the event loop itself, incoming RTP
+    packets are parsed as soon as they arrive and kept in a buffer of
+    at most ``buffer_size`` packets, dropping the oldest ones when the
+    consumer falls behind.
+    """
 
     if TYPE_CHECKING:
         _listening: bool
+        _buffer: Deque[RTPPacket]
+        _readable: asyncio.Event
+        _reading_socket: Optional[socket.socket]
+        buffer_size: int
+        stats: ReceiveStats
         loop: Loop
 
-    def __init__(self, *args, **kwargs) -> None:
+    def __init__(self, *args, buffer_size: int = 500, **kwargs) -> None:
         self._listening = False
+        self._buffer = collections.deque()
+        self._readable = asyncio.Event()
+        self._reading_socket = None
+        self.buffer_size = buffer_size
+        self.stats = ReceiveStats()
         super().__init__(*args, **kwargs)
 
     @property
     def listening(self) -> bool:
         return self._listening
 
-    async def receive(self) -> AsyncIterator[bytes]:
+    async def receive(self) -> AsyncIterator[RTPPacket]:
+        """Iterate over the received RTP packets until the client
+        disconnects
+        """
         if self._listening:
             raise RuntimeError("This audio stream has already been listened to")
 
         self._listening = True
-        while self.is_connected():
-            data = await asyncio.to_thread(self._do_receive)
-            if data is not None:
-                yield data
-
-        self._listening = False
-
-    def _do_receive(self) -> Optional[bytes]:
-        socket = self.socket
-        rsock, _, _ = select.select([socket], [], [socket], 0.1)
-        if rsock:
+        try:
+            while self.is_connected():
+                # The socket is replaced when the voice connection is resumed
+                if self.socket is not self._reading_socket:
+                    self._watch_socket()
+
+                while self._buffer:
+                    yield self._buffer.popleft()
+
+                self._readable.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._readable.wait(), timeout=1.0)
+
+        finally:
+            self._unwatch_socket()
+            self._buffer.clear()
+            self._listening = False
+
+    def _watch_socket(self) -> None:
+        self._unwatch_socket()
+        self._reading_socket = self.socket
+        self._reading_socket.setblocking(False)
+        self.loop.add_reader(self._reading_socket, self._on_readable)
+
+    def _unwatch_socket(self) -> None:
+        if self._reading_socket is not None:
+            with contextlib.suppress(ValueError, OSError):
+                self.loop.remove_reader(self._reading_socket)
+
+            self._reading_socket = None
+
+    def _on_readable(self) -> None:
+        assert self._reading_socket is not None
+        while True:
             try:
-                data = socket.recv(4096)
+                data = self._reading_socket.recv(4096)
+            except (BlockingIOError, InterruptedError):
+                break
             except OSError:
-                return
+                self._unwatch_socket()
+                break
+
+            packet = RTPPacket.parse(data, time.monotonic())
+            if packet is None:
+                self.stats.record_ignored()
+                continue
+
+            self.stats.record(packet)
+            if len(self._buffer) >= self.buffer_size:
+                self._buffer.popleft()
+                self.stats.record_dropped()
+
+            self._buffer.append(packet)
 
-            return data
+        self._readable.set()
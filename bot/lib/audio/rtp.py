@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import struct
+from typing import ClassVar, Dict, Optional, TYPE_CHECKING
+
+from lib import metrics
+
+
+__all__ = (
+    "RTPPacket",
+    "ReceiveStats",
+)
+
+
+RTP_PACKETS = metrics.Counter("haruka_voice_rtp_packets_total", "Number of RTP packets handled by audio readers", ("result",))
+
+
+class RTPPacket:
+    """Represents an RTP packet received from a Discord voice server.
+
+    The payload is still encrypted with the voice connection's secret key.
+
+    Attributes
+    -----
+    sequence: ``int``
+        The 16-bit sequence number
+    timestamp: ``int``
+        The 32-bit RTP timestamp, in 48kHz samples
+    ssrc: ``int``
+        The synchronization source of the speaking user
+    header: ``bytes``
+        The fixed 12-byte RTP header
+    data: ``bytes``
+        The whole packet
+    received_at: ``float``
+        The monotonic time at which the packet was read from the socket
+    """
+
+    __slots__ = ("sequence", "timestamp", "ssrc", "extended", "data", "received_at")
+    HEADER: ClassVar[struct.Struct] = struct.Struct(">xxHII")
+    if TYPE_CHECKING:
+        sequence: int
+        timestamp: int
+        ssrc: int
+        extended: bool
+        data: bytes
+        received_at: float
+
+    def __init__(self, data: bytes, received_at: float) -> None:
+        self.sequence, self.timestamp, self.ssrc = self.HEADER.unpack_from(data)
+        self.extended = bool(data[0] & 0x10)
+        self.data = data
+        self.received_at = received_at
+
+    @property
+    def header(self) -> bytes:
+        return self.data[:12]
+
+    @property
+    def payload(self) -> bytes:
+        return self.data[12:]
+
+    @classmethod
+    def parse(cls, data: bytes, received_at: float) -> Optional[RTPPacket]:
+        """Parse a datagram, returning ``None`` if this is not an RTP
+        voice packet (e.g. RTCP or a keep-alive)
+        """
+        if len(data) < 12 or data[0] >> 6 != 2:
+            return
+
+        # RTCP packet types 200-204 overlap with the marker bit + payload type byte
+        if 200 <= data[1] <= 204:
+            return
+
+        return cls(data, received_at)
+
+    def __repr__(self) -> str:
+        return f"<RTPPacket ssrc={self.ssrc} sequence={self.sequence} timestamp={self.timestamp}>"
+
+
+class _SourceState:
+
+    __slots__ = ("sequence", "transit", "jitter")
+    if TYPE_CHECKING:
+        sequence: int
+        transit: Optional[float]
+        jitter: float
+
+    def __init__(self, sequence: int) -> None:
+        self.sequence = sequence
+        self.transit = None
+        self.jitter = 0.0
+
+
+class ReceiveStats:
+    """Packet counters of an audio reader
+
+    Attributes
+    -----
+    received: ``int``
+        The number of RTP packets read from the socket
+    lost: ``int``
+        The number of packets missing from the sequence numbers
+    dropped: ``int``
+        The number of packets discarded because the buffer was full
+    ignored: ``int``
+        The number of datagrams that were not RTP voice packets
+    """
+
+    __slots__ = ("received", "lost", "dropped", "ignored", "_sources")
+    CLOCK_RATE: ClassVar[int] = 48000
+    if TYPE_CHECKING:
+        received: int
+        lost: int
+        dropped: int
+        ignored: int
+        _sources: Dict[int, _SourceState]
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.lost = 0
+        self.dropped = 0
+        self.ignored = 0
+        self._sources = {}
+
+    def record(self, packet: RTPPacket) -> None:
+        self.received += 1
+        RTP_PACKETS.inc(result="received")
+
+        try:
+            state = self._sources[packet.ssrc]
+        except KeyError:
+            state = self._sources[packet.ssrc] = _SourceState(packet.sequence)
+        else:
+            gap = (packet.sequence - state.sequence) & 0xFFFF
+            if 0 < gap < 0x8000:
+                # Reordered or duplicated packets are not counted as losses
+                self.lost += gap - 1
+                RTP_PACKETS.inc(gap - 1, result="lost")
+                state.sequence = packet.sequence
+
+        # Interarrival jitter estimate from RFC 3550, section 6.4.1
+        transit = packet.received_at - packet.timestamp / self.CLOCK_RATE
+        if state.transit is not None:
+            state.jitter += (abs(transit - state.transit) - state.jitter) / 16
+
+        state.transit = transit
+
+    def record_dropped(self) -> None:
+        self.dropped += 1
+        RTP_PACKETS.inc(result="dropped")
+
+    def record_ignored(self) -> None:
+        self.ignored += 1
+        RTP_PACKETS.inc(result="ignored")
+
+    def jitter(self, ssrc: int) -> Optional[float]:
+        """The interarrival jitter of a synchronization source, in seconds"""
+        state = self._sources.get(ssrc)
+        if state is not None:
+            return state.jitter
+
+    @property
+    def loss_ratio(self) -> float:
+        expected = self.received + self.lost
+        return self.lost / expected if expected else 0.0
+
+    def __repr__(self) -> str:
+        return f"<ReceiveStats received={self.received} lost={self.lost} dropped={self.dropped} ignored={self.ignored}>"
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import collections
+import time
+from typing import List, Optional, OrderedDict, Tuple, TYPE_CHECKING
+
+from lib import metrics
+if TYPE_CHECKING:
+    from .sources import PartialInvidiousSource
+
+
+__all__ = ("SearchCache",)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a searching query so that queries differing only by
+    case or whitespace share the same cache entry
+    """
+    return " ".join(query.casefold().split())
+
+
+class SearchCache:
+    """A TTL and LRU bounded cache of YouTube searching results, keyed
+    by the normalized query and the number of requested results
+    """
+
+    __slots__ = ("ttl", "capacity", "_data")
+    if TYPE_CHECKING:
+        ttl: float
+        capacity: int
+        _data: OrderedDict[Tuple[str, int], Tuple[float, List[PartialInvidiousSource]]]
+
+    def __init__(self, *, ttl: float = 3600.0, capacity: int = 512) -> None:
+        self.ttl = ttl
+        self.capacity = capacity
+        self._data = collections.OrderedDict()
+
+    def get(self, query: str, max_results: int) -> Optional[List[PartialInvidiousSource]]:
+        key = (normalize_query(query), max_results)
+        try:
+            expires_at, results = self._data[key]
+        except KeyError:
+            metrics.cache_lookup("search", False)
+            return
+
+        if expires_at < time.monotonic():
+            del self._data[key]
+            metrics.cache_lookup("search", False)
+            return
+
+        self._data.move_to_end(key)
+        metrics.cache_lookup("search", True)
+        return list(results)
+
+    def put(self, query: str, max_results: int, results: List[PartialInvidiousSource]) -> None:
+        key = (normalize_query(query), max_results)
+        self._data[key] = (time.monotonic() + self.ttl, list(results))
+        self._data.move_to_end(key)
+        while len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -12,8 +12,11 @@ import aiohttp
 import discord
 from discord.utils import escape_markdown as escape
 
+from lib import metrics
 from lib.utils import format, slice_string
 from .constants import INVIDIOUS_URLS, TIMEOUT
+from .extractor import ExtractionResult
+from .streams import StreamURL
 if TYPE_CHECKING:
     from .client import AudioClient
 
@@ -43,9 +46,12 @@ def get_from_memory(id: str) -> Optional[Dict[str, Any]]:
         about the track, or ``None`` if not found.
     """
     if os.path.isfile(f"./tracks/{id}.json"):
+        metrics.cache_lookup("tracks", True)
         with open(f"./tracks/{id}.json", "r") as f:
             return json.load(f)
 
+    metrics.cache_lookup("tracks", False)
+
 
 def save_to_memory(data: Dict[str, Any]) -> None:
     """Save snippet information about a track to a
@@ -65,6 +71,26 @@ def save_to_memory(data: Dict[str, Any]) -> None:
         json.dump(data, f)
 
 
+def save_many_to_memory(items: List[Dict[str, Any]], *, overwrite: bool = True) -> None:
+    """Save snippet information about multiple tracks in a
+    single call, see ``save_to_memory``.
+
+    Since file operations are I/O bound, this function
+    should be called in another thread.
+
+    Parameters
+    -----
+    items: List[Dict[``str``, Any]]
+        The snippet information about the tracks.
+    overwrite: ``bool``
+        Whether to replace the information that was
+        already saved
+    """
+    for data in items:
+        if overwrite or not os.path.isfile(f"./tracks/{data['videoId']}.json"):
+            save_to_memory(data)
+
+
 class PartialInvidiousSource:
     """Represents a video object from Invidious
 
@@ -230,7 +256,8 @@ class InvidiousSource(PartialInvidiousSource):
         self.source = None
         super().__init__(data, source_api)
 
-        for adaptiveFormat in self.data["adaptiveFormats"]:
+        # Search results do not have any format, ensure_source resolves the URL then
+        for adaptiveFormat in self.data.get("adaptiveFormats", ()):
             if adaptiveFormat.get("encoding") == "opus":
                 self.source = adaptiveFormat["url"]
                 break
@@ -297,6 +324,7 @@ class InvidiousSource(PartialInvidiousSource):
         if self.source is None:
             raise RuntimeError(f"No audio source for track ID {self.id}")
 
+        metrics.FFMPEG_PROCESSES.inc(purpose="stream")
         return discord.FFmpegOpusAudio(
             self.source,
             before_options=before_options,
@@ -307,8 +335,14 @@ class InvidiousSource(PartialInvidiousSource):
         """This function is a coroutine
 
         Ensure that the opus encoded audio URL can function
-        properly. If it does not then a new URL will be
-        fetched via ``get_source``.
+        properly.
+
+        A validated URL that is far from its expiry is trusted without
+        any request. Otherwise, it is probed with a ranged request and
+        a new URL is fetched via ``get_source`` if it no longer works.
+        A URL is only cached after a successful probe, and a URL that
+        is close to its expiry is refreshed in the background for the
+        next use.
 
         Parameters
         -----
@@ -321,25 +355,70 @@ class InvidiousSource(PartialInvidiousSource):
             The URL to the audio. This is the same as the
             ``source`` attribute of the object.
         """
-        with contextlib.suppress(aiohttp.ClientError, asyncio.TimeoutError):
-            if self.source:
-                async with client.session.get(self.source, timeout=TIMEOUT) as response:
-                    if response.ok:
-                        return self.source
-
+        cache = client.stream_urls
+        stream = cache.get(self.id)
+        if stream is None and self.source:
+            stream = StreamURL(self.source)
+            if stream.expired:
+                stream = None
+
+        if stream is not None:
+            self.source = stream.url
+            if cache.is_fresh(stream):
+                metrics.cache_lookup("stream_urls", True)
+                return self.source
+
+            if await self.probe(stream.url, client=client):
+                metrics.cache_lookup("stream_urls", True)
+                stream = cache.put(self.id, stream.url, validated=True)
+                if not cache.is_fresh(stream):
+                    client.refresh_source(self.id)
+
+                return self.source
+
+        metrics.cache_lookup("stream_urls", False)
+        cache.invalidate(self.id)
         self.source = await self.get_source(client=client)
+        if self.source and await self.probe(self.source, client=client):
+            cache.put(self.id, self.source, validated=True)
+
         return self.source
 
+    @staticmethod
+    async def probe(url: str, *, client: AudioClient) -> bool:
+        """This function is a coroutine
+
+        Check whether a stream URL is still working by requesting
+        its first byte only.
+
+        Parameters
+        -----
+        url: ``str``
+            The stream URL
+        client: ``AudioClient``
+            The client to perform the request
+
+        Returns
+        -----
+        ``bool``
+            Whether the URL is working
+        """
+        with contextlib.suppress(aiohttp.ClientError, asyncio.TimeoutError):
+            async with client.session.get(url, headers={"Range": "bytes=0-0"}, timeout=TIMEOUT) as response:
+                return response.ok
+
+        return False
+
     async def get_source(self, *, client: AudioClient, ignore_error: bool = False) -> Optional[str]:
         """This function is a coroutine
 
-        Get the audio URL of the source. This method launches
-        an asynchronous subprocess to ``youtube-dl``.
+        Get the audio URL of the source. The extraction is performed
+        by ``youtube_dl`` in the worker pool of ``client.extractor``.
 
         Parameters
         -----
         ignore_error: ``bool``
-            Whether to ignore errors from stderr
+            Whether to ignore extraction errors
         client: ``AudioClient``
             The client to perform the request
 
@@ -348,38 +427,40 @@ class InvidiousSource(PartialInvidiousSource):
         Optional[``str``]
             The fetched URL, or ``None`` if an error occured.
         """
-        args = (
-            "youtube-dl",
-            "--get-url",
-            "--extract-audio",
-            "--audio-format", "opus",
-            "--rm-cache-dir",
-            "--force-ipv4",
-            f"https://www.youtube.com/watch?v={self.id}",
-        )
-
-        process = await asyncio.create_subprocess_exec(
-            *args,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
+        data = await client.extractor.extract_raw(self.id)
+        error = data.get("error")
+        audio_format = None if error else ExtractionResult(data).best_audio()
 
-        __stdout, __stderr = await process.communicate()
-        # These strings may be empty
-        stdout = __stdout.decode("utf-8").strip("\n")
-        stderr = __stderr.decode("utf-8").strip("\n")
+        if audio_format is None:
+            if not ignore_error:
+                client.bot.log(f"youtube-dl cannot fetch source for track ID {self.id}:\n{error or 'No audio formats available'}")
+                await client.bot.report(f"Cannot fetch source for track `{self.id}`", send_state=False)
 
-        if not stdout and not ignore_error:
-            client.bot.log(f"youtube-dl cannot fetch source for track ID {self.id}:\n{stderr}")
-            await client.bot.report(f"Cannot fetch source for track `{self.id}`", send_state=False)
             return
 
         self.source_api = "YOUTUBE-DL"
-        return stdout or None
+        return audio_format.url
 
     def __repr__(self) -> str:
         return f"<InvidiousSource title={self.title} id={self.id} source={self.source}>"
 
+    @classmethod
+    def from_search_result(cls: Type[InvidiousSource], result: PartialInvidiousSource) -> InvidiousSource:
+        """Build an ``InvidiousSource`` from a search result without
+        any request. Its audio URL is obtained by ``ensure_source``.
+
+        Parameters
+        -----
+        result: ``PartialInvidiousSource``
+            The search result
+
+        Returns
+        -----
+        ``InvidiousSource``
+            The track object
+        """
+        return cls(result.data, result.source_api)
+
     @classmethod
     async def build(cls: Type[InvidiousSource], id: str, *, client: AudioClient) -> Optional[InvidiousSource]:
         """This function is a coroutine
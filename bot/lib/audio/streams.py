@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import collections
+import re
+import time
+from typing import ClassVar, Optional, OrderedDict, TYPE_CHECKING
+
+from yarl import URL
+
+
+__all__ = (
+    "StreamURL",
+    "StreamURLCache",
+)
+
+
+EXPIRE_PATH_PATTERN = re.compile(r"/expire/(\d+)(?:/|$)")
+
+
+def parse_expiry(url: str) -> Optional[float]:
+    """Get the expiry timestamp of a signed googlevideo URL
+
+    The timestamp is usually carried by the ``expire`` query
+    parameter, though some URLs embed it in the path instead.
+
+    Parameters
+    -----
+    url: ``str``
+        The stream URL
+
+    Returns
+    -----
+    Optional[``float``]
+        The UNIX timestamp at which the URL expires, or ``None``
+        if it cannot be determined
+    """
+    try:
+        return float(URL(url).query["expire"])
+    except (KeyError, ValueError):
+        pass
+
+    match = EXPIRE_PATH_PATTERN.search(url)
+    if match is not None:
+        return float(match.group(1))
+
+
+class StreamURL:
+    """Represents a cached audio stream URL
+
+    Attributes
+    -----
+    url: ``str``
+        The stream URL
+    expires_at: Optional[``float``]
+        The UNIX timestamp at which the URL expires, or ``None``
+        if the URL does not advertise its expiry
+    validated_at: ``float``
+        The UNIX timestamp of the last time the URL was known to
+        be working
+    """
+
+    __slots__ = ("url", "expires_at", "validated_at")
+    if TYPE_CHECKING:
+        url: str
+        expires_at: Optional[float]
+        validated_at: float
+
+    def __init__(self, url: str, *, validated_at: float = 0.0) -> None:
+        self.url = url
+        self.expires_at = parse_expiry(url)
+        self.validated_at = validated_at
+
+    def remaining(self) -> Optional[float]:
+        """The number of seconds before this URL expires, or ``None``
+        if unknown
+        """
+        if self.expires_at is not None:
+            return self.expires_at - time.time()
+
+    @property
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def __repr__(self) -> str:
+        return f"<StreamURL expires_at={self.expires_at} validated_at={self.validated_at}>"
+
+
+class StreamURLCache:
+    """A cache of audio stream URLs, keyed by track ID
+
+    Only URLs that were probed successfully should be stored. A
+    validated URL that is valid for more than ``REFRESH_MARGIN``
+    seconds is trusted without any network request. Closer to its
+    expiry (or when its expiry is unknown and it was not validated
+    within the last ``VALIDATION_INTERVAL`` seconds), it should be
+    probed and refreshed before the next use.
+
+    URLs that do not advertise their expiry are discarded
+    ``DEFAULT_TTL`` seconds after their last validation, and at most
+    ``capacity`` URLs are kept, the least recently used ones are
+    evicted first.
+    """
+
+    __slots__ = ("capacity", "_data")
+    DEFAULT_TTL: ClassVar[float] = 3600.0
+    REFRESH_MARGIN: ClassVar[float] = 600.0
+    VALIDATION_INTERVAL: ClassVar[float] = 300.0
+    if TYPE_CHECKING:
+        capacity: int
+        _data: OrderedDict[str, StreamURL]
+
+    def __init__(self, *, capacity: int = 1024) -> None:
+        self.capacity = capacity
+        self._data = collections.OrderedDict()
+
+    def _expired(self, stream: StreamURL) -> bool:
+        if stream.expires_at is None:
+            return time.time() - stream.validated_at >= self.DEFAULT_TTL
+
+        return stream.expired
+
+    def get(self, track_id: str) -> Optional[StreamURL]:
+        """Get the cached URL of a track, discarding it if it has
+        already expired
+        """
+        try:
+            stream = self._data[track_id]
+        except KeyError:
+            return
+
+        if self._expired(stream):
+            del self._data[track_id]
+            return
+
+        self._data.move_to_end(track_id)
+        return stream
+
+    def put(self, track_id: str, url: str, *, validated: bool = False) -> StreamURL:
+        """Store the URL of a track and evict expired entries"""
+        for key in [key for key, stream in self._data.items() if self._expired(stream)]:
+            del self._data[key]
+
+        stream = self._data[track_id] = StreamURL(url, validated_at=time.time() if validated else 0.0)
+        self._data.move_to_end(track_id)
+        while len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+
+        return stream
+
+    def invalidate(self, track_id: str) -> bool:
+        return self._data.pop(track_id, None) is not None
+
+    def is_fresh(self, stream: StreamURL) -> bool:
+        """Whether ``stream`` can be used without validation"""
+        # Some URLs (e.g. from Invidious) are bound to the IP address that
+        # requested them, a URL that was never probed cannot be trusted
+        if stream.validated_at <= 0:
+            return False
+
+        remaining = stream.remaining()
+        if remaining is not None:
+            return remaining > self.REFRESH_MARGIN
+
+        return time.time() - stream.validated_at < self.VALIDATION_INTERVAL
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import enum
+import itertools
+import os
+import traceback
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from lib import metrics
+
+
+__all__ = (
+    "ArtifactFormat",
+    "ArtifactIndex",
+    "TranscodePriority",
+    "TranscodeJob",
+    "TranscodeScheduler",
+)
+
+
+TRANSCODE_JOBS = metrics.Gauge("haruka_transcode_jobs", "Number of transcode jobs", ("state",))
+TRANSCODE_DURATION = metrics.Histogram(
+    "haruka_transcode_duration_seconds",
+    "Time spent transcoding a track, excluding the time spent in the queue",
+    ("format", "result"),
+    buckets=(1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+
+class ArtifactFormat(str, enum.Enum):
+    """The file formats of downloaded tracks
+
+    ``OGG`` remuxes the original opus stream without re-encoding it,
+    ``MP3`` is a full transcode and should only be used on request.
+    """
+    OGG = "ogg"
+    MP3 = "mp3"
+
+    @property
+    def attempts(self) -> List[Tuple[str, ...]]:
+        """The ffmpeg output options to try in order"""
+        if self is ArtifactFormat.OGG:
+            return [
+                ("-map", "0:a:0", "-c:a", "copy", "-f", "ogg"),
+                # The source is not opus encoded, e.g. an AAC fallback
+                ("-map", "0:a:0", "-c:a", "libopus", "-b:a", "128k", "-f", "ogg"),
+            ]
+
+        return [("-vn", "-f", "mp3")]
+
+
+class ArtifactIndex:
+    """Keep track of the downloaded files in ``directory``, in all
+    available formats
+
+    The directory is scanned once on first access, then the index is
+    updated by the ``TranscodeScheduler``.
+    """
+
+    __slots__ = ("directory", "_data")
+    if TYPE_CHECKING:
+        directory: str
+        _data: Optional[Dict[str, Dict[ArtifactFormat, int]]]
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._data = None
+
+    @property
+    def data(self) -> Dict[str, Dict[ArtifactFormat, int]]:
+        if self._data is None:
+            self._data = {}
+            with contextlib.suppress(FileNotFoundError):
+                for entry in os.scandir(self.directory):
+                    track_id, _, extension = entry.name.rpartition(".")
+                    try:
+                        format = ArtifactFormat(extension)
+                    except ValueError:
+                        continue
+
+                    self._data.setdefault(track_id, {})[format] = entry.stat().st_size
+
+        return self._data
+
+    def path(self, track_id: str, format: ArtifactFormat) -> str:
+        return os.path.join(self.directory, f"{track_id}.{format.value}")
+
+    def formats(self, track_id: str) -> List[ArtifactFormat]:
+        """Get the available formats of a track"""
+        return list(self.data.get(track_id, ()))
+
+    def get(self, track_id: str, format: ArtifactFormat) -> Optional[str]:
+        """Get the path to a downloaded file, or ``None`` if the track
+        is not available in this format
+        """
+        if format in self.data.get(track_id, ()):
+            path = self.path(track_id, format)
+            if os.path.isfile(path):
+                return path
+
+            self.discard(track_id, format)
+
+    def add(self, track_id: str, format: ArtifactFormat) -> str:
+        path = self.path(track_id, format)
+        self.data.setdefault(track_id, {})[format] = os.path.getsize(path)
+        return path
+
+    def discard(self, track_id: str, format: ArtifactFormat) -> None:
+        formats = self.data.get(track_id, {})
+        formats.pop(format, None)
+        if not formats:
+            self.data.pop(track_id, None)
+
+    @property
+    def size(self) -> int:
+        """The total size of the indexed files in bytes"""
+        return sum(sum(formats.values()) for formats in self.data.values())
+
+
+class TranscodePriority(enum.IntEnum):
+    """The priority of a transcode job, lower values are processed first"""
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+class TranscodeJob:
+    """Represents a pending or running transcode of a track
+
+    Attributes
+    -----
+    track_id: ``str``
+        The track ID
+    format: ``ArtifactFormat``
+        The output format
+    priority: ``TranscodePriority``
+        The priority of the job
+    duration: Optional[``int``]
+        The length of the track in seconds, used to compute the progress
+    state: ``str``
+        One of "queued", "running", "done" or "failed"
+    position: ``float``
+        The number of seconds of audio that were transcoded so far
+    """
+
+    __slots__ = ("track_id", "format", "priority", "duration", "state", "position", "_resolver", "_future")
+    if TYPE_CHECKING:
+        track_id: str
+        format: ArtifactFormat
+        priority: TranscodePriority
+        duration: Optional[int]
+        state: str
+        position: float
+        _resolver: Callable[[], Awaitable[Optional[str]]]
+        _future: asyncio.Future[Optional[str]]
+
+    def __init__(
+        self,
+        track_id: str,
+        format: ArtifactFormat,
+        resolver: Callable[[], Awaitable[Optional[str]]],
+        *,
+        priority: TranscodePriority,
+        duration: Optional[int],
+    ) -> None:
+        self.track_id = track_id
+        self.format = format
+        self.priority = priority
+        self.duration = duration
+        self.state = "queued"
+        self.position = 0.0
+        self._resolver = resolver
+        self._future = asyncio.get_running_loop().create_future()
+
+    @property
+    def progress(self) -> Optional[float]:
+        """The completed fraction of the job, or ``None`` if the length
+        of the track is unknown
+        """
+        if self.state == "done":
+            return 1.0
+
+        if self.duration:
+            return min(1.0, self.position / self.duration)
+
+    def _set_state(self, state: str) -> None:
+        TRANSCODE_JOBS.dec(state=self.state)
+        TRANSCODE_JOBS.inc(state=state)
+        self.state = state
+
+    def __repr__(self) -> str:
+        return f"<TranscodeJob track_id={self.track_id} format={self.format.value} priority={self.priority.name} state={self.state} progress={self.progress}>"
+
+
+class TranscodeScheduler:
+    """Run ffmpeg jobs that download tracks into ``directory``, with at
+    most ``max_workers`` processes at the same time across the whole bot.
+
+    Jobs are processed by priority, then in submission order. A track
+    that is already downloaded, queued or running in the requested
+    format is never processed twice, and failed jobs are discarded
+    along with their partial output so that they can be retried later.
+    Unexpected errors of a job are reported to ``log``.
+    """
+
+    __slots__ = ("index", "max_workers", "log", "_counter", "_jobs", "_queue", "_workers")
+    if TYPE_CHECKING:
+        index: ArtifactIndex
+        max_workers: int
+        log: Callable[[str], Any]
+        _counter: itertools.count[int]
+        _jobs: Dict[Tuple[str, ArtifactFormat], TranscodeJob]
+        _queue: Optional[asyncio.PriorityQueue[Tuple[int, int, TranscodeJob]]]
+        _workers: List[asyncio.Task[None]]
+
+    def __init__(self, *, directory: str = "./server/audio", max_workers: int = 2, log: Callable[[str], Any] = print) -> None:
+        self.index = ArtifactIndex(directory)
+        self.max_workers = max_workers
+        self.log = log
+        self._counter = itertools.count()
+        self._jobs = {}
+        self._queue = None
+        self._workers = []
+
+    def get(self, track_id: str, format: ArtifactFormat = ArtifactFormat.OGG) -> Optional[TranscodeJob]:
+        """Get the queued or running job of a track"""
+        return self._jobs.get((track_id, format))
+
+    @property
+    def jobs(self) -> List[TranscodeJob]:
+        return list(self._jobs.values())
+
+    async def transcode(
+        self,
+        track_id: str,
+        resolver: Callable[[], Awaitable[Optional[str]]],
+        *,
+        format: ArtifactFormat = ArtifactFormat.OGG,
+        priority: TranscodePriority = TranscodePriority.INTERACTIVE,
+        duration: Optional[int] = None,
+    ) -> Optional[str]:
+        """This function is a coroutine
+
+        Download a track, or wait for its existing job to complete.
+
+        Parameters
+        -----
+        track_id: ``str``
+            The track ID
+        resolver: Callable[[], Awaitable[Optional[``str``]]]
+            A coroutine function returning the URL of the input audio.
+            It is called when a worker picks up the job, so that the URL
+            is as fresh as possible. An MP3 job uses the local OGG file
+            instead when it exists.
+        format: ``ArtifactFormat``
+            The output format
+        priority: ``TranscodePriority``
+            The priority of the job. If the track already has a queued
+            job, this has no effect.
+        duration: Optional[``int``]
+            The length of the track in seconds
+
+        Returns
+        -----
+        Optional[``str``]
+            The path to the downloaded file, or ``None`` if the job failed
+        """
+        path = self.index.get(track_id, format)
+        if path is not None:
+            return path
+
+        try:
+            job = self._jobs[track_id, format]
+        except KeyError:
+            job = self._jobs[track_id, format] = TranscodeJob(track_id, format, resolver, priority=priority, duration=duration)
+            TRANSCODE_JOBS.inc(state=job.state)
+            self._ensure_workers()
+            self._queue.put_nowait((job.priority, next(self._counter), job))  # type: ignore
+
+        return await asyncio.shield(job._future)
+
+    def _ensure_workers(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self.max_workers:
+            self._workers.append(asyncio.create_task(self._work(), name=f"Transcode worker #{len(self._workers)}"))
+
+    async def _work(self) -> None:
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job = await self._queue.get()
+            result = None
+            try:
+                job._set_state("running")
+                started_at = loop.time()
+                result = await self._run(job)
+                TRANSCODE_DURATION.observe(loop.time() - started_at, format=job.format.value, result="done" if result else "failed")
+            except Exception:
+                self.log(f"Transcode job {job!r} failed:\n" + traceback.format_exc())
+            finally:
+                TRANSCODE_JOBS.dec(state=job.state)
+                job.state = "done" if result else "failed"
+                del self._jobs[job.track_id, job.format]
+                if not job._future.done():
+                    job._future.set_result(result)
+
+                self._queue.task_done()
+
+    async def _run(self, job: TranscodeJob) -> Optional[str]:
+        source = None
+        if job.format is not ArtifactFormat.OGG:
+            source = self.index.get(job.track_id, ArtifactFormat.OGG)
+
+        if source is None:
+            source = await job._resolver()
+            if not source:
+                return
+
+        path = self.index.path(job.track_id, job.format)
+        for options in job.format.attempts:
+            job.position = 0.0
+            if await self._ffmpeg(job, source, options, path + ".part"):
+                os.replace(path + ".part", path)
+                return self.index.add(job.track_id, job.format)
+
+    async def _ffmpeg(self, job: TranscodeJob, source: str, options: Tuple[str, ...], output: str) -> bool:
+        args = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error"]
+        if source.startswith(("http://", "https://")):
+            args.extend(("-reconnect", "1", "-reconnect_streamed", "1"))
+
+        args.extend(("-i", source, *options, "-progress", "pipe:1", "-nostats", "-y", output))
+        metrics.FFMPEG_PROCESSES.inc(purpose="download")
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+
+        succeeded = False
+        try:
+            assert process.stdout is not None
+            async for line in process.stdout:
+                key, _, value = line.decode("utf-8").strip().partition("=")
+                if key == "out_time_us":
+                    with contextlib.suppress(ValueError):
+                        job.position = int(value) / 1_000_000
+
+            succeeded = await process.wait() == 0
+            return succeeded
+
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+            if not succeeded:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(output)
+
+    def stop(self) -> None:
+        """Cancel all workers. Running ffmpeg processes are killed and
+        pending jobs complete with ``None``.
+        """
+        for worker in self._workers:
+            worker.cancel()
+
+        self._workers.clear()
+        for job in self._jobs.values():
+            if not job._future.done():
+                job._future.set_result(None)
@@ -0,0 +1,394 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+import traceback
+from typing import Any, Callable, ClassVar, Dict, List, Optional, TYPE_CHECKING
+
+import asyncpg
+
+import env
+from lib import metrics
+if TYPE_CHECKING:
+    import haruka
+
+
+__all__ = (
+    "ClusterConfig",
+    "ClusterNode",
+    "PeerInfo",
+)
+
+
+CLUSTER_PEERS = metrics.Gauge("haruka_cluster_peers", "Number of cluster processes with a recent heartbeat")
+CLUSTER_NOTIFICATIONS = metrics.Counter("haruka_cluster_notifications_total", "Number of notifications received from the cluster", ("channel",))
+CLUSTER_RECONNECTS = metrics.Counter("haruka_cluster_reconnects_total", "Number of times the cluster listener connection was re-established")
+
+
+class ClusterConfig:
+    """The position of this process in the cluster
+
+    The shards are split into ``cluster_count`` contiguous ranges, and
+    the process with index ``cluster_id`` runs the shards of its range
+    with ``commands.AutoShardedBot``. Cluster 0 is the primary process:
+    it serves the public web server and runs the tasks that must run
+    only once, such as the reminders.
+
+    Attributes
+    -----
+    cluster_id: ``int``
+        The index of this process
+    cluster_count: ``int``
+        The number of processes
+    shard_count: ``int``
+        The total number of shards, or 0 to let Discord decide. This
+        must be set when there is more than 1 process.
+    internal_port: ``int``
+        The internal web server port of cluster 0, cluster ``i`` listens
+        on ``internal_port + i``
+    """
+
+    __slots__ = ("cluster_id", "cluster_count", "shard_count", "internal_port")
+    if TYPE_CHECKING:
+        cluster_id: int
+        cluster_count: int
+        shard_count: int
+        internal_port: int
+
+    def __init__(self, *, cluster_id: int = 0, cluster_count: int = 1, shard_count: int = 0, internal_port: int = 8081) -> None:
+        if cluster_count < 1 or not 0 <= cluster_id < cluster_count:
+            raise ValueError(f"Invalid cluster {cluster_id} of {cluster_count}")
+
+        if cluster_count > 1 and shard_count < cluster_count:
+            raise ValueError(f"{cluster_count} processes need at least as many shards, got SHARD_COUNT={shard_count}. Start the cluster with launcher.py.")
+
+        self.cluster_id = cluster_id
+        self.cluster_count = cluster_count
+        self.shard_count = shard_count
+        self.internal_port = internal_port
+
+    @classmethod
+    def from_env(cls) -> ClusterConfig:
+        return cls(
+            cluster_id=env.CLUSTER_ID,
+            cluster_count=env.CLUSTER_COUNT,
+            shard_count=env.SHARD_COUNT,
+            internal_port=env.CLUSTER_PORT,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the bot runs as more than 1 process"""
+        return self.cluster_count > 1
+
+    @property
+    def primary(self) -> bool:
+        return self.cluster_id == 0
+
+    def shard_range(self, cluster_id: int) -> range:
+        """Get the shard IDs run by a process"""
+        return range(self.shard_count * cluster_id // self.cluster_count, self.shard_count * (cluster_id + 1) // self.cluster_count)
+
+    @property
+    def shard_ids(self) -> Optional[List[int]]:
+        """The shard IDs run by this process, or ``None`` if this is the
+        only process
+        """
+        if self.enabled:
+            return list(self.shard_range(self.cluster_id))
+
+    def shard_of(self, guild_id: int) -> int:
+        return (guild_id >> 22) % self.shard_count
+
+    def cluster_of(self, guild_id: int) -> int:
+        """Get the index of the process that receives the events of a guild"""
+        if not self.enabled:
+            return self.cluster_id
+
+        shard_id = self.shard_of(guild_id)
+        for cluster_id in range(self.cluster_count):
+            if shard_id in self.shard_range(cluster_id):
+                return cluster_id
+
+        raise ValueError(f"Shard {shard_id} is not run by any process")
+
+    def internal_address(self, cluster_id: int) -> str:
+        return f"http://127.0.0.1:{self.internal_port + cluster_id}"
+
+    def __repr__(self) -> str:
+        return f"<ClusterConfig cluster_id={self.cluster_id} cluster_count={self.cluster_count} shard_count={self.shard_count}>"
+
+
+class PeerInfo:
+    """The latest heartbeat of a process in the cluster
+
+    Attributes
+    -----
+    cluster_id: ``int``
+        The index of the process
+    shards: List[``int``]
+        The shard IDs run by the process
+    pid: ``int``
+        The operating system process ID
+    guilds: ``int``
+        The number of guilds in the cache of the process
+    voice_clients: ``int``
+        The number of connected voice clients
+    usage: Dict[``str``, Dict[``str``, ``int``]]
+        The number of uses of each text (``"text"``) and slash
+        (``"slash"``) command since the process started
+    """
+
+    __slots__ = ("cluster_id", "shards", "pid", "guilds", "voice_clients", "usage", "_age", "_fetched_at")
+    if TYPE_CHECKING:
+        cluster_id: int
+        shards: List[int]
+        pid: int
+        guilds: int
+        voice_clients: int
+        usage: Dict[str, Dict[str, int]]
+        _age: float
+        _fetched_at: float
+
+    def __init__(self, row: asyncpg.Record) -> None:
+        self.cluster_id = row["id"]
+        self.shards = list(row["shards"])
+        self.pid = row["pid"]
+        self.guilds = row["guilds"]
+        self.voice_clients = row["voice_clients"]
+        self.usage = json.loads(row["usage"])
+        self._age = row["age"]
+        self._fetched_at = time.perf_counter()
+
+    @property
+    def age(self) -> float:
+        """The time since the heartbeat, in seconds"""
+        return self._age + time.perf_counter() - self._fetched_at
+
+    def __repr__(self) -> str:
+        return f"<PeerInfo cluster_id={self.cluster_id} pid={self.pid} guilds={self.guilds} age={self.age:.1f}>"
+
+
+Listener = Callable[[str], Any]
+
+
+class ClusterNode:
+    """Connect this process to the other processes of the cluster
+    through Postgres
+
+    The node keeps a dedicated connection that LISTENs on the channels
+    of the registered listeners, and is re-established when it is lost.
+    Every ``HEARTBEAT_INTERVAL`` seconds, the state of this process is
+    written to the ``clusters`` table and the states of all processes
+    are read back, so that each process knows which of its peers are
+    alive.
+
+    This also runs with a single process, so that the code paths are
+    the same in both deployments.
+
+    Attributes
+    -----
+    bot: ``haruka.Haruka``
+        The bot of this process
+    config: ``ClusterConfig``
+        The position of this process in the cluster
+    peers: Dict[``int``, ``PeerInfo``]
+        The latest heartbeats of all processes, including this one
+    """
+
+    __slots__ = ("bot", "config", "peers", "_listeners", "_connection", "_heartbeat", "_reconnect", "_closed")
+    HEARTBEAT_INTERVAL: ClassVar[float] = 15.0
+    PEER_TIMEOUT: ClassVar[float] = 45.0
+    if TYPE_CHECKING:
+        bot: haruka.Haruka
+        config: ClusterConfig
+        peers: Dict[int, PeerInfo]
+        _listeners: Dict[str, List[Listener]]
+        _connection: Optional[asyncpg.Connection]
+        _heartbeat: Optional[asyncio.Task[None]]
+        _reconnect: Optional[asyncio.Task[None]]
+        _closed: bool
+
+    def __init__(self, bot: haruka.Haruka, config: ClusterConfig) -> None:
+        self.bot = bot
+        self.config = config
+        self.peers = {}
+        self._listeners = {}
+        self._connection = None
+        self._heartbeat = None
+        self._reconnect = None
+        self._closed = False
+
+    async def start(self) -> None:
+        """This function is a coroutine
+
+        Open the listener connection and start sending heartbeats. The
+        database pool of the bot must be ready.
+        """
+        await self._connect()
+        await self.beat()
+        await self.refresh_peers()
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop(), name="Cluster heartbeat")
+
+    async def _connect(self) -> None:
+        connection = await asyncpg.connect(env.DATABASE_URL)
+        connection.add_termination_listener(self._on_termination)
+        for channel in self._listeners:
+            await connection.add_listener(channel, self._dispatch)
+
+        self._connection = connection
+
+    def _on_termination(self, connection: asyncpg.Connection) -> None:
+        self._connection = None
+        if not self._closed and self._reconnect is None:
+            self._reconnect = asyncio.create_task(self._reconnect_loop(), name="Cluster reconnect")
+
+    async def _reconnect_loop(self) -> None:
+        delay = 1.0
+        try:
+            while not self._closed:
+                await asyncio.sleep(delay)
+                try:
+                    await self._connect()
+                except (OSError, asyncpg.PostgresError):
+                    delay = min(2 * delay, 60.0)
+                else:
+                    CLUSTER_RECONNECTS.inc()
+                    self.bot.log("Re-established the cluster listener connection")
+                    # Notifications sent meanwhile are lost
+                    await self.refresh_peers()
+                    return
+
+        finally:
+            self._reconnect = None
+
+    async def listen(self, channel: str, callback: Listener) -> None:
+        """This function is a coroutine
+
+        Call ``callback`` with the payload of every notification on a
+        channel, including the ones sent by this process. Coroutine
+        callbacks are run as tasks.
+
+        Parameters
+        -----
+        channel: ``str``
+            The channel name
+        callback: Callable[[``str``], Any]
+            The callback
+        """
+        listeners = self._listeners.get(channel)
+        if listeners is None:
+            listeners = self._listeners[channel] = []
+            if self._connection is not None:
+                await self._connection.add_listener(channel, self._dispatch)
+
+        listeners.append(callback)
+
+    def _dispatch(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        CLUSTER_NOTIFICATIONS.inc(channel=channel)
+        for callback in self._listeners.get(channel, ()):
+            try:
+                result = callback(payload)
+                if asyncio.iscoroutine(result):
+                    asyncio.create_task(result)
+            except Exception:
+                self.bot.log(f"Exception in listener of cluster channel {channel}:")
+                self.bot.log(traceback.format_exc())
+
+    async def notify(self, channel: str, payload: str = "") -> None:
+        """This function is a coroutine
+
+        Send a notification to all processes of the cluster
+
+        Parameters
+        -----
+        channel: ``str``
+            The channel name
+        payload: ``str``
+            The payload, at most 8000 bytes
+        """
+        await self.bot.conn.execute("SELECT pg_notify($1, $2);", channel, payload)
+
+    async def beat(self) -> None:
+        """This function is a coroutine
+
+        Publish the state of this process
+        """
+        usage = {
+            "text": {name: len(uses) for name, uses in self.bot._command_count.items()},
+            "slash": {name: len(uses) for name, uses in self.bot._slash_command_count.items()},
+        }
+        await self.bot.conn.execute(
+            """
+            INSERT INTO clusters (id, shards, pid, guilds, voice_clients, usage, updated_at)
+            VALUES ($1, $2, $3, $4, $5, $6::jsonb, now())
+            ON CONFLICT (id) DO UPDATE
+            SET shards = $2, pid = $3, guilds = $4, voice_clients = $5, usage = $6::jsonb, updated_at = now();
+            """,
+            self.config.cluster_id,
+            self.config.shard_ids or [],
+            os.getpid(),
+            len(self.bot.guilds),
+            len(self.bot.voice_clients),
+            json.dumps(usage),
+        )
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_INTERVAL)
+            try:
+                # A single query per process and interval, rather than on every heartbeat of every peer
+                await self.beat()
+                await self.refresh_peers()
+            except (OSError, asyncpg.PostgresError):
+                self.bot.log("WARNING: Cannot send cluster heartbeat:")
+                self.bot.log(traceback.format_exc())
+
+    async def refresh_peers(self) -> None:
+        """This function is a coroutine
+
+        Fetch the latest heartbeats of all processes
+        """
+        rows = await self.bot.conn.fetch(
+            "SELECT *, extract(epoch FROM now() - updated_at)::float8 AS age FROM clusters WHERE id < $1;",
+            self.config.cluster_count,
+        )
+        self.peers = {row["id"]: PeerInfo(row) for row in rows}
+        CLUSTER_PEERS.set(sum(1 for cluster_id in self.peers if self.alive(cluster_id)))
+
+    def alive(self, cluster_id: int) -> bool:
+        """Whether a process sent a heartbeat recently"""
+        if cluster_id == self.config.cluster_id:
+            return True
+
+        peer = self.peers.get(cluster_id)
+        return peer is not None and peer.age < self.PEER_TIMEOUT
+
+    def usage(self) -> Dict[str, Dict[str, int]]:
+        """The number of uses of each command across the cluster, from
+        the latest heartbeats
+        """
+        total: Dict[str, Dict[str, int]] = {"text": {}, "slash": {}}
+        for peer in self.peers.values():
+            for kind, counts in peer.usage.items():
+                for name, count in counts.items():
+                    total[kind][name] = total[kind].get(name, 0) + count
+
+        return total
+
+    async def close(self) -> None:
+        """This function is a coroutine
+
+        Stop the heartbeats and close the listener connection
+        """
+        self._closed = True
+        for task in (self._heartbeat, self._reconnect):
+            if task is not None:
+                task.cancel()
+
+        if self._connection is not None:
+            connection = self._connection
+            self._connection = None
+            await connection.close()
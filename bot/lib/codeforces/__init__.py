@@ -1,4 +1,5 @@
 #!/bot/lib/codeforces
+from .catalog import *
 from .contest import *
 from .errors import *
 from .users import *
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import contextlib
+import time
+from typing import Any, ClassVar, Dict, List, Optional, TYPE_CHECKING
+
+import aiohttp
+import discord
+
+from .contest import Contest
+from .errors import CodeforcesException
+
+
+__all__ = (
+    "ContestCatalog",
+    "contest_catalog",
+)
+
+
+ACTIVE_PHASES = ("CODING", "PENDING_SYSTEM_TEST", "SYSTEM_TEST")
+
+
+class ContestCatalog:
+    """An in-memory copy of the Codeforces contest list, indexed by
+    phase and start time
+
+    The list is refreshed when it becomes due, at an interval that
+    depends on the contests: every ``ACTIVE_INTERVAL`` seconds while
+    a contest is running, right after the start of the next upcoming
+    contest, and every ``IDLE_INTERVAL`` seconds otherwise. A due list
+    is still served while it is being refreshed in the background.
+
+    Contests whose data did not change since the previous refresh are
+    not rebuilt.
+
+    Attributes
+    -----
+    gym: ``bool``
+        Whether this catalog contains gym contests
+    refreshed_at: ``float``
+        The ``time.time()`` of the last successful refresh, 0 if none
+    next_refresh_at: ``float``
+        The ``time.time()`` at which the list becomes due
+    """
+
+    __slots__ = (
+        "gym",
+        "refreshed_at",
+        "next_refresh_at",
+        "_payloads",
+        "_by_id",
+        "_by_phase",
+        "_by_start",
+        "_start_keys",
+        "_lock",
+        "_task",
+    )
+    ACTIVE_INTERVAL: ClassVar[float] = 60.0
+    IDLE_INTERVAL: ClassVar[float] = 3600.0
+    MIN_INTERVAL: ClassVar[float] = 30.0
+    START_MARGIN: ClassVar[float] = 10.0
+    if TYPE_CHECKING:
+        gym: bool
+        refreshed_at: float
+        next_refresh_at: float
+        _payloads: Dict[int, Dict[str, Any]]
+        _by_id: Dict[int, Contest]
+        _by_phase: Dict[str, List[Contest]]
+        _by_start: List[Contest]
+        _start_keys: List[float]
+        _lock: Optional[asyncio.Lock]
+        _task: Optional[asyncio.Task[None]]
+
+    def __init__(self, *, gym: bool = False) -> None:
+        self.gym = gym
+        self.refreshed_at = 0.0
+        self.next_refresh_at = 0.0
+        self._payloads = {}
+        self._by_id = {}
+        self._by_phase = {}
+        self._by_start = []
+        self._start_keys = []
+        self._lock = None
+        self._task = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.refreshed_at > 0
+
+    @property
+    def due(self) -> bool:
+        return time.time() >= self.next_refresh_at
+
+    async def refresh(self, *, session: aiohttp.ClientSession, force: bool = False) -> None:
+        """This function is a coroutine
+
+        Fetch the contest list and rebuild the indexes. Concurrent
+        calls share the same request.
+
+        Parameters
+        -----
+        session: ``aiohttp.ClientSession``
+            The session to perform the request
+        force: ``bool``
+            Whether to refresh even if the list is not due yet
+
+        Raises
+        -----
+        ``CodeforcesException``
+            The request failed
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if not force and not self.due:
+                return
+
+            try:
+                payloads = await Contest.fetch_payloads(gym=self.gym, session=session)
+            except CodeforcesException:
+                # Retry soon, but do not flood the API
+                self.next_refresh_at = time.time() + self.MIN_INTERVAL
+                raise
+
+            self._update(payloads)
+
+    def _update(self, payloads: List[Dict[str, Any]]) -> None:
+        by_id = {}
+        new_payloads = {}
+        for payload in payloads:
+            contest_id = payload["id"]
+            contest = self._by_id.get(contest_id)
+            if contest is None or self._payloads.get(contest_id) != payload:
+                contest = Contest(payload)
+
+            by_id[contest_id] = contest
+            new_payloads[contest_id] = payload
+
+        self._payloads = new_payloads
+        self._by_id = by_id
+
+        self._by_phase = {}
+        for contest in by_id.values():
+            self._by_phase.setdefault(contest.phase, []).append(contest)
+
+        # Ascending start time, contests without a start time are only indexed by ID and phase
+        self._by_start = sorted((contest for contest in by_id.values() if contest.start_at is not None), key=lambda contest: contest.start_at)
+        self._start_keys = [contest.start_at.timestamp() for contest in self._by_start]  # type: ignore
+
+        now = time.time()
+        self.refreshed_at = now
+        self.next_refresh_at = now + self._interval(now)
+
+    def _interval(self, now: float) -> float:
+        if any(self._by_phase.get(phase) for phase in ACTIVE_PHASES):
+            return self.ACTIVE_INTERVAL
+
+        interval = self.IDLE_INTERVAL
+        index = bisect.bisect_right(self._start_keys, now)
+        if index < len(self._start_keys):
+            interval = min(interval, self._start_keys[index] - now + self.START_MARGIN)
+
+        return max(interval, self.MIN_INTERVAL)
+
+    def _refresh_in_background(self, session: aiohttp.ClientSession) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._background_refresh(session))
+
+    async def _background_refresh(self, session: aiohttp.ClientSession) -> None:
+        with contextlib.suppress(CodeforcesException):
+            await self.refresh(session=session)
+
+    async def ensure(self, *, session: aiohttp.ClientSession) -> None:
+        """This function is a coroutine
+
+        Make sure the catalog can answer queries. The first call waits
+        for the list, later calls only start a background refresh when
+        the list is due.
+
+        Parameters
+        -----
+        session: ``aiohttp.ClientSession``
+            The session to perform the request
+
+        Raises
+        -----
+        ``CodeforcesException``
+            The catalog is empty and the request failed
+        """
+        if not self.loaded:
+            await self.refresh(session=session)
+        elif self.due:
+            self._refresh_in_background(session)
+
+    def get(self, contest_id: int) -> Optional[Contest]:
+        return self._by_id.get(contest_id)
+
+    def phase(self, phase: str) -> List[Contest]:
+        """All contests in a phase, as last reported by the API"""
+        return list(self._by_phase.get(phase, []))
+
+    def running(self) -> List[Contest]:
+        """The contests being held or judged, the most recent first"""
+        contests = [contest for phase in ACTIVE_PHASES for contest in self._by_phase.get(phase, [])]
+        contests.sort(key=lambda contest: contest.start_at or discord.utils.utcnow(), reverse=True)
+        return contests
+
+    def upcoming(self, limit: Optional[int] = None) -> List[Contest]:
+        """The contests that have not started yet, the soonest first"""
+        index = bisect.bisect_right(self._start_keys, time.time())
+        end = len(self._by_start) if limit is None else min(len(self._by_start), index + limit)
+        return self._by_start[index:end]
+
+    def finished(self, limit: Optional[int] = None) -> List[Contest]:
+        """The finished contests, the most recently started first"""
+        contests: List[Contest] = []
+        index = bisect.bisect_right(self._start_keys, time.time())
+        for contest in reversed(self._by_start[:index]):
+            if limit is not None and len(contests) >= limit:
+                break
+
+            if contest.phase == "FINISHED":
+                contests.append(contest)
+
+        return contests
+
+    def latest(self, limit: Optional[int] = None) -> List[Contest]:
+        """The contests with the latest start times, the latest first,
+        the same order as the API
+        """
+        start = 0 if limit is None else max(0, len(self._by_start) - limit)
+        return self._by_start[start:][::-1]
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __repr__(self) -> str:
+        return f"<ContestCatalog gym={self.gym} contests={len(self)} refreshed_at={self.refreshed_at}>"
+
+
+contest_catalog = ContestCatalog()
@@ -3,7 +3,7 @@ from __future__ import annotations
 import asyncio
 import datetime
 import json
-from typing import Any, Dict, List, Literal, Optional, Type, TYPE_CHECKING
+from typing import Any, Dict, List, Literal, Optional, TYPE_CHECKING
 
 import aiohttp
 import discord
@@ -28,7 +28,7 @@ class Contest:
         frozen: bool
         duration: datetime.timedelta
         start_at: Optional[datetime.datetime]
-        relative_time: Optional[datetime.timedelta]
+        _relative_time: Optional[datetime.timedelta]
         prepared_by: Optional[PartialUser]
         _url: Optional[str]
         description: Optional[str]
@@ -55,9 +55,9 @@ class Contest:
 
         relative_time = data.get("relativeTimeSeconds")
         if relative_time is not None:
-            self.relative_time = datetime.timedelta(seconds=relative_time)
+            self._relative_time = datetime.timedelta(seconds=relative_time)
         else:
-            self.relative_time = None
+            self._relative_time = None
 
         prepared_by = data.get("preparedBy")
         if prepared_by is not None:
@@ -80,6 +80,19 @@ class Contest:
         self.city = data.get("city")
         self.season = data.get("season")
 
+    @property
+    def relative_time(self) -> Optional[datetime.timedelta]:
+        """The time elapsed since the contest start, negative if the
+        contest has not started yet
+
+        This is computed from ``start_at`` when available, so that
+        it stays correct for cached contests.
+        """
+        if self.start_at is not None:
+            return discord.utils.utcnow() - self.start_at
+
+        return self._relative_time
+
     @property
     def url(self) -> str:
         if self._url:
@@ -133,8 +146,29 @@ class Contest:
 
         return embed
 
-    @classmethod
-    async def list(cls: Type[Contest], *, gym: bool = False, session: aiohttp.ClientSession, limit: Optional[int] = None) -> List[Contest]:
+    @staticmethod
+    async def fetch_payloads(*, gym: bool = False, session: aiohttp.ClientSession) -> List[Dict[str, Any]]:
+        """This function is a coroutine
+
+        Fetch the raw contest objects from the API, the most recent first
+
+        Parameters
+        -----
+        gym: ``bool``
+            Whether to fetch gym contests instead
+        session: ``aiohttp.ClientSession``
+            The session to perform the request
+
+        Returns
+        -----
+        List[Dict[``str``, Any]]
+            The decoded contest objects
+
+        Raises
+        -----
+        ``CodeforcesException``
+            The request failed
+        """
         url = "https://codeforces.com/api/contest.list"
         try:
             async with session.get(url, params={"gym": str(gym).lower()}) as response:
@@ -142,10 +176,7 @@ class Contest:
                 if data["status"] == "FAILED":
                     raise CodeforcesException(data["comment"])
 
-                if limit is None:
-                    return [cls(payload) for payload in data["result"]]
-                else:
-                    return [cls(payload) for payload in data["result"][:limit]]
+                return data["result"]
 
         except (aiohttp.ClientError, asyncio.TimeoutError):
             raise CodeforcesException("Unable to connect to codeforces.com")
@@ -11,7 +11,7 @@ from discord.utils import escape_markdown as escape
 from yarl import URL
 
 from .errors import CodeforcesException
-from lib import utils
+from lib import responses, utils
 
 
 __all__ = (
@@ -163,6 +163,7 @@ class User(PartialUser):
         return embed
 
     @classmethod
+    @responses.cached("codeforces_users", ttl=300.0, stale=3600.0)
     async def get(cls, *handles: str, session: aiohttp.ClientSession) -> List[User]:
         query = ";".join(handles)
         url = URL.build(
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+from typing import Any, Callable, Coroutine, Dict, Generator, Iterable, Optional, Tuple, Type, TYPE_CHECKING
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+
+__all__ = (
+    "FixtureResponse",
+    "FixtureSession",
+    "MissingFixture",
+    "dump_response",
+    "redirect_request_class",
+)
+
+
+class MissingFixture(aiohttp.ClientConnectionError):
+    """Exception raised when replaying a request that was never recorded"""
+    pass
+
+
+def dump_response(method: str, url: URL, status: int, reason: Optional[str], headers: Iterable[Tuple[str, str]], body: bytes) -> Dict[str, Any]:
+    """Serialize a response to the JSON fixture format"""
+    return {
+        "method": method.upper(),
+        "url": str(url),
+        "status": status,
+        "reason": reason,
+        "headers": [[key, value] for key, value in headers],
+        "body": base64.b64encode(body).decode("ascii"),
+    }
+
+
+def redirect_request_class(base_url: str, *, exclude: Iterable[str] = ()) -> Type[aiohttp.ClientRequest]:
+    """Create a request class that sends every request to a fake
+    upstream server instead (see ``upstream.py``)
+
+    ``https://example.com/path?query`` is rewritten to
+    ``<base_url>/https/example.com/path?query``.
+
+    Parameters
+    -----
+    base_url: ``str``
+        The URL of the fake upstream server
+    exclude: Iterable[``str``]
+        The hosts that must not be redirected
+
+    Returns
+    -----
+    Type[``aiohttp.ClientRequest``]
+        The value to pass as ``request_class`` to ``aiohttp.ClientSession``
+    """
+    base = URL(base_url)
+    excluded = frozenset(exclude) | {base.host, "localhost", "127.0.0.1"}
+
+    class UpstreamRequest(aiohttp.ClientRequest):
+        def __init__(self, method: str, url: URL, *args: Any, **kwargs: Any) -> None:
+            if url.host not in excluded:
+                netloc = url.raw_host if url.is_default_port() else f"{url.raw_host}:{url.port}"
+                url = URL.build(
+                    scheme=base.scheme,
+                    host=base.raw_host,
+                    port=base.port,
+                    path=f"/{url.scheme}/{netloc}{url.raw_path}",
+                    query_string=url.raw_query_string,
+                    encoded=True,
+                )
+
+            super().__init__(method, url, *args, **kwargs)
+
+    return UpstreamRequest
+
+
+class FixtureResponse:
+    """A recorded HTTP response
+
+    This implements the subset of ``aiohttp.ClientResponse`` that the
+    API wrappers use.
+    """
+
+    __slots__ = ("method", "url", "status", "reason", "headers", "_body")
+    if TYPE_CHECKING:
+        method: str
+        url: URL
+        status: int
+        reason: str
+        headers: CIMultiDictProxy[str]
+        _body: bytes
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self.method = data["method"]
+        self.url = URL(data["url"])
+        self.status = data["status"]
+        self.reason = data["reason"]
+        self.headers = CIMultiDictProxy(CIMultiDict((key, value) for key, value in data["headers"]))
+        self._body = base64.b64decode(data["body"])
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("Content-Type", "application/octet-stream").split(";")[0].strip()
+
+    @property
+    def charset(self) -> Optional[str]:
+        for param in self.headers.get("Content-Type", "").split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "charset":
+                return value.strip("\"")
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: Optional[str] = None, errors: str = "strict") -> str:
+        return self._body.decode(encoding or self.charset or "utf-8", errors)
+
+    async def json(self, *, encoding: Optional[str] = None, loads: Callable[[str], Any] = json.loads, content_type: Optional[str] = "application/json") -> Any:
+        return loads(await self.text(encoding))
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            request_info = aiohttp.RequestInfo(self.url, self.method, CIMultiDictProxy(CIMultiDict()), self.url)
+            raise aiohttp.ClientResponseError(request_info, (), status=self.status, message=self.reason, headers=self.headers)
+
+    def release(self) -> None:
+        return
+
+    def close(self) -> None:
+        return
+
+    async def wait_for_close(self) -> None:
+        return
+
+    def __repr__(self) -> str:
+        return f"<FixtureResponse [{self.status} {self.reason}] {self.method} {self.url}>"
+
+
+class _RequestContextManager:
+
+    __slots__ = ("_coro", "_response")
+    if TYPE_CHECKING:
+        _coro: Coroutine[Any, Any, Any]
+        _response: Any
+
+    def __init__(self, coro: Coroutine[Any, Any, Any]) -> None:
+        self._coro = coro
+
+    def __await__(self) -> Generator[Any, None, Any]:
+        return self._coro.__await__()
+
+    async def __aenter__(self) -> Any:
+        self._response = await self._coro
+        return self._response
+
+    async def __aexit__(self, *args: Any) -> None:
+        self._response.release()
+
+
+class FixtureSession:
+    """A drop-in replacement for ``aiohttp.ClientSession`` that records
+    responses to or replays them from a directory
+
+    In record mode, requests are sent through the wrapped session and
+    every response body is saved. In replay mode, no request leaves the
+    process and ``MissingFixture`` is raised for unknown requests.
+
+    Attributes
+    -----
+    directory: ``str``
+        The directory containing the recorded responses
+    record: ``bool``
+        Whether the session is recording instead of replaying
+    """
+
+    __slots__ = ("directory", "record", "session")
+    if TYPE_CHECKING:
+        directory: str
+        record: bool
+        session: Optional[aiohttp.ClientSession]
+
+    def __init__(self, directory: str, *, record: bool = False, session: Optional[aiohttp.ClientSession] = None) -> None:
+        if record and session is None:
+            raise ValueError("A session is required in record mode")
+
+        self.directory = directory
+        self.record = record
+        self.session = session
+
+    @staticmethod
+    def key(method: str, url: URL, body: Any = None) -> str:
+        """Get the fixture file name of a request"""
+        digest = hashlib.sha1(f"{method.upper()} {url}".encode("utf-8"))
+        if body is not None:
+            digest.update(repr(body).encode("utf-8"))
+
+        return f"{url.host}-{digest.hexdigest()[:16]}.json"
+
+    def path(self, method: str, url: URL, body: Any = None) -> str:
+        return os.path.join(self.directory, self.key(method, url, body))
+
+    async def _request(self, method: str, str_or_url: Any, **kwargs: Any) -> Any:
+        url = URL(str_or_url)
+        params = kwargs.get("params")
+        if params:
+            url = url.update_query(params)
+
+        body = kwargs.get("json", kwargs.get("data"))
+        path = self.path(method, url, body)
+
+        if self.record:
+            response = await self.session.request(method, str_or_url, **kwargs)  # type: ignore
+            content = await response.read()
+            data = dump_response(method, url, response.status, response.reason, response.headers.items(), content)
+
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4)
+
+            return response
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            raise MissingFixture(f"No recorded response for {method.upper()} {url}") from None
+
+        return FixtureResponse(data)
+
+    def request(self, method: str, url: Any, **kwargs: Any) -> _RequestContextManager:
+        return _RequestContextManager(self._request(method, url, **kwargs))
+
+    def get(self, url: Any, **kwargs: Any) -> _RequestContextManager:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: Any, **kwargs: Any) -> _RequestContextManager:
+        return self.request("POST", url, **kwargs)
+
+    def head(self, url: Any, **kwargs: Any) -> _RequestContextManager:
+        return self.request("HEAD", url, **kwargs)
+
+    @property
+    def closed(self) -> bool:
+        return self.session.closed if self.session is not None else False
+
+    async def close(self) -> None:
+        """Does nothing, the wrapped session is owned by the caller"""
+        return
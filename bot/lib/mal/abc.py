@@ -8,17 +8,22 @@ import discord
 from discord.utils import escape_markdown as escape
 
 from lib import utils
+from . import parser
 
 __all__ = ("MALObject",)
 T = TypeVar("T")
+M = TypeVar("M", bound="MALObject")
 
 
 class MALObject:
-    """Represents an anime, manga,... from MyAnimeList."""
+    """Represents an anime, manga,... from MyAnimeList.
 
-    __slots__ = ("soup", "id", "url", "title", "image_url", "score", "ranked", "popularity", "synopsis", "genres")
+    Only the parsed fields are kept, the page tree is discarded after
+    initialization so that these objects are small and picklable.
+    """
+
+    __slots__ = ("id", "url", "title", "image_url", "score", "ranked", "popularity", "synopsis", "genres")
     if TYPE_CHECKING:
-        soup: bs4.BeautifulSoup
         id: int
         url: str
         title: str
@@ -30,58 +35,78 @@ class MALObject:
         genres: List[str]
 
     def __init__(self, id: Union[int, str], soup: bs4.BeautifulSoup) -> None:
-        self.soup = soup
         self.id = int(id)
         self.url = f"https://myanimelist.net/{self.__class__.__name__.lower()}/{self.id}"
-        self.title = self.soup.find(name="meta", attrs={"property": "og:title"}).get("content")
+        self.title = soup.find(name="meta", attrs={"property": "og:title"}).get("content")
 
         try:
-            self.image_url = self.soup.find(name="meta", attrs={"property": "og:image"}).get("content")
+            self.image_url = soup.find(name="meta", attrs={"property": "og:image"}).get("content")
         except AttributeError:
             self.image_url = None
 
         try:
-            _obj = self.soup.find(name="span", attrs={"itemprop": "ratingValue"}).get_text()
+            _obj = soup.find(name="span", attrs={"itemprop": "ratingValue"}).get_text()
             self.score = float(_obj)
         except (AttributeError, ValueError):
             self.score = None
 
         try:
-            _obj = self.soup.find(name="span", attrs={"class": "numbers ranked"}).strong.extract().get_text().removeprefix("#")
+            _obj = soup.find(name="span", attrs={"class": "numbers ranked"}).strong.extract().get_text().removeprefix("#")
             self.ranked = int(_obj)
         except (AttributeError, ValueError):
             self.ranked = None
 
         try:
-            _obj = self.soup.find(name="span", attrs={"class": "numbers popularity"}).strong.extract().get_text().removeprefix("#")
+            _obj = soup.find(name="span", attrs={"class": "numbers popularity"}).strong.extract().get_text().removeprefix("#")
             self.popularity = int(_obj)
         except (AttributeError, ValueError):
             self.popularity = None
 
         try:
-            self.synopsis = self.soup.find(name="meta", attrs={"property": "og:description"}).get("content")
+            self.synopsis = soup.find(name="meta", attrs={"property": "og:description"}).get("content")
         except AttributeError:
             self.synopsis = None
 
-        _genres = self.soup.find_all(name="span", attrs={"itemprop": "genre"})
+        _genres = soup.find_all(name="span", attrs={"itemprop": "genre"})
         self.genres = [genre.get_text() for genre in _genres]
 
-        self.__postinit__()
+        self.__postinit__(soup)
 
-    def __postinit__(self) -> None:
+    def __postinit__(self, soup: bs4.BeautifulSoup) -> None:
         return
 
+    @classmethod
+    def from_html(cls: Type[M], id: Union[int, str], html: str) -> M:
+        """Parse the page of an object
+
+        Only the sections of the page that contain the fields are
+        parsed, see ``parser.OBJECT_STRAINER``.
+
+        Parameters
+        -----
+        id: Union[``int``, ``str``]
+            The object ID
+        html: ``str``
+            The page content
+
+        Returns
+        -----
+        ``MALObject``
+            The parsed object
+        """
+        return cls(id, parser.parse(html, parser.OBJECT_STRAINER))
+
     @overload
-    def extract_span(self, category: str, cls: Type[T]) -> Optional[T]:
+    def extract_span(self, soup: bs4.BeautifulSoup, category: str, cls: Type[T]) -> Optional[T]:
         ...
 
     @overload
-    def extract_span(self, category: str) -> Optional[str]:
+    def extract_span(self, soup: bs4.BeautifulSoup, category: str) -> Optional[str]:
         ...
 
-    def extract_span(self, category, cls=str):
+    def extract_span(self, soup, category, cls=str):
         with contextlib.suppress(AttributeError, ValueError):
-            obj = self.soup.find(name="span", string=category).parent
+            obj = soup.find(name="span", string=category).parent
             obj.span.extract()
             return cls(obj.get_text(strip=True))
 
@@ -8,6 +8,8 @@ import aiohttp
 import bs4
 import discord
 
+from lib import responses
+from . import parser
 from .abc import MALObject
 from .constants import NSFW_ANIME_GENRES
 
@@ -26,22 +28,22 @@ class Anime(MALObject):
         type: Optional[str]
         broadcast: Optional[str]
 
-    def __postinit__(self) -> None:
-        self.aired = self.extract_span("Aired:")
-        self.status = self.extract_span("Status:")
-        self.episodes = self.extract_span("Episodes:", int)
-        self.type = self.extract_span("Type:")
-        self.broadcast = self.extract_span("Broadcast:")
+    def __postinit__(self, soup: bs4.BeautifulSoup) -> None:
+        self.aired = self.extract_span(soup, "Aired:")
+        self.status = self.extract_span(soup, "Status:")
+        self.episodes = self.extract_span(soup, "Episodes:", int)
+        self.type = self.extract_span(soup, "Type:")
+        self.broadcast = self.extract_span(soup, "Broadcast:")
 
     @classmethod
+    @responses.cached("mal_anime", ttl=21600.0, stale=86400.0)
     async def get(cls: Type[Anime], id: Union[int, str], *, session: aiohttp.ClientSession) -> Optional[Anime]:
         url = f"https://myanimelist.net/anime/{id}"
         with contextlib.suppress(aiohttp.ClientError, asyncio.TimeoutError):
             async with session.get(url) as response:
                 response.raise_for_status()
                 html = await response.text(encoding="utf-8")
-                soup = bs4.BeautifulSoup(html, "html.parser")
-                return cls(id, soup)
+                return await parser.parse_in_executor(cls.from_html, id, html)
 
     def is_safe(self) -> bool:
         for genre in self.genres:
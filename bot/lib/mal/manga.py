@@ -8,6 +8,8 @@ import aiohttp
 import bs4
 import discord
 
+from lib import responses
+from . import parser
 from .abc import MALObject
 from .constants import NSFW_MANGA_GENRES
 
@@ -25,21 +27,21 @@ class Manga(MALObject):
         chapters: Optional[int]
         type: Optional[str]
 
-    def __postinit__(self) -> None:
-        self.published = self.extract_span("Published:")
-        self.episodes = self.extract_span("Episodes:", int)
-        self.chapters = self.extract_span("Chapters:", int)
-        self.type = self.extract_span("Type:")
+    def __postinit__(self, soup: bs4.BeautifulSoup) -> None:
+        self.published = self.extract_span(soup, "Published:")
+        self.episodes = self.extract_span(soup, "Episodes:", int)
+        self.chapters = self.extract_span(soup, "Chapters:", int)
+        self.type = self.extract_span(soup, "Type:")
 
     @classmethod
+    @responses.cached("mal_manga", ttl=21600.0, stale=86400.0)
     async def get(cls: Type[Manga], id: Union[int, str], *, session: aiohttp.ClientSession) -> Optional[Manga]:
         url = f"https://myanimelist.net/manga/{id}"
         with contextlib.suppress(aiohttp.ClientError, asyncio.TimeoutError):
             async with session.get(url) as response:
                 response.raise_for_status()
                 html = await response.text(encoding="utf-8")
-                soup = bs4.BeautifulSoup(html, "html.parser")
-                return cls(id, soup)
+                return await parser.parse_in_executor(cls.from_html, id, html)
 
     def is_safe(self) -> bool:
         for genre in self.genres:
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+import bs4
+
+
+__all__ = (
+    "FEATURES",
+    "OBJECT_STRAINER",
+    "SEARCH_STRAINER",
+    "parse",
+    "parse_in_executor",
+)
+
+
+T = TypeVar("T")
+
+
+# lxml is several times faster than the pure-Python parser but is an
+# optional dependency
+try:
+    import lxml  # noqa: F401
+except ImportError:
+    FEATURES = "html.parser"
+else:
+    FEATURES = "lxml"
+
+
+def _has_class(attrs: Dict[str, Any], cls: str) -> bool:
+    # Attribute values are not split into lists yet when the strainer is called
+    value = attrs.get("class") or ""
+    if isinstance(value, str):
+        value = value.split()
+
+    return cls in value
+
+
+def _object_sections(name: str, attrs: Dict[str, Any]) -> bool:
+    if name == "meta":
+        return (attrs.get("property") or "").startswith("og:")
+
+    if name == "div":
+        # The sidebar with the "Type:", "Aired:",... fields, the genres and the score
+        return _has_class(attrs, "leftside")
+
+    if name == "span":
+        return attrs.get("itemprop") in ("ratingValue", "genre") or _has_class(attrs, "numbers")
+
+    return False
+
+
+def _search_sections(name: str, attrs: Dict[str, Any]) -> bool:
+    return name == "td" and _has_class(attrs, "borderClass") and _has_class(attrs, "bgColor0")
+
+
+# Only these tags and their descendants are built into the tree, the
+# rest of the page (navigation, reviews, recommendations,...) is skipped
+OBJECT_STRAINER = bs4.SoupStrainer(_object_sections)
+SEARCH_STRAINER = bs4.SoupStrainer(_search_sections)
+
+
+def parse(html: str, strainer: Optional[bs4.SoupStrainer] = None, *, features: str = FEATURES) -> bs4.BeautifulSoup:
+    """Parse a MyAnimeList page
+
+    Parameters
+    -----
+    html: ``str``
+        The page content
+    strainer: Optional[``bs4.SoupStrainer``]
+        The parts of the page to keep, the whole page is parsed
+        if this is ``None``
+    features: ``str``
+        The BeautifulSoup tree builder, ``FEATURES`` by default
+
+    Returns
+    -----
+    ``bs4.BeautifulSoup``
+        The parsed tree
+    """
+    return bs4.BeautifulSoup(html, features, parse_only=strainer)
+
+
+async def parse_in_executor(func: Callable[..., T], *args: Any) -> T:
+    """This function is a coroutine
+
+    Run a parsing function in the default executor, so that the event
+    loop can still switch to other tasks while a page is being parsed
+
+    Parameters
+    -----
+    func: Callable[..., ``T``]
+        The function to run
+    *args:
+        The arguments to pass to ``func``
+
+    Returns
+    -----
+    ``T``
+        The return value of ``func``
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args))
@@ -3,7 +3,9 @@ from __future__ import annotations
 from typing import List, Literal, Type, TYPE_CHECKING
 
 import aiohttp
-import bs4
+
+from lib import responses
+from . import parser
 
 
 __all__ = ("MALSearchResult",)
@@ -15,29 +17,24 @@ class MALSearchResult:
     Note that it can be anything: anime, manga,...
     """
 
-    __slots__ = ("soup",)
+    __slots__ = ("url", "title")
     if TYPE_CHECKING:
-        soup: bs4.BeautifulSoup
+        url: str
+        title: str
 
-    def __init__(self, soup: bs4.BeautifulSoup) -> None:
-        self.soup = soup
+    def __init__(self, url: str, title: str) -> None:
+        self.url = url
+        self.title = title
 
     @property
     def id(self) -> int:
         return int(self.url.split("/")[4])
 
-    @property
-    def url(self) -> str:
-        return self.soup.get("href")
-
-    @property
-    def title(self) -> str:
-        return self.soup.get_text()
-
     def __repr__(self) -> str:
         return f"<MALSearchResult id={self.id} title={self.title} url={self.url}>"
 
     @classmethod
+    @responses.cached("mal_search", ttl=3600.0, stale=21600.0)
     async def search(
         cls: Type[MALSearchResult],
         query: str,
@@ -51,16 +48,25 @@ class MALSearchResult:
         async with session.get(url, params={"q": query}) as response:
             if response.status == 200:
                 html = await response.text(encoding="utf-8")
-                soup = bs4.BeautifulSoup(html, "html.parser")
-                obj = soup.find_all(
-                    name="td",
-                    attrs={"class": "borderClass bgColor0"},
-                    limit=12,
-                )
-
-                for index, tag in enumerate(obj):
-                    if index % 2 == 0:
-                        continue
-                    rslt.append(cls(tag.find("a")))
+                rslt = await parser.parse_in_executor(cls.from_html, html)
+
+        return rslt
+
+    @classmethod
+    def from_html(cls: Type[MALSearchResult], html: str) -> List[MALSearchResult]:
+        """Parse a search page, keeping only the results table"""
+        rslt = []
+        soup = parser.parse(html, parser.SEARCH_STRAINER)
+        obj = soup.find_all(
+            name="td",
+            attrs={"class": "borderClass bgColor0"},
+            limit=12,
+        )
+
+        for index, tag in enumerate(obj):
+            if index % 2 == 0:
+                continue
+            link = tag.find("a")
+            rslt.append(cls(link.get("href"), link.get_text()))
 
         return rslt
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from typing import Any, ClassVar, Dict, Iterator, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+import aiohttp
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, math.inf)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+
+    if value == math.inf:
+        return "+Inf"
+
+    if value == -math.inf:
+        return "-Inf"
+
+    return repr(float(value))
+
+
+def _format_labels(labels: Sequence[Tuple[str, Any]]) -> str:
+    if not labels:
+        return ""
+
+    return "{" + ",".join(f"{name}=\"{_escape(value)}\"" for name, value in labels) + "}"
+
+
+class Metric:
+    """Base class for all metrics
+
+    Samples are stored per label values. Label values are given to
+    the recording methods as keyword arguments and must match the
+    ``labelnames`` of the metric.
+    """
+
+    __slots__ = ("name", "documentation", "labelnames", "_lock", "_values")
+    type: ClassVar[str]
+    if TYPE_CHECKING:
+        name: str
+        documentation: str
+        labelnames: Tuple[str, ...]
+        _lock: threading.Lock
+        _values: Dict[Tuple[str, ...], Any]
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), *, registry: Optional[MetricsRegistry] = None) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+        if registry is None:
+            registry = REGISTRY
+
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"Expected labels {self.labelnames} for metric {self.name}, got {tuple(labels.keys())}")
+
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[Tuple[str, Any]], float]]:
+        """Yield all samples of this metric as
+        (name, labels, value) tuples
+        """
+        with self._lock:
+            values = list(self._values.items())
+
+        for key, value in values:
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """A monotonically increasing value"""
+
+    __slots__ = ()
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be incremented by non-negative amounts")
+
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(Metric):
+    """A value that can go up and down"""
+
+    __slots__ = ()
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def get(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Histogram(Metric):
+    """Count observations in cumulative buckets"""
+
+    __slots__ = ("buckets",)
+    type = "histogram"
+    if TYPE_CHECKING:
+        buckets: Tuple[float, ...]
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), *, buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[MetricsRegistry] = None) -> None:
+        buckets = tuple(sorted(buckets))
+        if buckets[-1] != math.inf:
+            buckets += (math.inf,)
+
+        self.buckets = buckets
+        super().__init__(name, documentation, labelnames, registry=registry)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            try:
+                counts, total = self._values[key]
+            except KeyError:
+                counts, total = [0] * len(self.buckets), 0.0
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+
+            self._values[key] = (counts, total + value)
+
+    def time(self, **labels: Any) -> _HistogramTimer:
+        """Return a context manager that observes the execution time
+        of its code block
+        """
+        return _HistogramTimer(self, labels)
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[Tuple[str, Any]], float]]:
+        with self._lock:
+            values = [(key, (list(counts), total)) for key, (counts, total) in self._values.items()]
+
+        for key, (counts, total) in values:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield self.name + "_bucket", labels + (("le", _format_value(bound)),), cumulative
+
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, cumulative
+
+
+class _HistogramTimer:
+
+    __slots__ = ("histogram", "labels", "_start")
+    if TYPE_CHECKING:
+        histogram: Histogram
+        labels: Dict[str, Any]
+        _start: float
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> _HistogramTimer:
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.histogram.observe(time.perf_counter() - self._start, **self.labels)
+
+
+class MetricsRegistry:
+    """A collection of metrics that can be exposed in the Prometheus
+    text format
+    """
+
+    __slots__ = ("_metrics",)
+    if TYPE_CHECKING:
+        _metrics: Dict[str, Metric]
+
+    def __init__(self) -> None:
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} has already been registered")
+
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def expose(self) -> str:
+        """Render all registered metrics in the Prometheus text
+        exposition format (version 0.0.4)
+        """
+        return "\n".join(metric.expose() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# Commands
+COMMAND_LATENCY = Histogram("haruka_command_duration_seconds", "Time spent invoking a command", ("command", "kind"))
+
+# Discord connections
+GATEWAY_LATENCY = Gauge("haruka_gateway_latency_seconds", "Latency between a HEARTBEAT and a HEARTBEAT_ACK", ("client",))
+VOICE_LATENCY = Gauge("haruka_voice_latency_seconds", "Average latency of the voice websocket of each guild", ("guild",))
+GUILDS = Gauge("haruka_guilds", "Number of cached guilds", ("client",))
+MUSIC_CLIENTS = Gauge("haruka_music_clients", "Number of connected music clients")
+FFMPEG_PROCESSES = Counter("haruka_ffmpeg_processes_total", "Number of spawned ffmpeg processes", ("purpose",))
+
+# Database
+DATABASE_POOL_CONNECTIONS = Gauge("haruka_database_pool_connections", "Number of connections in the database pool", ("state",))
+
+# Outbound HTTP requests
+HTTP_REQUEST_DURATION = Histogram("haruka_http_client_request_duration_seconds", "Duration of outbound HTTP requests", ("session", "host", "method", "status"))
+HTTP_CONNECTION_WAIT = Histogram("haruka_http_client_connection_wait_seconds", "Time spent waiting for a free connection of a full pool", ("session", "host"))
+HTTP_CONNECTIONS = Counter("haruka_http_client_connections_total", "Number of connections acquired by outbound HTTP requests", ("session", "kind"))
+
+# Caches
+CACHE_REQUESTS = Counter("haruka_cache_requests_total", "Number of cache lookups", ("cache", "result"))
+
+
+def create_trace_config(name: str = "default") -> aiohttp.TraceConfig:
+    """Create an ``aiohttp.TraceConfig`` that records the duration
+    and status of each request performed by a session into
+    ``HTTP_REQUEST_DURATION``, the time spent queueing for a pooled
+    connection, connection reuse and DNS cache lookups
+
+    Parameters
+    -----
+    name: ``str``
+        The name of the session, used as the ``session`` label
+
+    Returns
+    -----
+    ``aiohttp.TraceConfig``
+        The trace config to pass to ``aiohttp.ClientSession``
+    """
+    async def on_request_start(session: aiohttp.ClientSession, context: Any, params: aiohttp.TraceRequestStartParams) -> None:
+        context.start = time.perf_counter()
+        context.host = params.url.host
+
+    async def on_request_end(session: aiohttp.ClientSession, context: Any, params: aiohttp.TraceRequestEndParams) -> None:
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - context.start,
+            session=name,
+            host=params.url.host,
+            method=params.method,
+            status=params.response.status,
+        )
+
+    async def on_request_exception(session: aiohttp.ClientSession, context: Any, params: aiohttp.TraceRequestExceptionParams) -> None:
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - context.start,
+            session=name,
+            host=params.url.host,
+            method=params.method,
+            status=params.exception.__class__.__name__,
+        )
+
+    async def on_connection_queued_start(session: aiohttp.ClientSession, context: Any, params: aiohttp.TraceConnectionQueuedStartParams) -> None:
+        context.queued = time.perf_counter()
+
+    async def on_connection_queued_end(session: aiohttp.ClientSession, context: Any, params: aiohttp.TraceConnectionQueuedEndParams) -> None:
+        HTTP_CONNECTION_WAIT.observe(time.perf_counter() - context.queued, session=name, host=context.host)
+
+    async def on_connection_create_end(session: aiohttp.ClientSession, context: Any, params: aiohttp.TraceConnectionCreateEndParams) -> None:
+        HTTP_CONNECTIONS.inc(session=name, kind="new")
+
+    async def on_connection_reuseconn(session: aiohttp.ClientSession, context: Any, params: aiohttp.TraceConnectionReuseconnParams) -> None:
+        HTTP_CONNECTIONS.inc(session=name, kind="reused")
+
+    async def on_dns_cache_hit(session: aiohttp.ClientSession, context: Any, params: aiohttp.TraceDnsCacheHitParams) -> None:
+        cache_lookup("dns", True)
+
+    async def on_dns_cache_miss(session: aiohttp.ClientSession, context: Any, params: aiohttp.TraceDnsCacheMissParams) -> None:
+        cache_lookup("dns", False)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    trace_config.on_connection_queued_start.append(on_connection_queued_start)
+    trace_config.on_connection_queued_end.append(on_connection_queued_end)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+    trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+    return trace_config
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    """Record a cache lookup in ``CACHE_REQUESTS``"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def cache_hit_ratios() -> Dict[str, float]:
+    """Compute the hit ratio of each cache recorded in
+    ``CACHE_REQUESTS``
+    """
+    totals: Dict[str, List[float]] = {}
+    for _, labels, value in CACHE_REQUESTS.samples():
+        cache, result = (value for _, value in labels)
+        hits, total = totals.setdefault(cache, [0.0, 0.0])
+        totals[cache] = [hits + (value if result == "hit" else 0.0), total + value]
+
+    return {cache: hits / total for cache, (hits, total) in totals.items() if total > 0}
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import datetime
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Deque, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from lib import metrics
+
+
+LOOP_LAG = metrics.Histogram(
+    "haruka_event_loop_lag_seconds",
+    "Scheduling delay of the event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_STALLS = metrics.Counter("haruka_event_loop_stalls_total", "Number of times the event loop was blocked for longer than the threshold")
+
+
+class StallRecord:
+    """Represents a period during which the event loop was blocked
+
+    Attributes
+    -----
+    started_at: ``datetime.datetime``
+        The approximate time the stall started
+    duration: ``float``
+        The scheduling delay of the event loop, in seconds
+    stack: List[``str``]
+        The formatted stack of the event loop thread that was seen
+        most often while the loop was blocked. This is empty if the
+        watchdog thread did not catch the stall.
+    samples: ``int``
+        The number of stack samples taken during the stall
+    """
+
+    __slots__ = ("started_at", "duration", "stack", "samples")
+    if TYPE_CHECKING:
+        started_at: datetime.datetime
+        duration: float
+        stack: List[str]
+        samples: int
+
+    def __init__(self, duration: float, stacks: List[Tuple[str, ...]]) -> None:
+        self.started_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=duration)
+        self.duration = duration
+        self.samples = len(stacks)
+
+        if stacks:
+            stack, _ = collections.Counter(stacks).most_common(1)[0]
+            self.stack = list(stack)
+        else:
+            self.stack = []
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "duration": self.duration,
+            "stack": self.stack,
+            "samples": self.samples,
+        }
+
+    def __repr__(self) -> str:
+        return f"<StallRecord started_at={self.started_at} duration={self.duration:.3f} samples={self.samples}>"
+
+
+class LoopLagMonitor:
+    """Continuously measure the scheduling delay of the event loop.
+
+    A task sleeps for ``interval`` seconds in a loop and records how
+    late it wakes up. Meanwhile, a watchdog thread samples the stack
+    of the event loop thread whenever the task is overdue by more than
+    ``threshold`` seconds, so that the blocking call can be identified.
+    Stalls are kept in a ring buffer of size ``capacity``.
+    """
+
+    __slots__ = (
+        "interval",
+        "threshold",
+        "max_samples",
+        "records",
+        "_beat",
+        "_lock",
+        "_pending",
+        "_stop",
+        "_task",
+        "_thread",
+        "_loop_thread_id",
+    )
+    if TYPE_CHECKING:
+        interval: float
+        threshold: float
+        max_samples: int
+        records: Deque[StallRecord]
+        _beat: float
+        _lock: threading.Lock
+        _pending: List[Tuple[str, ...]]
+        _stop: threading.Event
+        _task: Optional[asyncio.Task[None]]
+        _thread: Optional[threading.Thread]
+        _loop_thread_id: Optional[int]
+
+    def __init__(self, *, interval: float = 0.1, threshold: float = 0.2, capacity: int = 50, max_samples: int = 20) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.max_samples = max_samples
+        self.records = collections.deque(maxlen=capacity)
+
+        self._beat = time.monotonic()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._stop = threading.Event()
+        self._task = None
+        self._thread = None
+        self._loop_thread_id = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        """Start monitoring the running event loop"""
+        if self.running:
+            raise RuntimeError("This monitor is already running")
+
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+
+        self._task = asyncio.create_task(self._sample(), name="Event loop lag sampler")
+        self._thread = threading.Thread(target=self._watch, name="Event loop watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop monitoring the event loop"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        self._thread = None
+
+    async def _sample(self) -> None:
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._beat - self.interval)
+            LOOP_LAG.observe(lag)
+
+            with self._lock:
+                stacks = self._pending
+                self._pending = []
+
+            if lag >= self.threshold:
+                LOOP_STALLS.inc()
+                self.records.append(StallRecord(lag, stacks))
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.threshold / 4):
+            overdue = time.monotonic() - self._beat - self.interval
+            if overdue < self.threshold:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)  # type: ignore
+            if frame is None:
+                continue
+
+            stack = tuple(traceback.format_stack(frame))
+            del frame
+
+            with self._lock:
+                if len(self._pending) < self.max_samples:
+                    self._pending.append(stack)
+
+    def recent(self, limit: Optional[int] = None) -> List[StallRecord]:
+        """Get the most recent stalls, latest first
+
+        Parameters
+        -----
+        limit: Optional[``int``]
+            The maximum number of records to return
+
+        Returns
+        -----
+        List[``StallRecord``]
+            The recorded stalls
+        """
+        records = list(reversed(self.records))
+        if limit is not None:
+            return records[:limit]
+
+        return records
@@ -12,6 +12,7 @@ import discord
 from discord.utils import escape_markdown as escape
 
 from env import HOST
+from lib import responses
 from lib.utils import AsyncSequence
 from .tags import PixivArtworkTag
 from .user import PartialUser
@@ -192,6 +193,7 @@ class PixivArtwork:
         return f"<PixivArtwork title={self.title} id={self.id} author={self.author}>"
 
     @classmethod
+    @responses.cached("pixiv_artwork", ttl=86400.0, stale=604800.0, capacity=1024)
     async def get(cls: Type[PixivArtwork], artwork_id: int, *, session: aiohttp.ClientSession) -> Optional[PixivArtwork]:
         """This function is a coroutine
 
@@ -252,6 +254,7 @@ class PixivArtwork:
         return AsyncSequence([])
 
     @classmethod
+    @responses.cached("pixiv_search", ttl=900.0, stale=3600.0)
     async def search(cls: Type[PixivArtwork], query: str, *, session: aiohttp.ClientSession) -> List[PixivArtwork]:
         """This function is a coroutine
 
@@ -61,8 +61,14 @@ class YouTubeCollectionBase:
             The database connection or connection pool.
         """
         track_ids = [video.id for video in self.videos]
-        await conn.execute(f"DELETE FROM youtube WHERE id = '{channel_id}';")
-        await conn.execute(f"INSERT INTO youtube VALUES ('{channel_id}', $1);", track_ids)
+        async with contextlib.AsyncExitStack() as stack:
+            if isinstance(conn, asyncpg.Pool):
+                conn = await stack.enter_async_context(conn.acquire())
+
+            # Replace the queue atomically
+            await stack.enter_async_context(conn.transaction())
+            await conn.execute(f"DELETE FROM youtube WHERE id = '{channel_id}';")
+            await conn.execute(f"INSERT INTO youtube VALUES ('{channel_id}', $1);", track_ids)
 
 
 class YouTubePlaylist(YouTubeCollectionBase):
@@ -125,12 +131,22 @@ class YouTubeMix(YouTubeCollectionBase):
         self.url = f"https://www.youtube.com/playlist?list={self.id}"  # TODO: Find the appropriate URL format
 
 
+async def _fetch_page(url: str, id: str, page: int, *, session: aiohttp.ClientSession) -> Optional[Dict[str, Any]]:
+    with contextlib.suppress(aiohttp.ClientError, asyncio.TimeoutError):
+        async with session.get(f"{url}/api/v1/playlists/{id}", params={"page": page}, timeout=constants.TIMEOUT) as response:
+            if response.ok:
+                return await response.json(encoding="utf-8")
+
+
 async def get(id: str, *, session: aiohttp.ClientSession) -> Optional[Union[YouTubePlaylist, YouTubeMix]]:
     """This function is a coroutine
 
     Get a ``YouTubePlaylist` or ``YouTubeMix`` with
     the given ID.
 
+    The remaining pages of a playlist are fetched
+    concurrently from the same Invidious instance.
+
     Parameters
     -----
     id: ``str``
@@ -145,15 +161,31 @@ async def get(id: str, *, session: aiohttp.ClientSession) -> Optional[Union[YouT
         ``None`` if not found.
     """
     for url in constants.INVIDIOUS_URLS:
-        with contextlib.suppress(aiohttp.ClientError, asyncio.TimeoutError):
-            # This endpoint can return either a playlist or a mix
-            async with session.get(f"{url}/api/v1/playlists/{id}", timeout=constants.TIMEOUT) as response:
-                if response.ok:
-                    data = await response.json(encoding="utf-8")
-
-                    # Cache all tracks, though their descriptions are unavailable
-                    for d in data["videos"]:
-                        await asyncio.to_thread(sources.save_to_memory, d)
-
-                    cls = YouTubePlaylist if "playlistId" in data else YouTubeMix
-                    return cls(data, url)
+        # This endpoint can return either a playlist or a mix
+        data = await _fetch_page(url, id, 1, session=session)
+        if data is None:
+            continue
+
+        if "playlistId" in data:
+            per_page = len(data["videos"])
+            total = data.get("videoCount", per_page)
+            if per_page and total > per_page:
+                pages = await asyncio.gather(*[_fetch_page(url, id, page, session=session) for page in range(2, -(-total // per_page) + 1)])
+
+                # Pages may overlap when the playlist is modified concurrently
+                seen = set((d.get("index"), d["videoId"]) for d in data["videos"])
+                for page_data in pages:
+                    if page_data is not None:
+                        for d in page_data["videos"]:
+                            key = (d.get("index"), d["videoId"])
+                            if key not in seen:
+                                seen.add(key)
+                                data["videos"].append(d)
+
+            cls = YouTubePlaylist
+        else:
+            cls = YouTubeMix
+
+        # Cache all tracks in one batch, though their descriptions are unavailable
+        await asyncio.to_thread(sources.save_many_to_memory, data["videos"])
+        return cls(data, url)
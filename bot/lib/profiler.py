@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import os
+import sys
+import threading
+import tracemalloc
+from types import FrameType
+from typing import ClassVar, Counter, Iterator, List, Literal, Optional, Tuple, TYPE_CHECKING
+
+
+class ProfilerBusy(Exception):
+    """Exception raised when a profiling session is requested while
+    another one is still running
+    """
+
+    def __init__(self) -> None:
+        super().__init__("Another profiling session is running")
+
+
+def _frame_label(filename: str, lineno: int, name: Optional[str] = None) -> str:
+    location = f"{os.path.basename(filename)}:{lineno}"
+    label = f"{name} ({location})" if name else location
+    # Semicolons separate frames in the folded format
+    return label.replace(";", ":")
+
+
+class MemoryReport:
+    """The result of a memory tracing session
+
+    Attributes
+    -----
+    duration: ``float``
+        The length of the tracing window, in seconds
+    keytype: ``str``
+        The key used to group the statistics
+    statistics: List[``tracemalloc.StatisticDiff``]
+        The allocation differences between the start and the end of the
+        window, grouped by ``keytype`` and sorted by size difference
+    tracebacks: List[``tracemalloc.StatisticDiff``]
+        The same differences grouped by full traceback
+    """
+
+    __slots__ = ("duration", "keytype", "statistics", "tracebacks")
+    if TYPE_CHECKING:
+        duration: float
+        keytype: str
+        statistics: List[tracemalloc.StatisticDiff]
+        tracebacks: List[tracemalloc.StatisticDiff]
+
+    def __init__(self, duration: float, keytype: str, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> None:
+        self.duration = duration
+        self.keytype = keytype
+        self.statistics = after.compare_to(before, keytype, cumulative=keytype != "traceback")
+        self.tracebacks = after.compare_to(before, "traceback")
+
+    @property
+    def size_diff(self) -> int:
+        return sum(stat.size_diff for stat in self.tracebacks)
+
+    def text(self, limit: int = 10) -> str:
+        lines = [f"Allocated {self.size_diff / 1024 ** 2:+.2f} MB in {self.duration:.2f}s, showing the top {limit} by {self.keytype}:"]
+        for stat in self.statistics[:limit]:
+            lines.append(f"{stat.size_diff / 1024 ** 2:+.2f} MB ({stat.count_diff:+} blocks) :: {stat.traceback}")
+
+        return "\n".join(lines)
+
+    def folded(self) -> str:
+        """Render the allocations that grew during the window in the
+        folded stack format, weighted by bytes
+        """
+        lines = []
+        for stat in self.tracebacks:
+            if stat.size_diff > 0:
+                stack = ";".join(_frame_label(frame.filename, frame.lineno) for frame in stat.traceback)
+                lines.append(f"{stack} {stat.size_diff}")
+
+        return "\n".join(lines)
+
+
+class CPUReport:
+    """The result of a statistical CPU profiling session
+
+    Attributes
+    -----
+    duration: ``float``
+        The length of the sampling window, in seconds
+    interval: ``float``
+        The sampling interval, in seconds
+    stacks: Counter[``str``]
+        The number of samples of each stack, in the folded format
+    """
+
+    __slots__ = ("duration", "interval", "stacks")
+    if TYPE_CHECKING:
+        duration: float
+        interval: float
+        stacks: Counter[str]
+
+    def __init__(self, duration: float, interval: float, stacks: Counter[str]) -> None:
+        self.duration = duration
+        self.interval = interval
+        self.stacks = stacks
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """Get the frames that were on top of the stack most often"""
+        leaves: Counter[str] = collections.Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+
+        return leaves.most_common(limit)
+
+    def text(self, limit: int = 10) -> str:
+        samples = self.samples
+        lines = [f"Collected {samples} samples in {self.duration:.2f}s, showing the top {limit} frames:"]
+        for frame, count in self.top(limit):
+            lines.append(f"{100 * count / samples:5.1f}% :: {frame}")
+
+        return "\n".join(lines)
+
+    def folded(self) -> str:
+        """Render the samples in the folded stack format accepted by
+        flamegraph.pl and speedscope
+        """
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.items())
+
+
+class Profiler:
+    """Run memory tracing or CPU sampling for a bounded window.
+
+    Nothing is traced outside of a session, so normal operation does
+    not pay for profiling. Only one session can run at a time.
+    """
+
+    __slots__ = ("_running",)
+    MAX_DURATION: ClassVar[float] = 120.0
+    if TYPE_CHECKING:
+        _running: bool
+
+    def __init__(self) -> None:
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @contextlib.contextmanager
+    def _session(self) -> Iterator[None]:
+        if self._running:
+            raise ProfilerBusy
+
+        self._running = True
+        try:
+            yield
+        finally:
+            self._running = False
+
+    def _check_duration(self, duration: float) -> None:
+        if not 0 < duration <= self.MAX_DURATION:
+            raise ValueError(f"Duration must be in (0, {self.MAX_DURATION}] seconds")
+
+    async def trace_memory(
+        self,
+        duration: float,
+        *,
+        keytype: Literal["filename", "lineno", "traceback"] = "lineno",
+        frames: int = 25,
+    ) -> MemoryReport:
+        """This function is a coroutine
+
+        Trace memory allocations for ``duration`` seconds and compare
+        the snapshots taken at both ends of the window.
+
+        Parameters
+        -----
+        duration: ``float``
+            The length of the window, in seconds
+        keytype: Literal["filename", "lineno", "traceback"]
+            The key to group the statistics by
+        frames: ``int``
+            The number of frames to store for each allocation
+
+        Returns
+        -----
+        ``MemoryReport``
+            The allocation differences
+
+        Raises
+        -----
+        ``ProfilerBusy``
+            Another session is running
+        """
+        self._check_duration(duration)
+        with self._session():
+            was_tracing = tracemalloc.is_tracing()
+            if not was_tracing:
+                tracemalloc.start(frames)
+
+            try:
+                before = await asyncio.to_thread(self._take_snapshot)
+                await asyncio.sleep(duration)
+                after = await asyncio.to_thread(self._take_snapshot)
+            finally:
+                if not was_tracing:
+                    tracemalloc.stop()
+
+            return await asyncio.to_thread(MemoryReport, duration, keytype, before, after)
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    async def sample_cpu(self, duration: float, *, interval: float = 0.005, all_threads: bool = False) -> CPUReport:
+        """This function is a coroutine
+
+        Sample the call stacks for ``duration`` seconds from a
+        background thread.
+
+        Parameters
+        -----
+        duration: ``float``
+            The length of the window, in seconds
+        interval: ``float``
+            The time between 2 samples, in seconds
+        all_threads: ``bool``
+            Whether to sample every thread instead of only the event
+            loop thread
+
+        Returns
+        -----
+        ``CPUReport``
+            The collected samples
+
+        Raises
+        -----
+        ``ProfilerBusy``
+            Another session is running
+        """
+        self._check_duration(duration)
+        with self._session():
+            stacks: Counter[str] = collections.Counter()
+            stop = threading.Event()
+            target = None if all_threads else threading.get_ident()
+            thread = threading.Thread(target=self._sample, args=(stop, interval, target, stacks), name="CPU profiler", daemon=True)
+            thread.start()
+
+            try:
+                await asyncio.sleep(duration)
+            finally:
+                stop.set()
+                await asyncio.to_thread(thread.join)
+
+            return CPUReport(duration, interval, stacks)
+
+    @staticmethod
+    def _sample(stop: threading.Event, interval: float, target: Optional[int], stacks: Counter[str]) -> None:
+        current = threading.get_ident()
+        while not stop.wait(interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():  # type: ignore
+                if ident == current or (target is not None and ident != target):
+                    continue
+
+                labels = []
+                _frame: Optional[FrameType] = frame
+                while _frame is not None:
+                    code = _frame.f_code
+                    labels.append(_frame_label(code.co_filename, _frame.f_lineno, code.co_name))
+                    _frame = _frame.f_back
+
+                labels.append(names.get(ident, str(ident)).replace(";", ":"))
+                stacks[";".join(reversed(labels))] += 1
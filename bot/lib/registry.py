@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import importlib
+import json
+import os
+import pkgutil
+import time
+import traceback
+from typing import Any, ClassVar, Dict, Iterable, List, Set, TYPE_CHECKING
+
+from discord import app_commands
+from discord.ext import commands
+
+from _types import Context
+from lib import metrics
+if TYPE_CHECKING:
+    import haruka
+
+
+__all__ = (
+    "CommandRegistry",
+    "LazyCommand",
+    "ModuleImport",
+)
+
+
+COMMAND_MODULE_IMPORT = metrics.Gauge("haruka_command_module_import_seconds", "Time spent importing each command module", ("module", "mode"))
+COMMAND_IMPORT_DURATION = metrics.Gauge("haruka_command_import_seconds", "Time spent loading the command modules at startup")
+COMMAND_MODULES = metrics.Gauge("haruka_command_modules", "Number of command modules", ("state",))
+
+
+class ModuleImport:
+    """The import of a command module
+
+    Attributes
+    -----
+    module: ``str``
+        The qualified module name
+    mode: ``str``
+        Either "startup" or "deferred". Deferred modules are imported
+        on the first invocation of one of their commands.
+    duration: ``float``
+        The time spent importing the module, in seconds
+    """
+
+    __slots__ = ("module", "mode", "duration")
+    if TYPE_CHECKING:
+        module: str
+        mode: str
+        duration: float
+
+    def __init__(self, module: str, mode: str, duration: float) -> None:
+        self.module = module
+        self.mode = mode
+        self.duration = duration
+
+    def __repr__(self) -> str:
+        return f"<ModuleImport module={self.module} mode={self.mode} duration={self.duration:.3f}>"
+
+
+async def _placeholder(ctx: Context) -> None:
+    return
+
+
+class LazyCommand(commands.Command):
+    """A text command whose implementing module has not been imported yet
+
+    The placeholder carries the metadata recorded in the manifest, so it
+    shows up in the command list. When invoked, it imports the module
+    and hands the context over to the real command, which then runs its
+    own checks, cooldowns and hooks.
+    """
+
+    if TYPE_CHECKING:
+        registry: CommandRegistry
+
+    def __init__(self, registry: CommandRegistry, module: str, data: Dict[str, Any]) -> None:
+        super().__init__(
+            _placeholder,
+            name=data["name"],
+            aliases=list(data["aliases"]),
+            description=data["description"],
+            usage=data["usage"],
+            hidden=data["hidden"],
+        )
+        self.registry = registry
+        self.module = module
+
+    def resolve(self) -> commands.Command:
+        """Import the implementing module if necessary and get the real
+        command
+
+        Returns
+        -----
+        ``commands.Command``
+            The real command
+
+        Raises
+        -----
+        ``commands.CommandInvokeError``
+            The module could not be imported
+        ``commands.CommandNotFound``
+            The module does not define this command anymore
+        """
+        self.registry.resolve(self.module)
+        command = self.registry.bot.get_command(self.name)
+        if command is None or isinstance(command, LazyCommand):
+            raise commands.CommandNotFound(f"Command \"{self.name}\" is not found")
+
+        return command
+
+    async def invoke(self, ctx: Context) -> None:
+        ctx.command = command = self.resolve()
+        await command.invoke(ctx)
+
+    async def reinvoke(self, ctx: Context, *, call_hooks: bool = False) -> None:
+        ctx.command = command = self.resolve()
+        await command.reinvoke(ctx, call_hooks=call_hooks)
+
+
+class CommandRegistry:
+    """Load the command modules of a package
+
+    The text commands, slash commands and listeners that each module
+    registers are recorded in a JSON manifest, together with a digest
+    of the module source. On the next startup, a module that only
+    registers text commands and whose source did not change is not
+    imported: ``LazyCommand`` placeholders are registered from the
+    manifest instead, and the module is imported on the first
+    invocation of one of its commands. Slash commands must be in the
+    tree before it is synced, so their modules are always imported.
+
+    Attributes
+    -----
+    bot: ``haruka.Haruka``
+        The bot the commands are registered to
+    imports: List[``ModuleImport``]
+        All module imports, in order
+    """
+
+    __slots__ = ("bot", "package", "path", "manifest_path", "imports", "_manifest", "_deferred", "_dirty", "_startup_duration")
+    VERSION: ClassVar[int] = 1
+    if TYPE_CHECKING:
+        bot: haruka.Haruka
+        package: str
+        path: Iterable[str]
+        manifest_path: str
+        imports: List[ModuleImport]
+        _manifest: Dict[str, Dict[str, Any]]
+        _deferred: Dict[str, Dict[str, Any]]
+        _dirty: bool
+        _startup_duration: float
+
+    def __init__(self, bot: haruka.Haruka, package: str, path: Iterable[str], *, manifest_path: str) -> None:
+        self.bot = bot
+        self.package = package
+        self.path = path
+        self.manifest_path = manifest_path
+        self.imports = []
+        self._manifest = self._read_manifest()
+        self._deferred = {}
+        self._dirty = False
+        self._startup_duration = 0.0
+
+    def _read_manifest(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return {}
+
+        return data.get("modules", {})
+
+    def save(self) -> None:
+        """Write the manifest if it changed during this run
+
+        The manifest is usually generated at build time. If it cannot
+        be written (e.g. on a read-only file system), the error is
+        logged and all modules are imported again on the next startup.
+        """
+        if not self._dirty:
+            return
+
+        data = {"version": self.VERSION, "modules": self._manifest}
+        try:
+            with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, sort_keys=True)
+
+            os.replace(self.manifest_path + ".tmp", self.manifest_path)
+        except OSError:
+            self.bot.log(f"Cannot write the command manifest to {self.manifest_path}:\n" + traceback.format_exc())
+            return
+
+        self._dirty = False
+
+    @property
+    def deferred(self) -> List[str]:
+        """The modules that have not been imported yet"""
+        return list(self._deferred)
+
+    def load(self, *, lazy: bool = True) -> None:
+        """Register the commands of all modules in the package
+
+        Parameters
+        -----
+        lazy: ``bool``
+            Whether to defer the import of modules with an up-to-date
+            manifest entry. If this is ``False``, every module is
+            imported and the manifest is rebuilt.
+        """
+        start = time.perf_counter()
+        names = []
+        for module_info in pkgutil.walk_packages(self.path, prefix=self.package + "."):
+            if module_info.ispkg:
+                continue
+
+            name = module_info.name
+            names.append(name)
+
+            spec = module_info.module_finder.find_spec(name)  # type: ignore
+            with open(spec.origin, "rb") as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+
+            entry = self._manifest.get(name)
+            if lazy and entry is not None and entry["digest"] == digest and entry["lazy"]:
+                self._defer(name, entry)
+            else:
+                self._import(name, digest)
+
+        if set(self._manifest) != set(names):
+            self._manifest = {name: self._manifest[name] for name in names}
+            self._dirty = True
+
+        self._startup_duration = time.perf_counter() - start
+        COMMAND_IMPORT_DURATION.set(self._startup_duration)
+        self._update_counts()
+
+    def _slash_commands(self) -> Set[app_commands.Command]:
+        trees = [self.bot.tree]
+        if self.bot.side_client is not None:
+            trees.append(self.bot.side_client.tree)
+
+        return set(command for tree in trees for command in tree.get_commands())
+
+    def _listeners(self) -> int:
+        return sum(len(listeners) for listeners in self.bot.extra_events.values())
+
+    def _import(self, name: str, digest: str) -> None:
+        text_before = set(self.bot.commands)
+        slash_before = self._slash_commands()
+        listeners_before = self._listeners()
+
+        started = time.perf_counter()
+        importlib.import_module(name)
+        self._record(name, "startup", time.perf_counter() - started)
+
+        text_after = set(self.bot.commands)
+        added = sorted(text_after - text_before, key=lambda command: command.name)
+        slash = sorted(self._slash_commands() - slash_before, key=lambda command: command.name)
+
+        # Only modules which purely register their own text commands can be deferred
+        lazy = (
+            len(added) > 0
+            and len(slash) == 0
+            and text_before <= text_after
+            and self._listeners() == listeners_before
+            and all(command.module == name for command in added)
+        )
+
+        entry = {
+            "digest": digest,
+            "lazy": lazy,
+            "commands": [
+                {
+                    "name": command.name,
+                    "aliases": list(command.aliases),
+                    "description": command.description,
+                    "usage": command.usage,
+                    "hidden": command.hidden,
+                }
+                for command in added
+            ],
+            "slash": [{"name": command.name, "description": command.description} for command in slash],
+        }
+        if self._manifest.get(name) != entry:
+            self._manifest[name] = entry
+            self._dirty = True
+
+    def _defer(self, name: str, entry: Dict[str, Any]) -> None:
+        self._deferred[name] = entry
+        for data in entry["commands"]:
+            self.bot.add_command(LazyCommand(self, name, data))
+
+    def _remove_placeholder(self, data: Dict[str, Any]) -> None:
+        # Not bot.remove_command: it keeps the other keys of a command when
+        # the name is also listed in its aliases
+        placeholder = self.bot.all_commands.get(data["name"])
+        if not isinstance(placeholder, LazyCommand):
+            return
+
+        for key in set([data["name"], *data["aliases"], *placeholder.aliases]):
+            if self.bot.all_commands.get(key) is placeholder:
+                del self.bot.all_commands[key]
+
+    def _record(self, name: str, mode: str, duration: float) -> None:
+        self.imports.append(ModuleImport(name, mode, duration))
+        COMMAND_MODULE_IMPORT.set(duration, module=name, mode=mode)
+
+    def _update_counts(self) -> None:
+        COMMAND_MODULES.set(len(self.imports), state="imported")
+        COMMAND_MODULES.set(len(self._deferred), state="deferred")
+
+    def resolve(self, name: str) -> None:
+        """Import a deferred module and replace its placeholders with
+        the real commands. Nothing happens if the module was already
+        imported.
+
+        Note that the import blocks the event loop.
+
+        Parameters
+        -----
+        name: ``str``
+            The qualified module name
+
+        Raises
+        -----
+        ``commands.CommandInvokeError``
+            The module could not be imported
+        """
+        entry = self._deferred.pop(name, None)
+        if entry is None:
+            return
+
+        for data in entry["commands"]:
+            self._remove_placeholder(data)
+
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as error:
+            self._deferred[name] = entry
+            for data in entry["commands"]:
+                if self.bot.get_command(data["name"]) is None:
+                    # The failed import may have registered some aliases already
+                    with contextlib.suppress(commands.CommandRegistrationError):
+                        self.bot.add_command(LazyCommand(self, name, data))
+
+            raise commands.CommandInvokeError(error) from error
+
+        self._record(name, "deferred", time.perf_counter() - started)
+        self._update_counts()
+
+    def report(self, *, limit: int = 10) -> str:
+        """Format the import-time report
+
+        Parameters
+        -----
+        limit: ``int``
+            The maximum number of slowest imports to list
+        """
+        startup = [record for record in self.imports if record.mode == "startup"]
+        deferred = [record for record in self.imports if record.mode == "deferred"]
+        lines = [
+            f"Loaded commands in {self._startup_duration:.3f}s: imported {len(startup)} modules"
+            + f" ({sum(record.duration for record in startup):.3f}s), deferred {len(self._deferred) + len(deferred)} modules",
+        ]
+
+        if startup:
+            lines.append("Slowest imports at startup:")
+            for record in sorted(startup, key=lambda r: r.duration, reverse=True)[:limit]:
+                lines.append(f"{record.module:<40} {record.duration:7.3f}s")
+
+        if deferred:
+            lines.append("Deferred imports:")
+            for record in deferred:
+                lines.append(f"{record.module:<40} {record.duration:7.3f}s")
+
+        return "\n".join(lines)
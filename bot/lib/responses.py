@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import contextvars
+import copy
+import functools
+import hashlib
+import os
+import pickle
+import time
+from typing import Any, Awaitable, Callable, ClassVar, Dict, Iterator, Optional, OrderedDict, Tuple, TypeVar, cast, TYPE_CHECKING
+
+from lib import metrics
+
+
+__all__ = (
+    "ResponseCache",
+    "cached",
+    "bypass",
+    "CACHES",
+)
+
+
+T = TypeVar("T")
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+_BYPASS: contextvars.ContextVar[bool] = contextvars.ContextVar("_BYPASS", default=False)
+CACHES: Dict[str, ResponseCache] = {}
+
+
+@contextlib.contextmanager
+def bypass() -> Iterator[None]:
+    """A context manager within which all lookups go straight to the
+    upstream and the results are not stored, e.g. for the self-tests
+    """
+    token = _BYPASS.set(True)
+    try:
+        yield
+    finally:
+        _BYPASS.reset(token)
+
+
+def _consume_exception(task: asyncio.Task[Any]) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+class ResponseCache:
+    """A cache of the parsed results of an upstream wrapper
+
+    An entry younger than ``ttl`` seconds is returned as is. Until
+    ``stale`` more seconds have passed, it is still returned but a
+    refresh is started in the background. Concurrent lookups of the
+    same key share a single upstream request.
+
+    The most recently used entries are kept in memory, all entries
+    are also pickled to ``directory`` so that they survive restarts
+    and are shared by the processes of a cluster. Every
+    ``PRUNE_INTERVAL`` seconds, the expired files are removed and at
+    most ``DISK_RATIO * capacity`` files are kept.
+
+    Lookups return shallow copies of the cached values (and of the
+    items of cached lists), so callers may set attributes of the
+    returned objects but must not mutate their nested containers.
+
+    Attributes
+    -----
+    name: ``str``
+        The cache name, used as the ``cache`` label of the metrics
+    ttl: ``float``
+        The number of seconds an entry is fresh
+    stale: ``float``
+        The number of seconds an expired entry can still be served
+        while it is being refreshed
+    capacity: ``int``
+        The maximum number of entries kept in memory
+    directory: ``str``
+        The directory of the pickled entries
+    """
+
+    __slots__ = ("name", "ttl", "stale", "capacity", "directory", "_data", "_inflight", "_pruned_at")
+    DIRECTORY: ClassVar[str] = "./cache/responses"
+    DISK_RATIO: ClassVar[int] = 4
+    PRUNE_INTERVAL: ClassVar[float] = 3600.0
+    if TYPE_CHECKING:
+        name: str
+        ttl: float
+        stale: float
+        capacity: int
+        directory: str
+        _data: OrderedDict[str, Tuple[float, Any]]
+        _inflight: Dict[str, asyncio.Task[Any]]
+        _pruned_at: float
+
+    def __init__(self, name: str, *, ttl: float, stale: float = 0.0, capacity: int = 256) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.stale = stale
+        self.capacity = capacity
+        self.directory = os.path.join(self.DIRECTORY, name)
+        self._data = collections.OrderedDict()
+        self._inflight = {}
+        self._pruned_at = 0.0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".pickle")
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[T]]) -> T:
+        """This function is a coroutine
+
+        Get the value of a key, calling ``fetch`` on a miss
+
+        Falsy values (``None``, empty lists) are never stored, the
+        wrappers return them when the upstream fails.
+
+        Parameters
+        -----
+        key: ``str``
+            The cache key
+        fetch: Callable[[], Awaitable[``T``]]
+            The function that requests the upstream
+
+        Returns
+        -----
+        ``T``
+            A shallow copy of the cached or fetched value
+        """
+        if _BYPASS.get():
+            return await fetch()
+
+        entry = self._data.get(key)
+        if entry is None:
+            entry = await self._load(key)
+
+        if entry is not None:
+            stored_at, value = entry
+            age = time.time() - stored_at
+            if age < self.ttl + self.stale:
+                metrics.cache_lookup(self.name, True)
+                self._data.move_to_end(key)
+                if age >= self.ttl:
+                    self._fetch(key, fetch).add_done_callback(_consume_exception)
+
+                return self._copy(value)
+
+        metrics.cache_lookup(self.name, False)
+        return self._copy(await asyncio.shield(self._fetch(key, fetch)))
+
+    def _copy(self, value: T) -> T:
+        # The cached objects are shared by all lookups, e.g. PixivArtwork.update sets their attributes
+        if isinstance(value, list):
+            return cast(T, [copy.copy(item) for item in value])
+
+        return copy.copy(value)
+
+    def _fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task[Any]:
+        try:
+            return self._inflight[key]
+        except KeyError:
+            task = self._inflight[key] = asyncio.create_task(self._run(key, fetch))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            return task
+
+    async def _run(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        if value:
+            self._store(key, value)
+
+        return value
+
+    def _store(self, key: str, value: Any) -> None:
+        stored_at = time.time()
+        self._data[key] = (stored_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+
+        try:
+            data = pickle.dumps((key, stored_at, value), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+
+        prune = stored_at - self._pruned_at >= self.PRUNE_INTERVAL
+        if prune:
+            self._pruned_at = stored_at
+
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(None, self._write, self.path(key), data, prune)
+
+    def _write(self, path: str, data: bytes, prune: bool) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if prune:
+            self._prune()
+
+        # The processes of a cluster share the directory
+        part = f"{path}.{os.getpid()}.part"
+        with open(part, "wb") as f:
+            f.write(data)
+
+        os.replace(part, path)
+
+    def _read(self, key: str) -> Optional[Tuple[float, Any]]:
+        try:
+            with open(self.path(key), "rb") as f:
+                stored_key, stored_at, value = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except Exception:
+            # Corrupted file or a class that changed since it was pickled
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.path(key))
+
+            return
+
+        if stored_key == key:
+            return stored_at, value
+
+    async def _load(self, key: str) -> Optional[Tuple[float, Any]]:
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(None, self._read, key)
+        if entry is not None and key not in self._data:
+            self._data[key] = entry
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+        return entry
+
+    def _prune(self) -> None:
+        expires_at = time.time() - self.ttl - self.stale
+        files = []
+        with contextlib.suppress(FileNotFoundError):
+            for entry in os.scandir(self.directory):
+                with contextlib.suppress(FileNotFoundError):
+                    mtime = entry.stat().st_mtime
+                    if mtime < expires_at:
+                        os.remove(entry.path)
+                    else:
+                        files.append((mtime, entry.path))
+
+        # Then the least recently written files
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.DISK_RATIO * self.capacity)]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"<ResponseCache name={self.name} ttl={self.ttl} stale={self.stale} size={len(self)}>"
+
+
+def cached(name: str, *, ttl: float, stale: float = 0.0, capacity: int = 256) -> Callable[[F], F]:
+    """A decorator that caches the results of an upstream wrapper in
+    a ``ResponseCache``
+
+    The cache key is built from all arguments except ``session``. When
+    decorating a classmethod, put this decorator below ``classmethod``.
+
+    Parameters
+    -----
+    name: ``str``
+        The cache name, must be unique
+    ttl: ``float``
+        The number of seconds an entry is fresh
+    stale: ``float``
+        The number of seconds an expired entry can still be served
+        while it is being refreshed
+    capacity: ``int``
+        The maximum number of entries kept in memory
+    """
+    cache = CACHES[name] = ResponseCache(name, ttl=ttl, stale=stale, capacity=capacity)
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = repr((args, sorted((k, v) for k, v in kwargs.items() if k != "session")))
+            return await cache.get(key, lambda: func(*args, **kwargs))
+
+        return cast(F, wrapper)
+
+    return decorator
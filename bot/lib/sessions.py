@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple, Type, TYPE_CHECKING
+
+import aiohttp
+
+import env
+from lib import metrics
+
+
+__all__ = (
+    "SessionPolicy",
+    "SessionManager",
+    "POLICIES",
+)
+
+
+class SessionPolicy:
+    """The connection pool and timeout settings of a session
+
+    Attributes
+    -----
+    name: ``str``
+        The session name, used as the ``session`` label of the
+        HTTP client metrics
+    limit: ``int``
+        The maximum number of simultaneous connections, 0 for no limit
+    limit_per_host: ``int``
+        The maximum number of simultaneous connections to the same
+        endpoint, 0 for no limit
+    keepalive_timeout: ``float``
+        The time an idle connection is kept in the pool, in seconds
+    ttl_dns_cache: ``Optional[int]``
+        The lifetime of resolved addresses, in seconds. ``None`` to
+        cache them forever.
+    timeout: ``aiohttp.ClientTimeout``
+        The default timeout of the requests
+    redirect: ``bool``
+        Whether the requests are sent to the fake upstream server
+        when ``UPSTREAM_URL`` is set
+    """
+
+    __slots__ = ("name", "limit", "limit_per_host", "keepalive_timeout", "ttl_dns_cache", "timeout", "redirect")
+    if TYPE_CHECKING:
+        name: str
+        limit: int
+        limit_per_host: int
+        keepalive_timeout: float
+        ttl_dns_cache: Optional[int]
+        timeout: aiohttp.ClientTimeout
+        redirect: bool
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        limit: int,
+        limit_per_host: int,
+        keepalive_timeout: float,
+        ttl_dns_cache: Optional[int],
+        timeout: aiohttp.ClientTimeout,
+        redirect: bool = True,
+    ) -> None:
+        self.name = name
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.timeout = timeout
+        self.redirect = redirect
+
+    def create_connector(self) -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.ttl_dns_cache,
+            enable_cleanup_closed=True,
+        )
+
+    def __repr__(self) -> str:
+        return f"<SessionPolicy name={self.name} limit={self.limit} limit_per_host={self.limit_per_host}>"
+
+
+POLICIES: Tuple[SessionPolicy, ...] = (
+    # Short API calls and scraping: many hosts, small responses, a user is waiting for the result
+    SessionPolicy(
+        "api",
+        limit=100,
+        limit_per_host=env.HTTP_LIMIT_PER_HOST,
+        keepalive_timeout=30.0,
+        ttl_dns_cache=300,
+        timeout=aiohttp.ClientTimeout(total=60.0, connect=5.0, sock_read=30.0),
+    ),
+    # Large bodies (pximg artworks, the MediaFire archive): a few slow
+    # connections that must not take the pool slots of the API calls
+    SessionPolicy(
+        "download",
+        limit=env.HTTP_DOWNLOAD_LIMIT,
+        limit_per_host=max(1, env.HTTP_DOWNLOAD_LIMIT // 2),
+        keepalive_timeout=15.0,
+        ttl_dns_cache=300,
+        timeout=aiohttp.ClientTimeout(connect=10.0, sock_read=60.0),
+    ),
+    # Requests forwarded to the other processes of the cluster,
+    # including long-lived websockets
+    SessionPolicy(
+        "internal",
+        limit=0,
+        limit_per_host=0,
+        keepalive_timeout=60.0,
+        ttl_dns_cache=None,
+        timeout=aiohttp.ClientTimeout(connect=2.0),
+        redirect=False,
+    ),
+)
+
+
+class SessionManager:
+    """Own the outbound HTTP sessions of the bot
+
+    Each kind of traffic has its own session with its own connection
+    pool, so that a few large downloads cannot exhaust the connections
+    used by interactive commands. Connections are kept alive between
+    requests and resolved addresses are cached, per ``POLICIES``.
+
+    Sessions must be created from within a running event loop.
+
+    Parameters
+    -----
+    headers: ``Mapping[str, str]``
+        The default headers of all sessions
+    request_class: ``Optional[Type[aiohttp.ClientRequest]]``
+        The request class of the sessions whose policy allows
+        redirecting them, see ``fixtures.redirect_request_class``
+    """
+
+    __slots__ = ("_sessions",)
+    if TYPE_CHECKING:
+        _sessions: Dict[str, aiohttp.ClientSession]
+
+    def __init__(self, *, headers: Mapping[str, str], request_class: Optional[Type[aiohttp.ClientRequest]] = None) -> None:
+        self._sessions = {}
+        for policy in POLICIES:
+            options: Dict[str, Any] = {}
+            if policy.redirect and request_class is not None:
+                options["request_class"] = request_class
+
+            self._sessions[policy.name] = aiohttp.ClientSession(
+                connector=policy.create_connector(),
+                headers=headers,
+                timeout=policy.timeout,
+                trace_configs=[metrics.create_trace_config(policy.name)],
+                **options,
+            )
+
+    @property
+    def api(self) -> aiohttp.ClientSession:
+        """The session for API calls and scraping, this is ``Haruka.session``"""
+        return self._sessions["api"]
+
+    @property
+    def download(self) -> aiohttp.ClientSession:
+        """The session for large response bodies"""
+        return self._sessions["download"]
+
+    @property
+    def internal(self) -> aiohttp.ClientSession:
+        """The session for requests to the other cluster processes"""
+        return self._sessions["internal"]
+
+    def __getitem__(self, name: str) -> aiohttp.ClientSession:
+        return self._sessions[name]
+
+    def __iter__(self) -> Iterator[aiohttp.ClientSession]:
+        return iter(self._sessions.values())
+
+    async def close(self) -> None:
+        """This function is a coroutine
+
+        Close all sessions and their connection pools
+        """
+        for session in self._sessions.values():
+            await session.close()
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import traceback
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from lib import metrics
+
+
+__all__ = (
+    "StageFailed",
+    "StageResult",
+    "StartupGraph",
+)
+
+
+STARTUP_STAGE_DURATION = metrics.Gauge("haruka_startup_stage_duration_seconds", "Time spent in each startup stage", ("graph", "stage", "status"))
+STARTUP_DURATION = metrics.Gauge("haruka_startup_duration_seconds", "Time spent running each startup graph", ("graph",))
+
+
+class StageFailed(Exception):
+    """Exception raised when a critical startup stage fails
+
+    Attributes
+    -----
+    result: ``StageResult``
+        The result of the failed stage
+    """
+
+    def __init__(self, result: StageResult) -> None:
+        self.result = result
+        super().__init__(f"Critical startup stage {result.name} did not complete ({result.status})")
+
+
+class StageResult:
+    """The outcome of a startup stage
+
+    Attributes
+    -----
+    name: ``str``
+        The stage name
+    status: ``str``
+        One of "ok", "failed", "timeout" or "skipped". A stage is
+        skipped when one of its requirements did not complete.
+    started_at: ``float``
+        The start time of the stage, relative to the start of the graph
+    duration: ``float``
+        The time spent running the stage, in seconds
+    error: Optional[``str``]
+        The formatted exception if the stage failed
+    """
+
+    __slots__ = ("name", "status", "started_at", "duration", "error")
+    if TYPE_CHECKING:
+        name: str
+        status: str
+        started_at: float
+        duration: float
+        error: Optional[str]
+
+    def __init__(self, name: str, status: str, started_at: float, duration: float, error: Optional[str] = None) -> None:
+        self.name = name
+        self.status = status
+        self.started_at = started_at
+        self.duration = duration
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+    def __repr__(self) -> str:
+        return f"<StageResult name={self.name} status={self.status} duration={self.duration:.3f}>"
+
+
+class _Stage:
+
+    __slots__ = ("name", "func", "requires", "timeout", "critical")
+    if TYPE_CHECKING:
+        name: str
+        func: Callable[[], Coroutine[Any, Any, Any]]
+        requires: Tuple[str, ...]
+        timeout: Optional[float]
+        critical: bool
+
+    def __init__(self, name: str, func: Callable[[], Coroutine[Any, Any, Any]], *, requires: Sequence[str], timeout: Optional[float], critical: bool) -> None:
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.timeout = timeout
+        self.critical = critical
+
+
+class StartupGraph:
+    """A set of asynchronous startup stages with dependencies
+
+    Every stage starts as soon as all of its requirements completed
+    successfully, so independent stages run concurrently. Each stage
+    has its own timeout. If a critical stage does not complete,
+    ``run`` raises ``StageFailed`` after all other stages settled.
+    """
+
+    __slots__ = ("name", "results", "_stages")
+    if TYPE_CHECKING:
+        name: str
+        results: List[StageResult]
+        _stages: Dict[str, _Stage]
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.results = []
+        self._stages = {}
+
+    def stage(
+        self,
+        name: str,
+        *,
+        requires: Sequence[str] = (),
+        timeout: Optional[float] = 30.0,
+        critical: bool = False,
+    ) -> Callable[[Callable[[], Coroutine[Any, Any, Any]]], Callable[[], Coroutine[Any, Any, Any]]]:
+        """A decorator that registers a coroutine function as a stage
+
+        Parameters
+        -----
+        name: ``str``
+            The stage name
+        requires: Sequence[``str``]
+            The names of the stages that must complete before this one.
+            They must be registered before this stage.
+        timeout: Optional[``float``]
+            The maximum running time of the stage, in seconds
+        critical: ``bool``
+            Whether the startup must be aborted if this stage does not
+            complete
+        """
+        def decorator(func: Callable[[], Coroutine[Any, Any, Any]]) -> Callable[[], Coroutine[Any, Any, Any]]:
+            for requirement in requires:
+                if requirement not in self._stages:
+                    raise ValueError(f"Unknown requirement {requirement} for stage {name}")
+
+            self._stages[name] = _Stage(name, func, requires=requires, timeout=timeout, critical=critical)
+            return func
+
+        return decorator
+
+    async def run(self) -> List[StageResult]:
+        """This function is a coroutine
+
+        Run all stages of the graph.
+
+        Returns
+        -----
+        List[``StageResult``]
+            The results of all stages, in completion order
+
+        Raises
+        -----
+        ``StageFailed``
+            A critical stage did not complete
+        """
+        start = time.perf_counter()
+        tasks: Dict[str, asyncio.Task[StageResult]] = {}
+
+        async def execute(stage: _Stage) -> StageResult:
+            for requirement in stage.requires:
+                if not (await tasks[requirement]).ok:
+                    result = StageResult(stage.name, "skipped", time.perf_counter() - start, 0.0)
+                    break
+            else:
+                started_at = time.perf_counter()
+                try:
+                    await asyncio.wait_for(stage.func(), timeout=stage.timeout)
+                except asyncio.TimeoutError:
+                    result = StageResult(stage.name, "timeout", started_at - start, time.perf_counter() - started_at)
+                except Exception:
+                    result = StageResult(stage.name, "failed", started_at - start, time.perf_counter() - started_at, traceback.format_exc())
+                else:
+                    result = StageResult(stage.name, "ok", started_at - start, time.perf_counter() - started_at)
+
+            self.results.append(result)
+            STARTUP_STAGE_DURATION.set(result.duration, graph=self.name, stage=result.name, status=result.status)
+            return result
+
+        for stage in self._stages.values():
+            tasks[stage.name] = asyncio.create_task(execute(stage), name=f"Startup stage {self.name}/{stage.name}")
+
+        await asyncio.gather(*tasks.values())
+        STARTUP_DURATION.set(time.perf_counter() - start, graph=self.name)
+
+        for result in self.results:
+            if self._stages[result.name].critical and not result.ok:
+                raise StageFailed(result)
+
+        return self.results
+
+    def report(self) -> str:
+        """Format the timing report of the last run"""
+        lines = [f"Startup graph \"{self.name}\" timing report:"]
+        for result in sorted(self.results, key=lambda r: r.started_at):
+            lines.append(f"{result.name:<20} {result.status:<8} start {result.started_at:7.3f}s, took {result.duration:7.3f}s")
+            if result.error is not None:
+                lines.append(result.error.rstrip("\n"))
+
+        return "\n".join(lines)
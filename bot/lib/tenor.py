@@ -4,7 +4,10 @@ import aiohttp
 import yarl
 from bs4 import BeautifulSoup
 
+from lib import responses
 
+
+@responses.cached("tenor", ttl=3600.0, stale=21600.0)
 async def search(query: str, *, session: aiohttp.ClientSession) -> List[str]:
     """This function is a coroutine
 
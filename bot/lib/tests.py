@@ -1,14 +1,22 @@
 from __future__ import annotations
 
 import asyncio
-from typing import TYPE_CHECKING
+import datetime
+import time
+import traceback
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Sequence, TYPE_CHECKING
 
+import aiohttp
+import discord
+
+from lib import metrics, responses
 from .audio import InvidiousSource
-from .mal import Anime, Manga
+from .fixtures import FixtureSession
 from .pixiv import PixivArtwork
 from .playlist import get
-from .urban import UrbanSearch
 if TYPE_CHECKING:
+    import asyncpg
+
     import haruka
 
 
@@ -30,6 +38,12 @@ YTCOLLECTION_TESTS = (
     "PLP61jZvOT8I2cof9cBjAe07D8VgcfR1c5",  # YouTube playlist
     "RDEMcce0hP5SVByOVCd8UWUHEA",  # YouTube mix
 )
+FIXTURES_DIRECTORY = "./fixtures/http"
+MODES = ("live", "record", "replay")
+
+
+SELF_TEST_CASES = metrics.Gauge("haruka_self_test_cases", "Number of test cases in the latest self-test run", ("suite", "result"))
+SELF_TEST_DURATION = metrics.Gauge("haruka_self_test_duration_seconds", "Time spent running each suite in the latest self-test run", ("suite", "status"))
 
 
 def make_title(title: str) -> str:
@@ -52,15 +66,26 @@ class MiniInvidiousObject:
 
 
 class TestingStatus:
+    """The test case counters of a running suite
+
+    Attributes
+    -----
+    bot: ``haruka.Haruka``
+        The bot running the tests
+    session: Union[``aiohttp.ClientSession``, ``FixtureSession``]
+        The session to send HTTP requests with
+    """
 
-    __slots__ = ("bot", "success", "total")
+    __slots__ = ("bot", "session", "success", "total")
     if TYPE_CHECKING:
         bot: haruka.Haruka
+        session: aiohttp.ClientSession
         success: int
         total: int
 
-    def __init__(self, bot: haruka.Haruka) -> None:
+    def __init__(self, bot: haruka.Haruka, session: aiohttp.ClientSession) -> None:
         self.bot = bot
+        self.session = session
 
         self.success = 0
         self.total = 0
@@ -71,10 +96,182 @@ class TestingStatus:
             self.success += 1
 
 
+SuiteFunction = Callable[[TestingStatus], Coroutine[Any, Any, str]]
+
+
+class _Suite:
+
+    __slots__ = ("name", "func", "timeout", "offline")
+    if TYPE_CHECKING:
+        name: str
+        func: SuiteFunction
+        timeout: float
+        offline: bool
+
+    def __init__(self, name: str, func: SuiteFunction, *, timeout: float, offline: bool) -> None:
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.offline = offline
+
+
+SUITES: Dict[str, _Suite] = {}
+
+
+def suite(name: str, *, timeout: float = 60.0, offline: bool = True) -> Callable[[SuiteFunction], SuiteFunction]:
+    """A decorator that registers a test suite
+
+    Parameters
+    -----
+    name: ``str``
+        The suite name
+    timeout: ``float``
+        The maximum running time of the suite, in seconds
+    offline: ``bool``
+        Whether the suite only sends HTTP requests through
+        ``TestingStatus.session``, so that it can run against
+        recorded fixtures
+    """
+    def decorator(func: SuiteFunction) -> SuiteFunction:
+        SUITES[name] = _Suite(name, func, timeout=timeout, offline=offline)
+        return func
+
+    return decorator
+
+
+class SuiteResult:
+    """The outcome of a test suite
+
+    Attributes
+    -----
+    name: ``str``
+        The suite name
+    status: ``str``
+        One of "ok", "failed", "timeout" or "skipped"
+    success: ``int``
+        The number of passed test cases
+    total: ``int``
+        The number of completed test cases
+    duration: ``float``
+        The time spent running the suite, in seconds
+    log: ``str``
+        The suite output
+    """
+
+    __slots__ = ("name", "status", "success", "total", "duration", "log")
+    if TYPE_CHECKING:
+        name: str
+        status: str
+        success: int
+        total: int
+        duration: float
+        log: str
+
+    def __init__(self, name: str, status: str, success: int, total: int, duration: float, log: str) -> None:
+        self.name = name
+        self.status = status
+        self.success = success
+        self.total = total
+        self.duration = duration
+        self.log = log
+
+    def __repr__(self) -> str:
+        return f"<SuiteResult name={self.name} status={self.status} success={self.success}/{self.total} duration={self.duration:.3f}>"
+
+
+class TestRun:
+    """The results of a self-test run
+
+    Attributes
+    -----
+    mode: ``str``
+        One of "live", "record" or "replay"
+    started_at: ``datetime.datetime``
+        The time the run started
+    results: List[``SuiteResult``]
+        The results of all requested suites
+    """
+
+    __slots__ = ("mode", "started_at", "results")
+    if TYPE_CHECKING:
+        mode: str
+        started_at: datetime.datetime
+        results: List[SuiteResult]
+
+    def __init__(self, mode: str, started_at: datetime.datetime, results: List[SuiteResult]) -> None:
+        self.mode = mode
+        self.started_at = started_at
+        self.results = results
+
+    @property
+    def success(self) -> int:
+        return sum(result.success for result in self.results)
+
+    @property
+    def total(self) -> int:
+        return sum(result.total for result in self.results)
+
+    @property
+    def log(self) -> str:
+        return "\n".join(result.log for result in self.results)
+
+    async def save(self, conn: asyncpg.Pool) -> None:
+        """This function is a coroutine
+
+        Store the results of this run in the database
+        """
+        await conn.executemany(
+            "INSERT INTO tests VALUES ($1, $2, $3, $4, $5, $6, $7);",
+            [(self.started_at, self.mode, result.name, result.status, result.success, result.total, result.duration) for result in self.results],
+        )
+
+    async def previous(self, conn: asyncpg.Pool) -> Dict[str, asyncpg.Record]:
+        """This function is a coroutine
+
+        Get the latest stored result of each suite before this run,
+        in the same mode
+
+        Returns
+        -----
+        Dict[``str``, ``asyncpg.Record``]
+            A mapping of suite names to their previous results
+        """
+        rows = await conn.fetch(
+            """
+            SELECT DISTINCT ON (suite) * FROM tests
+            WHERE mode = $1 AND run_at < $2 AND suite = ANY($3::text[])
+            ORDER BY suite, run_at DESC;
+            """,
+            self.mode, self.started_at, [result.name for result in self.results],
+        )
+        return {row["suite"]: row for row in rows}
+
+    def summary(self, previous: Optional[Dict[str, asyncpg.Record]] = None) -> str:
+        """Format a short summary of this run
+
+        Parameters
+        -----
+        previous: Optional[Dict[``str``, ``asyncpg.Record``]]
+            The previous results to compare with, as returned
+            by ``previous``
+        """
+        lines = [f"Self-test run ({self.mode}): {self.success}/{self.total} passed"]
+        for result in self.results:
+            line = f"{result.name:<14} {result.status:<8} {result.success}/{result.total} in {result.duration:.2f}s"
+            if previous is not None and result.name in previous:
+                row = previous[result.name]
+                line += f" (previously {row['status']} {row['success']}/{row['total']} in {row['duration']:.2f}s)"
+
+            lines.append(line)
+
+        return "\n".join(lines)
+
+
+@suite("pixiv", timeout=30.0)
 async def pixiv_test(status: TestingStatus) -> str:
     content = make_title("PIXIV TESTS")
-    for id in PIXIV_TESTS:
-        artwork = await PixivArtwork.get(id, session=status.bot.session)
+    artworks = await asyncio.gather(*[PixivArtwork.get(id, session=status.session) for id in PIXIV_TESTS])
+    for id, artwork in zip(PIXIV_TESTS, artworks):
         content += f"Finished Pixiv test for ID {id}: {artwork}\n"
 
         status.update(artwork is not None)
@@ -82,10 +279,14 @@ async def pixiv_test(status: TestingStatus) -> str:
     return content
 
 
+@suite("urban", timeout=30.0)
 async def urban_test(status: TestingStatus) -> str:
+    # The scrapers import bs4, which is only needed when the tests run
+    from .urban import UrbanSearch
+
     content = make_title("URBAN TESTS")
-    for term in URBAN_TESTS:
-        result = await UrbanSearch.search(term, session=status.bot.session)
+    results = await asyncio.gather(*[UrbanSearch.search(term, session=status.session) for term in URBAN_TESTS])
+    for term, result in zip(URBAN_TESTS, results):
         content += f"Finished Urban test for term \"{term}\": {result}\n"
 
         status.update(result is not None)
@@ -93,11 +294,13 @@ async def urban_test(status: TestingStatus) -> str:
     return content
 
 
+@suite("youtube-dl", timeout=300.0, offline=False)
 async def ytdl_test(status: TestingStatus) -> str:
     content = make_title("YOUTUBEDL TESTS")
-    for id in YTDL_TESTS:
-        track = MiniInvidiousObject(id)
-        ytdl_result = await InvidiousSource.get_source(track, client=status.bot.audio, ignore_error=True)  # type: ignore
+    tracks = [MiniInvidiousObject(id) for id in YTDL_TESTS]
+    # The lookups are spread over the extractor worker pool
+    results = await asyncio.gather(*[InvidiousSource.get_source(track, client=status.bot.audio, ignore_error=True) for track in tracks])  # type: ignore
+    for id, ytdl_result in zip(YTDL_TESTS, results):
         content += f"Finished youtube-dl test for ID {id}: {ytdl_result}\n"
 
         status.update(ytdl_result is not None)
@@ -105,10 +308,13 @@ async def ytdl_test(status: TestingStatus) -> str:
     return content
 
 
+@suite("anime", timeout=30.0)
 async def anime_test(status: TestingStatus) -> str:
+    from .mal import Anime
+
     content = make_title("ANIME TESTS")
-    for id in ANIME_TESTS:
-        anime = await Anime.get(id, session=status.bot.session)
+    animes = await asyncio.gather(*[Anime.get(id, session=status.session) for id in ANIME_TESTS])
+    for id, anime in zip(ANIME_TESTS, animes):
         content += f"Finished Anime test for ID {id}: {anime}\n"
 
         status.update(anime is not None)
@@ -116,10 +322,13 @@ async def anime_test(status: TestingStatus) -> str:
     return content
 
 
+@suite("manga", timeout=30.0)
 async def manga_test(status: TestingStatus) -> str:
+    from .mal import Manga
+
     content = make_title("MANGA TESTS")
-    for id in MANGA_TESTS:
-        manga = await Manga.get(id, session=status.bot.session)
+    mangas = await asyncio.gather(*[Manga.get(id, session=status.session) for id in MANGA_TESTS])
+    for id, manga in zip(MANGA_TESTS, mangas):
         content += f"Finished Manga test for ID {id}: {manga}\n"
 
         status.update(manga is not None)
@@ -127,56 +336,136 @@ async def manga_test(status: TestingStatus) -> str:
     return content
 
 
+@suite("image", timeout=60.0)
 async def image_test(status: TestingStatus) -> str:
     bot = status.bot
     await bot.image.wait_until_ready()
     content = make_title("IMAGE TESTS")
 
-    checked = set()
-    for category, sources in bot.image.sfw.items():
-        for source in sources:
-            if source not in checked:
-                checked.add(source)
-                url = await source.get(category)
-                status.update(url is not None)
-                if url is None:
-                    content += f"Test failed for {source} when requesting SFW {category}\n"
-                else:
-                    content += f"Finished test for {source} when requesting SFW {category}: {url}\n"
-
-    checked.clear()
-    for category, sources in bot.image.nsfw.items():
-        for source in sources:
-            if source not in checked:
-                checked.add(source)
-                url = await source.get(category, mode="nsfw")
-                status.update(url is not None)
-                if url is None:
-                    content += f"Test failed for {source} when requesting NSFW {category}\n"
-                else:
-                    content += f"Finished test for {source} when requesting NSFW {category}: {url}\n"
+    # Test each source once per mode, with a copy bound to the testing session
+    requests = []
+    for mode, categories in (("sfw", bot.image.sfw), ("nsfw", bot.image.nsfw)):
+        checked = set()
+        for category, sources in categories.items():
+            for source in sources:
+                if source not in checked:
+                    checked.add(source)
+                    requests.append((mode, category, type(source)(status.session, bot.image)))
+
+    urls = await asyncio.gather(*[source.get(category, mode=mode) for mode, category, source in requests], return_exceptions=True)
+    for (mode, category, source), url in zip(requests, urls):
+        success = isinstance(url, str)
+        status.update(success)
+        if success:
+            content += f"Finished test for {source} when requesting {mode.upper()} {category}: {url}\n"
+        else:
+            content += f"Test failed for {source} when requesting {mode.upper()} {category}\n"
 
     return content
 
 
+@suite("ytcollection", timeout=60.0)
 async def ytcollection_test(status: TestingStatus) -> str:
     content = make_title("YOUTUBE COLLECTION TEST")
-    for id in YTCOLLECTION_TESTS:
-        result = await get(id, session=status.bot.session)
+    results = await asyncio.gather(*[get(id, session=status.session) for id in YTCOLLECTION_TESTS])
+    for id, result in zip(YTCOLLECTION_TESTS, results):
         content += f"Finished ytcollection test for {id}: {result}\n"
 
         status.update(result is not None)
 
+    return content
+
 
-async def run_all_tests(bot: haruka.Haruka) -> None:
-    status = TestingStatus(bot)
-    logs = await asyncio.gather(
-        pixiv_test(status),
-        urban_test(status),
-        ytdl_test(status),
-        anime_test(status),
-        manga_test(status),
-        image_test(status),
-    )
-    bot.log("\n".join(logs))
-    await bot.report(f"Completed all tests: {status.success}/{status.total} passed", send_state=False)
+async def _run_suite(bot: haruka.Haruka, suite: _Suite, session: aiohttp.ClientSession, mode: str) -> SuiteResult:
+    if mode == "replay" and not suite.offline:
+        return SuiteResult(suite.name, "skipped", 0, 0, 0.0, make_title(suite.name.upper() + " TESTS") + "Skipped, this suite cannot run against fixtures\n")
+
+    status = TestingStatus(bot, session)
+    started = time.perf_counter()
+    try:
+        # The suites check the upstreams, not the response caches
+        with responses.bypass():
+            log = await asyncio.wait_for(suite.func(status), timeout=suite.timeout)
+    except asyncio.TimeoutError:
+        result = SuiteResult(suite.name, "timeout", status.success, status.total, time.perf_counter() - started, make_title(suite.name.upper() + " TESTS") + f"Timed out after {suite.timeout}s\n")
+    except Exception:
+        result = SuiteResult(suite.name, "failed", status.success, status.total, time.perf_counter() - started, make_title(suite.name.upper() + " TESTS") + traceback.format_exc())
+    else:
+        result = SuiteResult(suite.name, "ok", status.success, status.total, time.perf_counter() - started, log)
+
+    SELF_TEST_CASES.set(result.success, suite=result.name, result="passed")
+    SELF_TEST_CASES.set(result.total - result.success, suite=result.name, result="failed")
+    SELF_TEST_DURATION.set(result.duration, suite=result.name, status=result.status)
+    return result
+
+
+async def run_tests(bot: haruka.Haruka, *, suites: Optional[Sequence[str]] = None, mode: str = "live") -> TestRun:
+    """This function is a coroutine
+
+    Run test suites concurrently, each with its own timeout.
+
+    Parameters
+    -----
+    suites: Optional[Sequence[``str``]]
+        The names of the suites to run, all suites are run if this
+        is ``None``
+    mode: ``str``
+        "live" sends real requests, "record" also saves the responses
+        to the fixtures directory and "replay" serves the requests
+        from the recorded responses instead. Suites that cannot run
+        against fixtures are skipped in replay mode.
+
+    Returns
+    -----
+    ``TestRun``
+        The results of the run
+
+    Raises
+    -----
+    ``ValueError``
+        Unknown mode or suite name
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown self-test mode {mode}")
+
+    names = list(SUITES) if suites is None else list(suites)
+    for name in names:
+        if name not in SUITES:
+            raise ValueError(f"Unknown test suite {name}")
+
+    session: Any = bot.session
+    if mode == "record":
+        session = FixtureSession(FIXTURES_DIRECTORY, record=True, session=bot.session)
+    elif mode == "replay":
+        session = FixtureSession(FIXTURES_DIRECTORY)
+
+    started_at = discord.utils.utcnow()
+    results = await asyncio.gather(*[_run_suite(bot, SUITES[name], session, mode) for name in names])
+    return TestRun(mode, started_at, list(results))
+
+
+async def run_all_tests(bot: haruka.Haruka, *, mode: str = "live") -> TestRun:
+    """This function is a coroutine
+
+    Run all test suites, store and log the results and report them
+    with a comparison to the previous run.
+
+    Parameters
+    -----
+    mode: ``str``
+        The run mode, see ``run_tests``
+
+    Returns
+    -----
+    ``TestRun``
+        The results of the run
+    """
+    run = await run_tests(bot, mode=mode)
+    bot.log(run.log)
+
+    previous = await run.previous(bot.conn)
+    await run.save(bot.conn)
+    summary = run.summary(previous)
+    bot.log(summary)
+    await bot.report(f"Completed all tests: {run.success}/{run.total} passed\n```\n{summary}\n```", send_state=False)
+    return run
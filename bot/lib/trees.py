@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import time
 import traceback
 from typing import List, Optional, TypeVar, TYPE_CHECKING
 
 from discord import app_commands
 
+from lib import metrics
 if TYPE_CHECKING:
     import haruka
     import side
@@ -14,6 +16,15 @@ if TYPE_CHECKING:
 
 
 class TreeMixin:
+    def observe_latency(self: TreeT, interaction: Interaction) -> None:
+        """Record the time spent processing an interaction into
+        ``metrics.COMMAND_LATENCY``. Each interaction is recorded at
+        most once.
+        """
+        invoked_at = interaction.extras.pop("invoked_at", None)
+        if invoked_at is not None and interaction.command is not None:
+            metrics.COMMAND_LATENCY.observe(time.perf_counter() - invoked_at, command=interaction.command.qualified_name, kind="slash")
+
     async def sync(self: TreeT, *, guild: Optional[Guild] = None) -> List[app_commands.AppCommand]:
         client = self.client
         client.log("Syncing slash commands...")
@@ -23,6 +34,7 @@ class TreeMixin:
 
     async def on_error(self: TreeT, interaction: Interaction, error: BaseException) -> None:
         client = self.client
+        self.observe_latency(interaction)
 
         if isinstance(error, app_commands.CommandInvokeError):
             return await self.on_error(interaction, error.original)
@@ -44,6 +56,7 @@ class SlashCommandTree(TreeMixin, app_commands.CommandTree):
 
     async def interaction_check(self, interaction: Interaction) -> bool:
         bot = self.client
+        interaction.extras["invoked_at"] = time.perf_counter()
 
         if not await bot.is_owner(interaction.user):
             name = interaction.command.name
@@ -69,6 +82,7 @@ class SideClientTree(TreeMixin, app_commands.CommandTree):
 
     async def interaction_check(self, interaction: Interaction) -> bool:
         bot = self.client
+        interaction.extras["invoked_at"] = time.perf_counter()
 
         if interaction.user != bot.owner:
             name = interaction.command.name
@@ -9,7 +9,7 @@ import bs4
 import discord
 from discord.utils import escape_markdown as escape
 
-from lib import utils
+from lib import responses, utils
 
 
 class UrbanSearch:
@@ -53,6 +53,7 @@ class UrbanSearch:
         return f"<UrbanSearch title={self.title} meaning={self.meaning[:50]}>"
 
     @classmethod
+    @responses.cached("urban", ttl=86400.0, stale=604800.0)
     async def search(cls: Type[UrbanSearch], word: str, *, session: aiohttp.ClientSession) -> Optional[UrbanSearch]:
         url = "https://www.urbandictionary.com/define.php"
         for _ in range(10):
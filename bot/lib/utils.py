@@ -9,8 +9,9 @@ from types import TracebackType
 from typing import Any, Coroutine, Generic, Iterable, Iterator, List, Optional, Tuple, Type, TypeVar, TYPE_CHECKING
 
 import discord
-from bs4 import BeautifulSoup, Tag
 from discord.utils import MISSING
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, Tag
 
 
 T = TypeVar("T")
@@ -11,7 +11,13 @@ if TYPE_CHECKING:
 
 class ClientMixin:
     def log(self: ClientT, content: Any) -> None:
-        prefix = f"[{self.__class__.__name__}] "
+        name = self.__class__.__name__
+        cluster = getattr(self, "cluster", None)
+        if cluster is not None and cluster.config.enabled:
+            # All processes of a cluster write to the same file
+            name += f"#{cluster.config.cluster_id}"
+
+        prefix = f"[{name}] "
         content = str(content).replace("\n", f"\n{prefix}")
         self.logfile.write(f"{prefix}{content}\n")
         self.logfile.flush()
@@ -85,4 +91,17 @@ class ClientMixin:
             inline=False,
         )
 
+        cluster = getattr(self, "cluster", None)
+        if cluster is not None and cluster.config.enabled:
+            usage = cluster.usage()
+            alive = sum(1 for cluster_id in range(cluster.config.cluster_count) if cluster.alive(cluster_id))
+            embed.add_field(
+                name=f"Cluster {cluster.config.cluster_id}/{cluster.config.cluster_count}",
+                value=f"Shards {cluster.config.shard_ids} of {cluster.config.shard_count}, {alive} processes alive\n"
+                + f"{sum(peer.guilds for peer in cluster.peers.values())} servers, {sum(peer.voice_clients for peer in cluster.peers.values())} voice clients in total\n"
+                + "**Commands usage:** " + escape(", ".join(f"{command}: {count}" for command, count in usage["text"].items()))
+                + "\n**Slash commands usage:** " + escape(", ".join(f"{command}: {count}" for command, count in usage["slash"].items())),
+                inline=False,
+            )
+
         return embed
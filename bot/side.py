@@ -3,10 +3,11 @@ from __future__ import annotations
 import asyncio
 import datetime
 import io
-from typing import List, Dict, Optional, TYPE_CHECKING
+from typing import List, Dict, Optional, Union, TYPE_CHECKING
 
 import aiohttp
 import discord
+from discord import app_commands
 
 from lib import trees
 from mixins import ClientMixin
@@ -58,6 +59,9 @@ class SideClient(discord.Client, ClientMixin):
     async def on_ready(self) -> None:
         print(f"Logged in as {self.user}")
 
+    async def on_app_command_completion(self, interaction: Interaction, command: Union[app_commands.Command, app_commands.ContextMenu]) -> None:
+        self.tree.observe_latency(interaction)
+
     async def setup_hook(self) -> None:
         async def _change_activity_after_booting() -> None:
             await self.wait_until_ready()
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import collections
+import json
+import os
+import random
+from typing import Any, Counter, Dict, Optional, Tuple, TYPE_CHECKING
+
+import aiohttp
+from aiohttp import web
+from yarl import URL
+
+from lib.fixtures import FixtureSession, dump_response
+
+
+# Stand-in for the public hosts that the library wrappers talk to, for
+# benchmarking without network access. Start it with
+#     python bot/upstream.py --port 8900
+# and run the bot with UPSTREAM_URL=http://localhost:8900: every request
+# of the bot session is then rewritten to /<scheme>/<host>/<path> and
+# answered from the recorded fixtures (see lib/fixtures.py). Run it with
+# --record to forward unknown requests to the real hosts and record them.
+# The port must not be PORT or one of the internal ports of the cluster
+# (CLUSTER_PORT + i, 8081 and above by default).
+
+
+SKIP_HEADERS = frozenset(("content-encoding", "content-length", "connection", "keep-alive", "transfer-encoding"))
+TEXT_TYPES = ("text/", "application/json", "application/xml", "application/javascript")
+
+
+class HostProfile:
+    """The simulated behaviour of an upstream host
+
+    Attributes
+    -----
+    latency: ``float``
+        The mean response delay, in seconds
+    jitter: ``float``
+        The standard deviation of the response delay, in seconds
+    error_rate: ``float``
+        The probability of answering with ``error_status`` instead
+        of the recorded response
+    error_status: ``int``
+        The status code of simulated errors
+    payload_scale: ``float``
+        Pad text responses with trailing whitespace up to this multiple
+        of their recorded size. Values below 1 are ignored.
+    """
+
+    __slots__ = ("latency", "jitter", "error_rate", "error_status", "payload_scale")
+    if TYPE_CHECKING:
+        latency: float
+        jitter: float
+        error_rate: float
+        error_status: int
+        payload_scale: float
+
+    def __init__(self, *, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, error_status: int = 503, payload_scale: float = 1.0) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.payload_scale = payload_scale
+
+    def updated(self, data: Dict[str, Any]) -> HostProfile:
+        """Create a copy of this profile with some attributes overridden"""
+        attributes = {attribute: getattr(self, attribute) for attribute in self.__slots__}
+        for key, value in data.items():
+            if key not in attributes:
+                raise ValueError(f"Unknown host profile attribute {key}")
+
+            attributes[key] = type(attributes[key])(value)
+
+        return HostProfile(**attributes)
+
+    def delay(self, rng: random.Random) -> float:
+        return max(0.0, rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+
+
+class FakeUpstream:
+    """An aiohttp application serving recorded upstream responses
+
+    Attributes
+    -----
+    directory: ``str``
+        The fixtures directory
+    default: ``HostProfile``
+        The profile of hosts without a specific profile
+    hosts: Dict[``str``, ``HostProfile``]
+        The host-specific profiles
+    record: ``bool``
+        Whether unknown requests are forwarded to the real host and
+        recorded
+    app: ``web.Application``
+        The application to run
+    """
+
+    __slots__ = ("directory", "default", "hosts", "record", "app", "_responses", "_stats", "_rng", "_session")
+    if TYPE_CHECKING:
+        directory: str
+        default: HostProfile
+        hosts: Dict[str, HostProfile]
+        record: bool
+        app: web.Application
+        _responses: Dict[Tuple[str, str], Dict[str, Any]]
+        _stats: Dict[str, Counter[str]]
+        _rng: random.Random
+        _session: Optional[aiohttp.ClientSession]
+
+    def __init__(self, directory: str, *, default: HostProfile, hosts: Dict[str, HostProfile], record: bool = False, seed: Optional[int] = None) -> None:
+        self.directory = directory
+        self.default = default
+        self.hosts = hosts
+        self.record = record
+        self._responses = {}
+        self._stats = collections.defaultdict(collections.Counter)
+        self._rng = random.Random(seed)
+        self._session = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/_upstream/stats", self._stats_handler)
+        self.app.router.add_post("/_upstream/reload", self._reload_handler)
+        self.app.router.add_route("*", r"/{scheme:https?}/{host}/{path:.*}", self._handler)
+        self.app.on_cleanup.append(self._cleanup)
+        self.load()
+
+    def load(self) -> None:
+        """Index the recorded responses by method and URL"""
+        self._responses.clear()
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+
+        for name in names:
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+
+                self._responses[data["method"], str(URL(data["url"]))] = data
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def profile(self, host: str) -> HostProfile:
+        return self.hosts.get(host, self.default)
+
+    async def _stats_handler(self, request: web.Request) -> web.Response:
+        return web.json_response({"fixtures": len(self._responses), "hosts": self._stats})
+
+    async def _reload_handler(self, request: web.Request) -> web.Response:
+        self.load()
+        self._stats.clear()
+        return web.json_response({"fixtures": len(self._responses)})
+
+    async def _forward(self, request: web.Request, url: URL) -> Optional[Dict[str, Any]]:
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+
+        headers = {key: value for key, value in request.headers.items() if key.lower() not in SKIP_HEADERS and key.lower() != "host"}
+        body = await request.read() if request.can_read_body else None
+        try:
+            async with self._session.request(request.method, url, headers=headers, data=body) as response:
+                content = await response.read()
+                data = dump_response(request.method, url, response.status, response.reason, response.headers.items(), content)
+        except aiohttp.ClientError:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, FixtureSession.key(request.method, url)), "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+
+        self._responses[data["method"], str(url)] = data
+        return data
+
+    async def _handler(self, request: web.Request) -> web.Response:
+        # Use the raw path so that the query string is kept exactly as sent
+        _, scheme, host, path = (request.raw_path.split("/", 3) + [""])[:4]
+        url = URL(f"{scheme}://{host}/{path}", encoded=True)
+        stats = self._stats[url.host or host]
+        profile = self.profile(url.host or host)
+
+        delay = profile.delay(self._rng)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if profile.error_rate > 0 and self._rng.random() < profile.error_rate:
+            stats["errors"] += 1
+            return web.Response(status=profile.error_status, text="Simulated upstream error")
+
+        data = self._responses.get((request.method, str(url)))
+        if data is None and self.record:
+            data = await self._forward(request, url)
+            if data is not None:
+                stats["recorded"] += 1
+
+        if data is None:
+            stats["misses"] += 1
+            return web.Response(status=404, text=f"No recorded response for {request.method} {url}", headers={"X-Upstream-Missing": "1"})
+
+        stats["hits"] += 1
+        body = base64.b64decode(data["body"])
+        headers = [(key, value) for key, value in data["headers"] if key.lower() not in SKIP_HEADERS]
+        content_type = next((value for key, value in headers if key.lower() == "content-type"), "")
+        if profile.payload_scale > 1 and content_type.startswith(TEXT_TYPES):
+            body += b" " * int(len(body) * (profile.payload_scale - 1))
+
+        response = web.Response(status=data["status"], reason=data["reason"], body=body)
+        for key, value in headers:
+            response.headers.add(key, value)
+
+        return response
+
+    async def _cleanup(self, app: web.Application) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve recorded upstream responses for offline benchmarking")
+    parser.add_argument("--host", default="127.0.0.1", help="the interface to listen on")
+    parser.add_argument("--port", type=int, default=8900, help="the port to listen on")
+    parser.add_argument("--fixtures", default="./fixtures/http", help="the directory of the recorded responses")
+    parser.add_argument("--config", help="a JSON file of host profiles: {\"default\": {...}, \"hosts\": {\"<host>\": {...}}}")
+    parser.add_argument("--latency", type=float, help="the mean response delay, in seconds")
+    parser.add_argument("--jitter", type=float, help="the standard deviation of the response delay, in seconds")
+    parser.add_argument("--error-rate", type=float, help="the probability of a simulated error")
+    parser.add_argument("--error-status", type=int, help="the status code of simulated errors")
+    parser.add_argument("--payload-scale", type=float, help="pad text responses to this multiple of their recorded size")
+    parser.add_argument("--seed", type=int, help="the random seed, for reproducible latencies and errors")
+    parser.add_argument("--record", action="store_true", help="forward unknown requests to the real hosts and record them")
+    args = parser.parse_args()
+
+    config: Dict[str, Any] = {}
+    if args.config is not None:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+    default = HostProfile().updated(config.get("default", {}))
+    overrides = {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "error_status": args.error_status,
+        "payload_scale": args.payload_scale,
+    }
+    default = default.updated({key: value for key, value in overrides.items() if value is not None})
+    hosts = {host: default.updated(data) for host, data in config.get("hosts", {}).items()}
+
+    upstream = FakeUpstream(args.fixtures, default=default, hosts=hosts, record=args.record, seed=args.seed)
+    print(f"Loaded {len(upstream)} recorded responses from {args.fixtures}")
+    web.run_app(upstream.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ from aiohttp import web
 
 from .middlewares import *
 from .routes import *
+from .routes.audio import voice_manager
 from .core import middleware_group, routes
 from .loader import TextFileLoader
 if TYPE_CHECKING:
@@ -35,6 +36,10 @@ class WebApp(web.Application):
 
         super().__init__(middlewares=middleware_group.to_list())
         self.add_routes(routes)
+        self.on_startup.append(self._load_voice_keys)
+
+    async def _load_voice_keys(self, app: web.Application) -> None:
+        await voice_manager.load(self.bot)
 
     def log(self, content: Any) -> None:
         prefix = "[SERVER] "
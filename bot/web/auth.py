@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import secrets
+from typing import TYPE_CHECKING
+
+from aiohttp import hdrs, web
+
+import env
+if TYPE_CHECKING:
+    from .server import WebRequest
+
+
+def ensure_debug_access(request: WebRequest) -> None:
+    """Ensure that a request to a debugging route carries the
+    ``DEBUG_TOKEN`` as a bearer token.
+
+    Debugging routes are disabled when ``DEBUG_TOKEN`` is not set.
+
+    Raises
+    -----
+    ``web.HTTPNotFound``
+        ``DEBUG_TOKEN`` is not set
+    ``web.HTTPUnauthorized``
+        The request does not carry a valid token
+    """
+    if not env.DEBUG_TOKEN:
+        raise web.HTTPNotFound
+
+    authorization = request.headers.get(hdrs.AUTHORIZATION, "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode("utf-8"), env.DEBUG_TOKEN.encode("utf-8")):
+        raise web.HTTPUnauthorized(headers={hdrs.WWW_AUTHENTICATE: "Bearer"})
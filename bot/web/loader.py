@@ -1,23 +1,128 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
 from typing import Dict, TYPE_CHECKING
 
+from lib import metrics
+
+
+__all__ = ("TextFile", "TextFileLoader")
+
+
+class TextFile:
+    """Represents a cached text file with its UTF-8 encoded content
+
+    Attributes
+    -----
+    path: ``str``
+        The path to the file
+    text: ``str``
+        The decoded content of the file
+    body: ``bytes``
+        The UTF-8 encoded content of the file, ready to be sent
+        as a response body
+    etag: ``str``
+        A strong ETag (including the surrounding quotes) computed
+        from the file content
+    """
+
+    __slots__ = ("path", "text", "body", "etag", "mtime_ns", "size", "checked_at")
+    if TYPE_CHECKING:
+        path: str
+        text: str
+        body: bytes
+        etag: str
+        mtime_ns: int
+        size: int
+        checked_at: float
+
+    def __init__(self, path: str, stat: os.stat_result) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self.body = f.read()
+
+        self.text = self.body.decode("utf-8")
+        self.etag = "\"" + hashlib.sha1(self.body).hexdigest() + "\""
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.checked_at = time.monotonic()
+
+    def is_modified(self, stat: os.stat_result) -> bool:
+        return stat.st_mtime_ns != self.mtime_ns or stat.st_size != self.size
+
+    def __repr__(self) -> str:
+        return f"<TextFile path={self.path} size={self.size} etag={self.etag}>"
+
 
 class TextFileLoader:
+    """A cache for text files served by the web application.
+
+    Each cached entry remembers the modification time and size of
+    the file it was loaded from. The file is ``stat``-ed again at
+    most once every ``interval`` seconds, and only the modified
+    entry is reloaded, so a deploy never requires dumping the
+    whole cache.
+    """
 
-    __slots__ = ("_data",)
+    __slots__ = ("_data", "interval")
     if TYPE_CHECKING:
-        _data: Dict[str, str]
+        _data: Dict[str, TextFile]
+        interval: float
 
-    def __init__(self) -> None:
+    def __init__(self, *, interval: float = 2.0) -> None:
         self._data = {}
+        self.interval = interval
 
-    def open(self, path: str) -> str:
+    def load(self, path: str) -> TextFile:
+        """Get the cached ``TextFile`` at ``path``, reloading it from
+        the disk if it was modified since the last access.
+
+        Parameters
+        -----
+        path: ``str``
+            The path to the file
+
+        Returns
+        -----
+        ``TextFile``
+            The up-to-date cached file
+        """
         try:
-            return self._data[path]
+            cached = self._data[path]
         except KeyError:
-            with open(path, "r", encoding="utf-8") as f:
-                self._data[path] = f.read()
+            metrics.cache_lookup("web_files", False)
+            cached = self._data[path] = TextFile(path, os.stat(path))
+            return cached
+
+        now = time.monotonic()
+        if now - cached.checked_at < self.interval:
+            metrics.cache_lookup("web_files", True)
+            return cached
+
+        stat = os.stat(path)
+        if cached.is_modified(stat):
+            metrics.cache_lookup("web_files", False)
+            cached = self._data[path] = TextFile(path, stat)
+        else:
+            metrics.cache_lookup("web_files", True)
+            cached.checked_at = now
+
+        return cached
+
+    def open(self, path: str) -> str:
+        return self.load(path).text
+
+    def invalidate(self, path: str) -> bool:
+        """Remove a single entry from the cache
 
-            return self._data[path]
+        Returns
+        -----
+        ``bool``
+            Whether the entry was in the cache
+        """
+        return self._data.pop(path, None) is not None
 
     def clear(self) -> None:
         self._data.clear()
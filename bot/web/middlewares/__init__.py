@@ -1,2 +1,3 @@
 #!/bot/web/middlewares
+from .cluster import *
 from .pixiv import *
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Union, TYPE_CHECKING
+
+import aiohttp
+from aiohttp import web
+from yarl import URL
+
+from ..core import middleware_group
+from ..routes.audio import voice_manager
+if TYPE_CHECKING:
+    from ..server import Handler, WebRequest
+
+
+# Routes that operate on the voice client of the guild given by the "key" parameter
+AUDIO_ROUTES = frozenset(("/audio-control/playing", "/audio-control/status", "/pause", "/repeat", "/resume", "/shuffle", "/skip", "/stop", "/stopafter"))
+FORWARDED_HEADER = "X-Haruka-Cluster"
+HOP_BY_HOP_HEADERS = frozenset(("connection", "content-encoding", "content-length", "keep-alive", "transfer-encoding", "upgrade"))
+
+
+async def _forward_http(request: WebRequest, url: URL, cluster_id: int) -> web.Response:
+    headers = {key: value for key, value in request.headers.items() if key.lower() not in HOP_BY_HOP_HEADERS and key.lower() != "host"}
+    headers[FORWARDED_HEADER] = str(cluster_id)
+    body = await request.read() if request.can_read_body else None
+
+    async with request.app.bot.sessions.internal.request(request.method, url, headers=headers, data=body, allow_redirects=False) as response:
+        content = await response.read()
+        forwarded = web.Response(status=response.status, body=content)
+        for key, value in response.headers.items():
+            if key.lower() not in HOP_BY_HOP_HEADERS:
+                forwarded.headers.add(key, value)
+
+        return forwarded
+
+
+async def _pipe(source: Union[web.WebSocketResponse, aiohttp.ClientWebSocketResponse], destination: Union[web.WebSocketResponse, aiohttp.ClientWebSocketResponse]) -> None:
+    async for message in source:
+        if message.type == aiohttp.WSMsgType.TEXT:
+            await destination.send_str(message.data)
+        elif message.type == aiohttp.WSMsgType.BINARY:
+            await destination.send_bytes(message.data)
+
+
+async def _forward_websocket(request: WebRequest, url: URL, cluster_id: int) -> web.WebSocketResponse:
+    websocket = web.WebSocketResponse()
+    await websocket.prepare(request)
+
+    try:
+        async with request.app.bot.sessions.internal.ws_connect(url, headers={FORWARDED_HEADER: str(cluster_id)}) as upstream:
+            tasks = [asyncio.create_task(_pipe(websocket, upstream)), asyncio.create_task(_pipe(upstream, websocket))]
+            try:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    except aiohttp.ClientError:
+        await websocket.send_str("DISCONNECTED")
+
+    await websocket.close()
+    return websocket
+
+
+@middleware_group.middleware
+@web.middleware
+async def _cluster_middleware(request: WebRequest, handler: Handler) -> web.StreamResponse:
+    cluster = request.app.bot.cluster
+    if not cluster.config.enabled or request.path not in AUDIO_ROUTES or FORWARDED_HEADER in request.headers:
+        return await handler(request)
+
+    try:
+        guild_id = voice_manager[request.query.get("key", "")]
+    except KeyError:
+        return await handler(request)
+
+    owner = cluster.config.cluster_of(guild_id)
+    if owner == cluster.config.cluster_id:
+        return await handler(request)
+
+    if not cluster.alive(owner):
+        raise web.HTTPServiceUnavailable
+
+    url = URL(cluster.config.internal_address(owner)).join(request.rel_url)
+    if request.headers.get("Upgrade", "").lower() == "websocket":
+        return await _forward_websocket(request, url, cluster.config.cluster_id)
+
+    try:
+        return await _forward_http(request, url, cluster.config.cluster_id)
+    except aiohttp.ClientError:
+        raise web.HTTPBadGateway
@@ -4,6 +4,9 @@ from .collection import *
 from .favicon import *
 from .image import *
 from .info import *
+from .lag import *
 from .main import *
+from .metrics import *
 from .pixiv_user import *
+from .profile import *
 from .reload import *
@@ -1,5 +1,6 @@
 #!/bot/web/routes/audio
 from .audio_control import *
+from .broadcaster import *
 from .manager import *
 from .pause import *
 from .repeat import *
@@ -1,11 +1,10 @@
 from __future__ import annotations
 
-import asyncio
-import contextlib
 from typing import TYPE_CHECKING
 
 from aiohttp import web
 
+from .broadcaster import status_broadcaster
 from .utils import get_client
 from ...core import routes
 if TYPE_CHECKING:
@@ -44,31 +43,10 @@ async def _audio_control_status_route(request: WebRequest) -> web.WebSocketRespo
     await websocket.prepare(request)
 
     client = get_client(request)
-    if not client:
+    if not client or not client.is_connected():
         await websocket.send_str("DISCONNECTED")
         await websocket.close()
         return websocket
 
-    async def notify(websocket: web.WebSocketResponse, event: asyncio.Event) -> None:
-        with contextlib.suppress(ConnectionResetError):
-            await websocket.send_str("END")
-
-        event.set()
-
-    async def keep_alive(websocket: web.WebSocketResponse) -> None:
-        while await asyncio.sleep(23, True) and not websocket.closed:
-            with contextlib.suppress(ConnectionResetError):
-                await websocket.send_bytes(b"")
-
-    waiter = asyncio.Event()
-    asyncio.create_task(keep_alive(websocket))
-    while client.is_connected() and not websocket.closed:
-        waiter.clear()
-        await client.when_complete(notify(websocket, waiter))  # May throw RuntimeWarning, maybe just ignore it?
-        await waiter.wait()
-
-    with contextlib.suppress(ConnectionResetError):
-        await websocket.send_str("DISCONNECTED")
-
-    await websocket.close()
+    await status_broadcaster.serve(client.guild.id, websocket)
     return websocket
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from typing import Dict, Optional, Set, Union, TYPE_CHECKING
+
+from aiohttp import web
+
+from lib.audio import AudioEvent, hub
+
+
+__all__ = ("status_broadcaster",)
+
+
+class _StatusBroadcaster:
+    """Fan out ``AudioEvent``s of each guild to all audio control
+    websockets watching that guild.
+
+    There is exactly one event hub subscription per watched guild and
+    one heartbeat task for all sockets, regardless of how many browsers
+    are connected. A socket that cannot accept a message within
+    ``send_timeout`` seconds is closed instead of holding back the
+    others.
+    """
+
+    __slots__ = ("_sockets", "_readers", "_heartbeat", "heartbeat_interval", "send_timeout")
+    if TYPE_CHECKING:
+        _sockets: Dict[int, Set[web.WebSocketResponse]]
+        _readers: Dict[int, asyncio.Task[None]]
+        _heartbeat: Optional[asyncio.Task[None]]
+        heartbeat_interval: float
+        send_timeout: float
+
+    def __init__(self, *, heartbeat_interval: float = 23.0, send_timeout: float = 5.0) -> None:
+        self._sockets = {}
+        self._readers = {}
+        self._heartbeat = None
+        self.heartbeat_interval = heartbeat_interval
+        self.send_timeout = send_timeout
+
+    async def serve(self, guild_id: int, websocket: web.WebSocketResponse) -> None:
+        """This function is a coroutine
+
+        Subscribe a prepared websocket to the events of a guild and
+        block until the websocket is closed.
+
+        Parameters
+        -----
+        guild_id: ``int``
+            The guild ID
+        websocket: ``web.WebSocketResponse``
+            The prepared websocket
+        """
+        sockets = self._sockets.setdefault(guild_id, set())
+        sockets.add(websocket)
+
+        if guild_id not in self._readers:
+            # Subscribe before the reader task first runs, so that no event is missed in between.
+            # The reader exits the subscription, or the callback if it is cancelled before running.
+            stack = contextlib.ExitStack()
+            queue = stack.enter_context(hub.subscribe(guild_id))
+            reader = self._readers[guild_id] = asyncio.create_task(self._read(guild_id, queue, stack), name=f"Audio status reader: {guild_id}")
+            reader.add_done_callback(lambda _: stack.close())
+
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._keep_alive(), name="Audio status heartbeat")
+
+        try:
+            async for _ in websocket:
+                pass
+        finally:
+            self._discard(guild_id, websocket)
+
+    def _discard(self, guild_id: int, websocket: web.WebSocketResponse) -> None:
+        sockets = self._sockets.get(guild_id)
+        if sockets is None:
+            return
+
+        sockets.discard(websocket)
+        if not sockets:
+            del self._sockets[guild_id]
+            reader = self._readers.pop(guild_id, None)
+            if reader is not None:
+                reader.cancel()
+
+        if not self._sockets and self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+    async def _read(self, guild_id: int, queue: asyncio.Queue[AudioEvent], stack: contextlib.ExitStack) -> None:
+        try:
+            with stack:
+                while True:
+                    event = await queue.get()
+                    await self._broadcast(guild_id, event.value)
+
+                    if event == AudioEvent.DISCONNECT:
+                        break
+
+        finally:
+            # A socket connecting after this needs a new reader
+            if self._readers.get(guild_id) is asyncio.current_task():
+                del self._readers[guild_id]
+
+        for websocket in list(self._sockets.get(guild_id, ())):
+            await websocket.close()
+
+    async def _keep_alive(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await asyncio.gather(*[self._broadcast(guild_id, b"") for guild_id in list(self._sockets.keys())])
+
+    async def _broadcast(self, guild_id: int, data: Union[str, bytes]) -> None:
+        sockets = list(self._sockets.get(guild_id, ()))
+        await asyncio.gather(*[self._send(guild_id, websocket, data) for websocket in sockets])
+
+    async def _send(self, guild_id: int, websocket: web.WebSocketResponse, data: Union[str, bytes]) -> None:
+        if websocket.closed:
+            return self._discard(guild_id, websocket)
+
+        try:
+            if isinstance(data, str):
+                await asyncio.wait_for(websocket.send_str(data), self.send_timeout)
+            else:
+                await asyncio.wait_for(websocket.send_bytes(data), self.send_timeout)
+
+        except (ConnectionResetError, asyncio.TimeoutError):
+            self._discard(guild_id, websocket)
+            with contextlib.suppress(ConnectionResetError, asyncio.TimeoutError):
+                await asyncio.wait_for(websocket.close(), self.send_timeout)
+
+    def sockets_count(self, guild_id: Optional[int] = None) -> int:
+        if guild_id is None:
+            return sum(len(sockets) for sockets in self._sockets.values())
+
+        return len(self._sockets.get(guild_id, ()))
+
+
+status_broadcaster = _StatusBroadcaster()
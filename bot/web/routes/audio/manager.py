@@ -1,42 +1,105 @@
 from __future__ import annotations
 
 import secrets
-from typing import Union, overload, TYPE_CHECKING
+from typing import ClassVar, Optional, Union, overload, TYPE_CHECKING
 
 import bidict
+if TYPE_CHECKING:
+    import haruka
 
 
 __all__ = ("voice_manager",)
 
 
 class _VoiceClientManager:
+    """Map the keys of the audio control page to guild IDs
 
-    __slots__ = ("mapping",)
+    The mapping is stored in the ``audio_keys`` table, so that it is
+    shared by all processes of a cluster. Every process keeps a copy
+    in memory which is updated through cluster notifications, lookups
+    are therefore synchronous.
+    """
+
+    __slots__ = ("mapping", "bot")
+    CHANNEL: ClassVar[str] = "haruka_audio_keys"
     if TYPE_CHECKING:
         mapping: bidict.bidict[str, int]
+        bot: Optional[haruka.Haruka]
 
     def __init__(self) -> None:
         self.mapping = bidict.bidict()
+        self.bot = None
+
+    async def load(self, bot: haruka.Haruka) -> None:
+        """This function is a coroutine
+
+        Load the mapping from the database and follow the changes made
+        by the other processes
+
+        The keys of the guilds of this process are left over from its
+        previous run, they are removed.
+        """
+        self.bot = bot
+        await bot.cluster.listen(self.CHANNEL, self._on_notification)
+        rows = await bot.conn.fetch("SELECT * FROM audio_keys;")
+
+        config = bot.cluster.config
+        connected = set(voice_client.guild.id for voice_client in bot.voice_clients)
+        stale = [row["key"] for row in rows if config.cluster_of(row["guild_id"]) == config.cluster_id and row["guild_id"] not in connected]
+        if stale:
+            deleted = await bot.conn.fetch("DELETE FROM audio_keys WHERE key = ANY($1::text[]) RETURNING *;", stale)
+            for row in deleted:
+                await bot.cluster.notify(self.CHANNEL, f"pop {row['key']} {row['guild_id']}")
+
+            bot.log(f"Removed {len(deleted)} stale audio control keys")
+
+        removed = set(stale)
+        self.mapping = bidict.bidict((row["key"], row["guild_id"]) for row in rows if row["key"] not in removed)
+
+    def _on_notification(self, payload: str) -> None:
+        action, key, guild_id = payload.split()
+        if action == "push":
+            self.mapping.forceput(key, int(guild_id))
+        else:
+            self.mapping.pop(key, None)
 
-    def push(self, guild_id: int) -> str:
+    async def push(self, guild_id: int) -> str:
         if guild_id in self.mapping.values():
             return self.mapping.inverse[guild_id]
 
+        assert self.bot is not None
         key = secrets.token_urlsafe()
         while key in self.mapping.keys():
             key = secrets.token_urlsafe()
 
-        self.mapping[key] = guild_id
+        # Another process may have registered this guild before the notification arrived
+        key = await self.bot.conn.fetchval(
+            """
+            INSERT INTO audio_keys (key, guild_id) VALUES ($1, $2)
+            ON CONFLICT (guild_id) DO UPDATE SET guild_id = excluded.guild_id
+            RETURNING key;
+            """,
+            key, guild_id,
+        )
+        self.mapping.forceput(key, guild_id)
+        await self.bot.cluster.notify(self.CHANNEL, f"push {key} {guild_id}")
         return key
 
-    def pop(self, key: Union[str, int]) -> None:
+    async def pop(self, key: Union[str, int]) -> None:
+        assert self.bot is not None
         if isinstance(key, str):
-            self.mapping.pop(key)
+            row = await self.bot.conn.fetchrow("DELETE FROM audio_keys WHERE key = $1 RETURNING *;", key)
         elif isinstance(key, int):
-            self.mapping.inverse.pop(key)
+            row = await self.bot.conn.fetchrow("DELETE FROM audio_keys WHERE guild_id = $1 RETURNING *;", key)
         else:
             raise TypeError(f"Unknown type {key.__class__.__name__}")
 
+        if row is None:
+            raise KeyError(key)
+
+        self.mapping.pop(row["key"], None)
+        await self.bot.cluster.notify(self.CHANNEL, f"pop {row['key']} {row['guild_id']}")
+
     @overload
     def __getitem__(self, guild_id: int) -> str:
         ...
@@ -51,8 +114,5 @@ class _VoiceClientManager:
         elif isinstance(key_or_id, int):
             return self.mapping.inverse[key_or_id]
 
-    def __setitem__(self, key: str, guild_id: int) -> None:
-        self.mapping[key] = guild_id
-
 
 voice_manager = _VoiceClientManager()
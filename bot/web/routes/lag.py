@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+
+from ..auth import ensure_debug_access
+from ..core import routes
+if TYPE_CHECKING:
+    from ..server import WebRequest
+
+
+@routes.get("/lag")
+async def _lag_route(request: WebRequest) -> web.Response:
+    ensure_debug_access(request)
+
+    try:
+        limit = int(request.query.get("limit", 50))
+    except ValueError:
+        raise web.HTTPBadRequest
+
+    monitor = request.app.bot.loop_monitor
+    data = {
+        "interval": monitor.interval,
+        "threshold": monitor.threshold,
+        "records": [record.to_json() for record in monitor.recent(limit)],
+    }
+    return web.json_response(data)
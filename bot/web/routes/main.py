@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
-from aiohttp import web
+from aiohttp import hdrs, web
 
 from ..core import routes
 if TYPE_CHECKING:
@@ -11,8 +11,17 @@ if TYPE_CHECKING:
 
 @routes.get("/")
 async def _main_route(request: WebRequest) -> web.Response:
+    file = request.app.loader.load("./bot/web/index.html")
+    headers = {hdrs.ETAG: file.etag}
+
+    if_none_match = request.headers.get(hdrs.IF_NONE_MATCH, "")
+    if file.etag in (etag.strip() for etag in if_none_match.split(",")):
+        return web.Response(status=304, headers=headers)
+
     return web.Response(
-        text=request.app.loader.open("./bot/web/index.html"),
+        body=file.body,
         status=200,
         content_type="text/html",
+        charset="utf-8",
+        headers=headers,
     )
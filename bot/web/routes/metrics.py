@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+
+from lib import metrics
+from lib.audio import MusicClient
+from ..auth import ensure_debug_access
+from ..core import routes
+if TYPE_CHECKING:
+    from ..server import WebRequest
+
+
+CACHE_HIT_RATIO = metrics.Gauge("haruka_cache_hit_ratio", "Ratio of cache lookups that were hits", ("cache",))
+
+
+def _collect_state(request: WebRequest) -> None:
+    bot = request.app.bot
+
+    for client in (bot, bot.side_client):
+        if client is not None and client.is_ready() and not math.isnan(client.latency):
+            name = client.__class__.__name__
+            metrics.GATEWAY_LATENCY.set(client.latency, client=name)
+            metrics.GUILDS.set(len(client.guilds), client=name)
+
+    music_clients = [voice_client for voice_client in bot.voice_clients if isinstance(voice_client, MusicClient)]
+    metrics.MUSIC_CLIENTS.set(len(music_clients))
+
+    metrics.VOICE_LATENCY.clear()
+    for voice_client in music_clients:
+        if voice_client.guild_id is not None and not math.isinf(voice_client.average_latency):
+            metrics.VOICE_LATENCY.set(voice_client.average_latency, guild=voice_client.guild_id)
+
+    pool = request.app.pool
+    size = pool.get_size()
+    idle = pool.get_idle_size()
+    metrics.DATABASE_POOL_CONNECTIONS.set(size - idle, state="used")
+    metrics.DATABASE_POOL_CONNECTIONS.set(idle, state="idle")
+    metrics.DATABASE_POOL_CONNECTIONS.set(pool.get_max_size(), state="max")
+
+    for cache, ratio in metrics.cache_hit_ratios().items():
+        CACHE_HIT_RATIO.set(ratio, cache=cache)
+
+
+@routes.get("/metrics")
+async def _metrics_route(request: WebRequest) -> web.Response:
+    # The metrics include guild IDs and usage data, scrape them with the DEBUG_TOKEN
+    ensure_debug_access(request)
+    _collect_state(request)
+    return web.Response(
+        text=metrics.REGISTRY.expose(),
+        content_type="text/plain",
+        headers={"X-Content-Type-Options": "nosniff"},
+    )
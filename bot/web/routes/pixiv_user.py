@@ -35,7 +35,7 @@ async def _pixiv_user_route(request: WebRequest) -> web.Response:
     async def save(index: int) -> Optional[int]:
         artwork = await artworks.get(index)
         if artwork is not None:
-            status = await artwork.save(pixiv.ImageType.ORIGINAL, session=request.app.session)
+            status = await artwork.save(pixiv.ImageType.ORIGINAL, session=request.app.bot.sessions.download)
             if status:
                 return artwork.id
 
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+
+from lib import profiler
+from ..auth import ensure_debug_access
+from ..core import routes
+if TYPE_CHECKING:
+    from ..server import WebRequest
+
+
+@routes.get("/profile")
+async def _profile_route(request: WebRequest) -> web.Response:
+    ensure_debug_access(request)
+
+    try:
+        mode = request.query.get("mode", "cpu")
+        output = request.query.get("format", "folded")
+        duration = float(request.query.get("duration", 10))
+        if mode not in ("cpu", "memory") or output not in ("folded", "text"):
+            raise ValueError
+
+    except ValueError:
+        raise web.HTTPBadRequest
+
+    try:
+        if mode == "cpu":
+            report = await request.app.bot.profiler.sample_cpu(duration, all_threads="all_threads" in request.query)
+        else:
+            report = await request.app.bot.profiler.trace_memory(duration)
+
+    except profiler.ProfilerBusy:
+        raise web.HTTPConflict
+    except ValueError:
+        raise web.HTTPBadRequest
+
+    text = report.folded() if output == "folded" else report.text()
+    return web.Response(text=text, content_type="text/plain")